@@ -0,0 +1,156 @@
+"""Cost of the v2 function_app dispatch on the command path
+
+Run from azure-mcp-server/:
+
+    python -m benchmarks.adapter_benchmark --concurrency 1,10,50 --requests 2000 [--tolerance 0.15]
+
+function_app.py registers the v1 handlers themselves, so calling the
+registered function and mcp_command.main would time the same code.
+Instead, "handler" calls src.functions.mcp_command.main with a ready
+func.HttpRequest, and "v2" takes the path the worker runs for the
+FunctionApp route: it decodes the host's http Datum with the binding's
+HttpRequestConverter, calls the function indexed from function_app.app,
+and encodes the result with HttpResponseConverter. Building the incoming
+Datum is not timed. Runs alternate between the two paths so drift affects
+both equally. Exits 1 when the dispatch costs more than the tolerance in
+throughput or p95.
+"""
+import sys
+import json
+import asyncio
+import logging
+import argparse
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import azure.functions as func
+from azure.functions.http import HttpRequestConverter, HttpResponseConverter
+from azure.functions.meta import Datum
+
+import function_app
+from src.functions import mcp_command
+
+from .load_test import Harness, run_command_scenario
+from .support import percentile
+
+SCENARIOS = ("initialize", "tools/list", "tools/call")
+
+
+def v2_handler(name: str = "mcp_command"):
+    """The user function function_app.py registered under `name`"""
+    for function in function_app.app.get_functions():
+        if function.get_function_name() == name:
+            return function.get_user_function()
+    raise KeyError(name)
+
+
+def to_datum(req: func.HttpRequest) -> Datum:
+    """The http Datum the host sends the worker for req"""
+    def strings(values) -> Dict[str, Datum]:
+        return {name: Datum(value, "string") for name, value in values.items()}
+
+    return Datum({
+        "method": Datum(req.method, "string"),
+        "url": Datum(req.url, "string"),
+        "headers": strings(req.headers),
+        "query": strings(req.params),
+        "params": strings(req.route_params),
+        "body": Datum(req.get_body(), "bytes"),
+    }, "http")
+
+
+def v2_dispatch(name: str = "mcp_command") -> Callable[[Datum], Awaitable[Any]]:
+    """Datum in, Datum out through the function function_app.py registered"""
+    handler = v2_handler(name)
+
+    async def dispatch(datum: Datum):
+        req = HttpRequestConverter.decode(datum, trigger_metadata={})
+        encoded = HttpResponseConverter.encode(await handler(req), expected_type=func.HttpResponse)
+        return SimpleNamespace(status_code=int(encoded.value["status_code"].value))
+
+    return dispatch
+
+
+def _summary(path: str, scenario: str, concurrency: int, latencies: List[float], errors: int,
+             elapsed: float) -> Dict[str, Any]:
+    latencies.sort()
+    return {
+        "path": path,
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3)
+    }
+
+
+async def run(scenarios: List[str], levels: List[int], requests: int, rounds: int) -> List[Dict[str, Any]]:
+    handlers = {"handler": (mcp_command.main, None), "v2": (v2_dispatch(), to_datum)}
+    results = []
+    for scenario in scenarios:
+        for concurrency in levels:
+            samples: Dict[str, List] = {path: [[], 0, 0.0] for path in handlers}
+            with Harness(clients=max(concurrency, 1)) as harness:
+                for _ in range(rounds):
+                    for path, (handler, prepare) in handlers.items():
+                        latencies, errors, elapsed = await run_command_scenario(
+                            harness, scenario, requests // rounds, concurrency, handler, prepare
+                        )
+                        samples[path][0].extend(latencies)
+                        samples[path][1] += errors
+                        samples[path][2] += elapsed
+            for path, (latencies, errors, elapsed) in samples.items():
+                results.append(_summary(path, scenario, concurrency, latencies, errors, elapsed))
+    return results
+
+
+def regressions(results: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Describe every case where the v2 dispatch costs more than tolerance"""
+    direct = {(r["scenario"], r["concurrency"]): r for r in results if r["path"] == "handler"}
+    found = []
+    for r in results:
+        base = direct.get((r["scenario"], r["concurrency"]))
+        if r["path"] != "v2" or not base:
+            continue
+        if r["rps"] < base["rps"] * (1 - tolerance):
+            found.append(f"{r['scenario']} @ c={r['concurrency']}: rps handler {base['rps']} v2 {r['rps']}")
+        if r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            found.append(f"{r['scenario']} @ c={r['concurrency']}: "
+                         f"p95 handler {base['p95_ms']} v2 {r['p95_ms']} ms")
+    return found
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,10,50")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per path per case")
+    parser.add_argument("--rounds", type=int, default=4, help="Alternating rounds per case")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+    results = asyncio.run(run(scenarios, levels, args.requests, args.rounds))
+
+    print(f"{'scenario':<12} {'conc':>5} {'path':>7} {'reqs':>7} {'err':>5} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for r in results:
+        print(f"{r['scenario']:<12} {r['concurrency']:>5} {r['path']:>7} {r['requests']:>7} {r['errors']:>5} "
+              f"{r['rps']:>9} {r['p50_ms']:>8} {r['p95_ms']:>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    found = regressions(results, args.tolerance)
+    for line in found:
+        print(f"REGRESSION {line}")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
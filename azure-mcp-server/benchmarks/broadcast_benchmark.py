@@ -0,0 +1,85 @@
+"""Broadcast fan-out cost: encode-once broadcast vs a per-session send loop
+
+Run from azure-mcp-server/:
+
+    python -m benchmarks.broadcast_benchmark --sessions 1000,10000,50000 [--repeat 3]
+
+"loop" calls send_message(MCPNotification) on every session, as callers
+had to before MCPServer.broadcast existed. "broadcast" is
+MCPServer.broadcast to all sessions, and "filtered" targets one tenant out
+of ten through the session index. Queues are drained between runs and not
+timed.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+
+from src.shared.mcp_protocol import MCPServer, MCPNotification
+
+PARAMS = {"level": "info", "data": {"message": "Scheduled maintenance at 02:00 UTC", "window_minutes": 30}}
+
+
+def build_server(sessions: int) -> MCPServer:
+    server = MCPServer()
+    for n in range(sessions):
+        server.create_session(f"s{n}", f"user-{n}", tenant_id=f"tenant-{n % 10}")
+    return server
+
+
+def drain(server: MCPServer):
+    for session in server.sessions.values():
+        session.drain_events(1 << 30)
+
+
+async def loop_send(server: MCPServer) -> int:
+    for session in list(server.sessions.values()):
+        await session.send_message(MCPNotification(method="notifications/message", params=PARAMS))
+    return len(server.sessions)
+
+
+async def run(levels: List[int], repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    for sessions in levels:
+        server = build_server(sessions)
+        cases = {
+            "loop": lambda: loop_send(server),
+            "broadcast": lambda: server.broadcast("notifications/message", PARAMS),
+            "filtered": lambda: server.broadcast("notifications/message", PARAMS, tenant_id="tenant-3"),
+        }
+        for name, case in cases.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                await case()
+                timings.append((time.perf_counter() - started) * 1000)
+                drain(server)
+            results.append({"case": name, "sessions": sessions, "best_ms": round(min(timings), 2),
+                            "per_session_us": round(min(timings) * 1000 / sessions, 3)})
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", default="1000,10000,50000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    levels = [int(n) for n in args.sessions.split(",") if n]
+    results = asyncio.run(run(levels, args.repeat))
+
+    print(f"{'case':<10} {'sessions':>9} {'best ms':>10} {'us/session':>11}")
+    for r in results:
+        print(f"{r['case']:<10} {r['sessions']:>9} {r['best_ms']:>10} {r['per_session_us']:>11}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Bytes on the wire vs. CPU cost for response compression
+
+Run from azure-mcp-server/:
+
+    python -m benchmarks.compression_benchmark [--iterations 200] [--json out.json]
+
+Each payload is encoded with every available setting; the table shows
+compressed size, ratio and the CPU time per encode.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+from src.shared import compression
+from src.shared.mcp_protocol import MCPServer, MCPRequest
+
+
+def build_payloads() -> Dict[str, bytes]:
+    """Representative response bodies"""
+    server = MCPServer()
+    session = server.create_session("bench", "bench-user")
+
+    async def call(method: str, params: Dict[str, Any] = None) -> bytes:
+        response = await server.handle_request(MCPRequest(id=1, method=method, params=params), session)
+        return json.dumps(response.model_dump(exclude_none=True)).encode("utf-8")
+
+    async def collect() -> Dict[str, bytes]:
+        source = "\n".join(f"def handler_{n}(event, context):\n    return process(event['body'], n={n})\n"
+                           for n in range(400))
+        return {
+            "tools/list": await call("tools/list"),
+            "resources/read (64 KiB doc)": json.dumps({
+                "jsonrpc": "2.0", "id": 1,
+                "result": {"contents": [{"uri": "resource://docs/api", "mimeType": "text/markdown",
+                                         "text": ("## Endpoint\n\nPOST /mcp/command with a JSON-RPC body. " * 1200)[:65536]}]}
+            }).encode("utf-8"),
+            "analysis report": json.dumps({
+                "jsonrpc": "2.0", "id": 1,
+                "result": {"toolResult": {
+                    "language": "python",
+                    "issues": [{"line": n, "severity": "warning", "rule": "complexity",
+                                "message": f"Function handler_{n} exceeds the complexity budget"}
+                               for n in range(500)],
+                    "source": source
+                }}
+            }).encode("utf-8"),
+        }
+
+    return asyncio.run(collect())
+
+
+def encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    available = {
+        "identity": lambda data: data,
+        "gzip-1": lambda data: gzip.compress(data, compresslevel=1, mtime=0),
+        "gzip-6": lambda data: gzip.compress(data, compresslevel=6, mtime=0),
+        "gzip-9": lambda data: gzip.compress(data, compresslevel=9, mtime=0),
+    }
+    if compression.brotli is not None:
+        brotli = compression.brotli
+        available["br-4"] = lambda data: brotli.compress(data, quality=4)
+        available["br-5"] = lambda data: brotli.compress(data, quality=5)
+        available["br-11"] = lambda data: brotli.compress(data, quality=11)
+    cache = compression.CompressionCache()
+    available["gzip-6 cached"] = lambda data: cache.get_or_compress(data, compression.GZIP)
+    return available
+
+
+def run(iterations: int) -> List[Dict[str, Any]]:
+    results = []
+    for payload_name, payload in build_payloads().items():
+        for encoder_name, encode in encoders().items():
+            encoded = encode(payload)
+            start = time.process_time()
+            for _ in range(iterations):
+                encode(payload)
+            cpu_us = (time.process_time() - start) / iterations * 1e6
+            results.append({
+                "payload": payload_name,
+                "encoding": encoder_name,
+                "raw_bytes": len(payload),
+                "wire_bytes": len(encoded),
+                "ratio": round(len(payload) / len(encoded), 2),
+                "cpu_us": round(cpu_us, 1)
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = run(args.iterations)
+    print(f"{'payload':<30} {'encoding':<14} {'raw':>9} {'wire':>9} {'ratio':>7} {'cpu us':>9}")
+    for r in results:
+        print(f"{r['payload']:<30} {r['encoding']:<14} {r['raw_bytes']:>9} {r['wire_bytes']:>9} "
+              f"{r['ratio']:>7} {r['cpu_us']:>9}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Cold-start import cost of the function modules
+
+Run from azure-mcp-server/:
+
+    python -m benchmarks.import_time --runs 5 [--budget-ms 150] [--top 15]
+
+Every run is a fresh interpreter started with `python -X importtime`.
+azure.functions is imported first because the Functions worker has it
+loaded before any function module, so it is not part of our cold start.
+Exits 1 when the median exceeds the budget or when a module that should
+load lazily is imported eagerly.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .support import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Median import time allowed for all function modules together
+IMPORT_BUDGET_MS = float(os.environ.get("MCP_IMPORT_BUDGET_MS", "150"))
+
+# Must not be imported just by loading the function modules
+LAZY_MODULES = (
+    "aiohttp",
+    "azure.identity",
+    "azure.keyvault.secrets",
+    "jose",
+    "jwt",
+    "msal",
+    "opencensus",
+)
+
+
+def function_modules() -> List[str]:
+    return sorted(f"src.functions.{path.stem}" for path in (ROOT / "src" / "functions").glob("*.py")
+                  if path.stem != "__init__")
+
+
+def measure_once(modules: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Import the modules in a fresh interpreter and parse -X importtime"""
+    modules = modules or function_modules()
+    script = (
+        "import sys, json, azure.functions\n"
+        f"import {', '.join(modules)}\n"
+        f"print(json.dumps(sorted(m for m in {list(LAZY_MODULES)!r} if m in sys.modules)))\n"
+    )
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    env.pop("APPLICATIONINSIGHTS_CONNECTION_STRING", None)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+
+    total_us = 0
+    cumulative: Dict[str, int] = {}
+    preamble = True
+    for line in proc.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <indent><module>"
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative_field, name_field = line.split("|", 2)
+        if not cumulative_field.strip().isdigit():
+            continue  # column header
+        name = name_field[1:]
+        if preamble:
+            # Interpreter startup and azure.functions come first
+            preamble = name != "azure.functions"
+            continue
+        cumulative_us = int(cumulative_field)
+        cumulative[name.strip()] = cumulative_us
+        # Everything imported on our behalf nests under a top-level src entry
+        if not name.startswith(" ") and name.split(".")[0] == "src":
+            total_us += cumulative_us
+    return {
+        "total_ms": total_us / 1000,
+        "modules_ms": {name: us / 1000 for name, us in cumulative.items()},
+        "lazy_modules_loaded": json.loads(proc.stdout.strip().splitlines()[-1])
+    }
+
+
+def run(runs: int, modules: Optional[List[str]] = None) -> Dict[str, Any]:
+    samples = [measure_once(modules) for _ in range(runs)]
+    totals = sorted(s["total_ms"] for s in samples)
+    return {
+        "runs": runs,
+        "median_ms": round(statistics.median(totals), 1),
+        "p90_ms": round(percentile(totals, 0.90), 1),
+        "min_ms": round(totals[0], 1),
+        "lazy_modules_loaded": sorted({m for s in samples for m in s["lazy_modules_loaded"]}),
+        # Per-module breakdown from the last run
+        "modules_ms": samples[-1]["modules_ms"]
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15, help="Show the N slowest modules (cumulative)")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.runs)
+    print(f"function modules: median {report['median_ms']} ms, p90 {report['p90_ms']} ms, "
+          f"min {report['min_ms']} ms over {args.runs} runs (budget {args.budget_ms} ms)")
+    ranked = sorted(report["modules_ms"].items(), key=lambda item: item[1], reverse=True)
+    for name, ms in ranked[:args.top]:
+        print(f"  {ms:>9.1f} ms  {name}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = False
+    if report["lazy_modules_loaded"]:
+        print(f"FAIL eagerly imported: {', '.join(report['lazy_modules_loaded'])}")
+        failed = True
+    if report["median_ms"] > args.budget_ms:
+        print(f"FAIL median import time {report['median_ms']} ms exceeds {args.budget_ms} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
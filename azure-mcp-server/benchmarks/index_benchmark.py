@@ -0,0 +1,82 @@
+"""Code index lookup latency and build cost
+
+Run from azure-mcp-server/:
+
+    python -m benchmarks.index_benchmark --files 2000 [--queries 500]
+
+Indexes the synthetic project from benchmarks.workspace_benchmark, then
+times find_symbol (exact and prefix), token search and substring search
+for names that exist in the project, reporting p50/p99 in milliseconds.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+from typing import Any, Dict, List, Optional
+
+from src.shared.code_index import CodeIndex, extract
+from benchmarks.support import percentile
+from benchmarks.workspace_benchmark import build_project
+
+
+def timed(samples: List[float], fn, *args, **kwargs):
+    started = time.perf_counter()
+    fn(*args, **kwargs)
+    samples.append((time.perf_counter() - started) * 1000)
+
+
+def run(files: int, queries: int, seed: int = 7) -> Dict[str, Any]:
+    project = build_project(files)
+    started = time.perf_counter()
+    extracted = extract(project)
+    extract_ms = (time.perf_counter() - started) * 1000
+    index = CodeIndex()
+    started = time.perf_counter()
+    for item in extracted:
+        index.add(item)
+    apply_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(seed)
+    ids = [rng.randrange(files * 10) for _ in range(queries)]
+    cases = {
+        "find_symbol": lambda n: index.find_symbol(f"Handler{n}"),
+        "find_symbol_prefix": lambda n: index.find_symbol(f"Handler{n // 10}", prefix=True, limit=10),
+        "search_token": lambda n: index.search(f"handler{n}", mode="token", limit=10),
+        "search_substring": lambda n: index.search(f"sk-{n:08d}", limit=10),
+    }
+    latencies = {}
+    for name, case in cases.items():
+        samples: List[float] = []
+        for n in ids:
+            timed(samples, case, n)
+        samples.sort()
+        latencies[name] = {"p50_ms": round(percentile(samples, 0.5), 4), "p99_ms": round(percentile(samples, 0.99), 4)}
+    return {"files": files, "extract_ms": round(extract_ms, 1), "apply_ms": round(apply_ms, 1),
+            "stats": index.stats(), "latency": latencies}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    result = run(args.files, args.queries)
+    stats = result["stats"]
+    print(f"{result['files']} files: extract {result['extract_ms']} ms (off-loop), apply {result['apply_ms']} ms; "
+          f"{stats['tokens']} tokens, {stats['trigrams']} trigrams, {stats['symbols']} symbols, "
+          f"{stats['postings']} postings")
+    print(f"{'query':<20} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, latency in result["latency"].items():
+        print(f"{name:<20} {latency['p50_ms']:>9} {latency['p99_ms']:>9}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
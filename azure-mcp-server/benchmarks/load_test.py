@@ -0,0 +1,288 @@
+"""In-process load test for the MCP function handlers
+
+Run from azure-mcp-server/:
+
+    python -m benchmarks.load_test --concurrency 1,10,50 --requests 2000 \
+        --output results.json [--baseline previous.json --tolerance 0.15]
+
+Each scenario sends synthetic func.HttpRequest objects straight into
+mcp_command.main with locally signed RS256 tokens, so JWT validation,
+session lookup, dispatch and serialization are all on the measured path.
+The SSE fan-out scenario long-polls sse_stream.main for many sessions at
+once (auth, session lookup, Last-Event-ID resume and body encoding
+included) and measures enqueue-to-response latency. The harness installs
+its own server and validator and puts the previous ones back on exit.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.functions import mcp_command, sse_stream
+from src.shared import runtime
+from src.shared.mcp_protocol import MCPNotification, MCPServer
+from src.shared.tenants import build_validator
+
+from .support import LocalSigner, http_request, percentile, use_local_keys
+
+SCENARIOS = ("initialize", "tools/list", "tools/call", "sse_fanout")
+
+
+class Harness:
+    """Authenticated clients with sessions on the command and stream endpoints
+
+    Use as a context manager: the harness's server and validator replace
+    the shared runtime instances only inside the block.
+    """
+
+    def __init__(self, clients: int):
+        self.signer = LocalSigner()
+        self.validator = build_validator()
+        use_local_keys(self.validator, self.signer)
+        # A fresh server per run keeps sessions and caches from leaking between runs
+        self.server = MCPServer()
+        self.clients: List[Tuple[str, str]] = []
+        for n in range(clients):
+            user_id = f"bench-user-{n}"
+            session_id = f"bench-session-{n}"
+            self.server.create_session(session_id, user_id)
+            self.clients.append((self.signer.mint_token(user_id), session_id))
+        self._installed = None
+
+    def __enter__(self) -> "Harness":
+        self._installed = runtime.configured(server=self.server, auth_validator=self.validator)
+        self._installed.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._installed.__exit__(*exc_info)
+        self._installed = None
+
+    def command_request(self, index: int, method: str, params: Optional[Dict[str, Any]] = None):
+        token, session_id = self.clients[index % len(self.clients)]
+        return http_request("POST", "mcp/command", {
+            "jsonrpc": "2.0", "id": index, "method": method, "params": params or {}
+        }, headers={
+            "Authorization": f"Bearer {token}",
+            "X-Session-Id": session_id,
+            "Content-Type": "application/json"
+        })
+
+    def stream_request(self, index: int, last_event_id: Optional[int] = None):
+        token, session_id = self.clients[index % len(self.clients)]
+        headers = {"Authorization": f"Bearer {token}", "X-Session-Id": session_id}
+        if last_event_id is not None:
+            headers["Last-Event-ID"] = str(last_event_id)
+        return http_request("GET", "mcp/stream", headers=headers)
+
+
+def _params(scenario: str, index: int) -> Dict[str, Any]:
+    if scenario == "initialize":
+        return {"clientInfo": {"name": "load-test", "version": "1.0.0"}, "capabilities": {"tools": True}}
+    if scenario == "tools/call":
+        # Distinct arguments so the idempotency cache does not short-circuit the tool
+        return {"name": "analyze_code", "arguments": {
+            "code": f"def handler_{index}(event):\n    return event\n", "language": "python"
+        }}
+    return {}
+
+
+async def run_command_scenario(harness: Harness, scenario: str, requests: int, concurrency: int,
+                               handler: Optional[Callable[..., Awaitable[Any]]] = None,
+                               prepare: Optional[Callable[[Any], Any]] = None
+                               ) -> Tuple[List[float], int, float]:
+    """Time handler(request); prepare, when given, converts each request untimed"""
+    handler = handler or mcp_command.main
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(index: int):
+        nonlocal errors
+        req = harness.command_request(index, scenario, _params(scenario, index))
+        if prepare is not None:
+            req = prepare(req)
+        async with semaphore:
+            start = time.perf_counter()
+            resp = await handler(req)
+            latencies.append((time.perf_counter() - start) * 1000)
+        if resp.status_code >= 300:
+            errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def run_sse_fanout(harness: Harness, messages: int) -> Tuple[List[float], int, float]:
+    """Deliver `messages` notifications in total, spread over the harness's sessions
+
+    Every client long-polls sse_stream.main, resuming with Last-Event-ID,
+    until it has seen its share.
+    """
+    sessions = [harness.server.get_session(session_id) for _, session_id in harness.clients]
+    per_session = max(1, messages // len(sessions))
+    latencies: List[float] = []
+    errors = 0
+
+    async def consume(index: int) -> int:
+        nonlocal errors
+        received, last_event_id = 0, None
+        while received < per_session:
+            resp = await sse_stream.main(harness.stream_request(index, last_event_id))
+            now = time.perf_counter()
+            if resp.status_code != 200:
+                errors += 1
+                break
+            for frame in resp.get_body().decode("utf-8").split("\n\n"):
+                fields = dict(line.split(": ", 1) for line in frame.split("\n") if ": " in line)
+                if "id" in fields:
+                    last_event_id = int(fields["id"])
+                sent = (json.loads(fields["data"]).get("params") or {}).get("sent") if "data" in fields else None
+                if sent is not None:
+                    latencies.append((now - sent) * 1000)
+                    received += 1
+        return received
+
+    consumers = [asyncio.create_task(consume(n)) for n in range(len(sessions))]
+    start = time.perf_counter()
+    for seq in range(per_session):
+        for session in sessions:
+            await session.send_message(MCPNotification(
+                method="notifications/message",
+                params={"seq": seq, "sent": time.perf_counter()}
+            ))
+        await asyncio.sleep(0)
+    delivered = sum(await asyncio.gather(*consumers))
+    elapsed = time.perf_counter() - start
+    return latencies, errors + len(sessions) * per_session - delivered, elapsed
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def run_scenario(scenario: str, requests: int, concurrency: int,
+                       trace_memory: bool = False) -> Dict[str, Any]:
+    if trace_memory:
+        tracemalloc.start()
+    with Harness(clients=max(concurrency, 1)) as harness:
+        if scenario == "sse_fanout":
+            latencies, errors, elapsed = await run_sse_fanout(harness, requests)
+        else:
+            latencies, errors, elapsed = await run_command_scenario(harness, scenario, requests, concurrency)
+    traced_peak = None
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    latencies.sort()
+    result = {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "duration_s": round(elapsed, 4),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "peak_rss_mb": _peak_rss_mb()
+    }
+    if traced_peak is not None:
+        result["traced_peak_kb"] = round(traced_peak / 1024, 1)
+    return result
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Describe every scenario that got slower than baseline by more than tolerance"""
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        base = previous.get((r["scenario"], r["concurrency"]))
+        if not base:
+            continue
+        if base["rps"] and r["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{r['scenario']} @ c={r['concurrency']}: rps {base['rps']} -> {r['rps']}")
+        if base["p95_ms"] and r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{r['scenario']} @ c={r['concurrency']}: p95 {base['p95_ms']} -> {r['p95_ms']} ms")
+    return regressions
+
+
+async def run_all(scenarios: List[str], concurrency_levels: List[int], requests: int,
+                  trace_memory: bool = False) -> Dict[str, Any]:
+    results = []
+    for scenario in scenarios:
+        for concurrency in concurrency_levels:
+            results.append(await run_scenario(scenario, requests, concurrency, trace_memory))
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": requests
+        },
+        "results": results
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,10,50", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests (or SSE messages) per run")
+    parser.add_argument("--trace-memory", action="store_true", help="Report tracemalloc peak (slower)")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+
+    report = asyncio.run(run_all(scenarios, levels, args.requests, args.trace_memory))
+
+    print(f"{'scenario':<12} {'conc':>5} {'reqs':>7} {'err':>5} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'rss MB':>7}")
+    for r in report["results"]:
+        print(f"{r['scenario']:<12} {r['concurrency']:>5} {r['requests']:>7} {r['errors']:>5} {r['rps']:>9} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['peak_rss_mb']:>7}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report["results"], json.load(f)["results"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""Replay a recorded traffic capture against the function handlers
+
+Record with MCP_RECORD_PATH set (see src/shared/recorder.py), then run
+from azure-mcp-server/:
+
+    python -m benchmarks.replay_traffic capture.jsonl [more.jsonl] --speed 1|10|max \
+        [--concurrency 50] [--output replay.json]
+
+Requests go in-process to mcp_command.main, mcp_endpoint.main and
+sse_stream.main. They are sent at their recorded offsets divided by
+--speed, whether or not earlier ones have finished, so bursts and
+overlapping streams arrive as they did in production. With --speed max
+they are sent back to back, at most --concurrency at a time. Each
+captured user gets a locally signed token and each captured session a
+server session.
+
+The report gives replayed p50/p95/p99 per route and method, next to the
+latency recorded in production. Errors count HTTP failures and JSON-RPC
+or tool errors inside a 200. It also gives the scheduling lag: how
+late requests went out. A lag that grows means the replay host cannot
+keep up with the chosen speed.
+"""
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import azure.functions as func
+
+from src.functions import mcp_command, mcp_endpoint, sse_stream
+from src.shared import runtime
+from src.shared.mcp_protocol import MCPServer
+from src.shared.recorder import COMMAND, ENDPOINT, STREAM, read_capture
+
+from .support import LocalSigner, http_request, percentile, use_local_keys
+
+HANDLERS: Dict[str, Callable[[func.HttpRequest], Awaitable[func.HttpResponse]]] = {
+    COMMAND: mcp_command.main,
+    ENDPOINT: mcp_endpoint.main,
+    STREAM: sse_stream.main,
+}
+ROUTES = {COMMAND: "mcp/command", ENDPOINT: "mcp", STREAM: "mcp/stream"}
+
+
+def parse_speed(value: str) -> Optional[float]:
+    """A --speed value as a factor, or None for max"""
+    value = value.lower()
+    if value == "max":
+        return None
+    speed = float(value[:-1] if value.endswith("x") else value)
+    if speed <= 0:
+        raise ValueError("speed must be positive")
+    return speed
+
+
+def failed(resp: func.HttpResponse) -> bool:
+    """Whether a replayed request failed, including errors inside a JSON 200"""
+    if resp.status_code >= 400:
+        return True
+    if not (resp.headers.get("Content-Type") or "").startswith("application/json") or not resp.get_body():
+        return False
+    body = json.loads(resp.get_body())
+    result = body.get("result") if isinstance(body, dict) else None
+    tool_result = result.get("toolResult") if isinstance(result, dict) else None
+    return "error" in body or (isinstance(tool_result, dict) and "error" in tool_result)
+
+
+def series_key(entry: Dict[str, Any]) -> str:
+    method = (entry.get("message") or {}).get("method")
+    return f"{entry['kind']} {method}" if method else entry["kind"]
+
+
+class Replay:
+    """Tokens, sessions and prebuilt requests for one capture"""
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        self.entries = [entry for entry in entries if entry.get("kind") in HANDLERS and entry.get("user")]
+        signer = LocalSigner()
+        use_local_keys(runtime.get_auth_validator(), signer)
+        # A fresh server keeps sessions and caches from an earlier run out
+        self.server = MCPServer()
+        runtime.configure(server=self.server)
+        tokens: Dict[str, str] = {}
+        for entry in self.entries:
+            user_id = f"replay-{entry['user']}"
+            if entry["user"] not in tokens:
+                tokens[entry["user"]] = signer.mint_token(user_id)
+            session = entry.get("session")
+            if session and self.server.get_session(f"replay-{session}") is None:
+                self.server.create_session(f"replay-{session}", user_id)
+        # Built up front so token and JSON work stay out of the timing
+        self.requests = [self._request(entry, tokens[entry["user"]]) for entry in self.entries]
+
+    @staticmethod
+    def _request(entry: Dict[str, Any], token: str) -> func.HttpRequest:
+        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+        if entry.get("session"):
+            headers["X-Session-Id"] = headers["Mcp-Session-Id"] = f"replay-{entry['session']}"
+        if entry["kind"] == STREAM:
+            return http_request("GET", ROUTES[STREAM], headers=headers)
+        return http_request("POST", ROUTES[entry["kind"]], entry.get("message"), headers=headers)
+
+
+async def replay(entries: List[Dict[str, Any]], speed: Optional[float],
+                 concurrency: int = 50) -> Tuple[List[Tuple[str, float, float, bool]], List[float], float]:
+    """(series, replayed ms, recorded ms, failed) per request, lags in ms, elapsed seconds"""
+    plan = Replay(entries)
+    semaphore = asyncio.Semaphore(concurrency) if speed is None else None
+    samples: List[Tuple[str, float, float, bool]] = []
+    lags: List[float] = []
+
+    async def one(entry: Dict[str, Any], req: func.HttpRequest):
+        started = time.perf_counter()
+        resp = await HANDLERS[entry["kind"]](req)
+        elapsed = (time.perf_counter() - started) * 1000
+        samples.append((series_key(entry), elapsed, entry.get("ms", 0.0), failed(resp)))
+
+    async def bounded(entry: Dict[str, Any], req: func.HttpRequest):
+        async with semaphore:
+            await one(entry, req)
+
+    tasks = []
+    start = time.perf_counter()
+    first = plan.entries[0]["t"] if plan.entries else 0.0
+    for entry, req in zip(plan.entries, plan.requests):
+        if speed is None:
+            tasks.append(asyncio.create_task(bounded(entry, req)))
+            continue
+        due = start + (entry["t"] - first) / 1000 / speed
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        lags.append(max(0.0, time.perf_counter() - due) * 1000)
+        tasks.append(asyncio.create_task(one(entry, req)))
+    await asyncio.gather(*tasks)
+    return samples, lags, time.perf_counter() - start
+
+
+def summarize(samples: List[Tuple[str, float, float, bool]], lags: List[float], elapsed: float,
+              speed: Optional[float]) -> Dict[str, Any]:
+    grouped: Dict[str, List[Tuple[float, float, bool]]] = {}
+    for key, replayed, recorded, error in samples:
+        grouped.setdefault(key, []).append((replayed, recorded, error))
+    series = []
+    for key, rows in sorted(grouped.items()):
+        replayed = sorted(row[0] for row in rows)
+        recorded = sorted(row[1] for row in rows)
+        series.append({
+            "series": key,
+            "requests": len(rows),
+            "errors": sum(1 for row in rows if row[2]),
+            "p50_ms": round(percentile(replayed, 0.50), 3),
+            "p95_ms": round(percentile(replayed, 0.95), 3),
+            "p99_ms": round(percentile(replayed, 0.99), 3),
+            "recorded_p50_ms": round(percentile(recorded, 0.50), 3),
+            "recorded_p99_ms": round(percentile(recorded, 0.99), 3),
+        })
+    lags.sort()
+    return {
+        "speed": "max" if speed is None else speed,
+        "requests": len(samples),
+        "duration_s": round(elapsed, 3),
+        "rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "lag_p99_ms": round(percentile(lags, 0.99), 3),
+        "series": series
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("captures", nargs="+", help="Capture files written with MCP_RECORD_PATH")
+    parser.add_argument("--speed", default="1", help="1, 10, ... or max")
+    parser.add_argument("--concurrency", type=int, default=50, help="In-flight limit at --speed max")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        speed = parse_speed(args.speed)
+    except ValueError as e:
+        parser.error(f"--speed: {str(e)}")
+    entries = read_capture(*args.captures)
+    logging.disable(logging.INFO)
+    report = summarize(*asyncio.run(replay(entries, speed, args.concurrency)), speed)
+
+    print(f"{report['requests']} requests in {report['duration_s']} s at speed {report['speed']} "
+          f"({report['rps']} rps, p99 scheduling lag {report['lag_p99_ms']} ms)")
+    print(f"{'series':<28} {'reqs':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'rec p50':>8} {'rec p99':>8}")
+    for s in report["series"]:
+        print(f"{s['series']:<28} {s['requests']:>6} {s['errors']:>4} {s['p50_ms']:>8} {s['p95_ms']:>8} "
+              f"{s['p99_ms']:>8} {s['recorded_p50_ms']:>8} {s['recorded_p99_ms']:>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""analyze_workspace throughput: files per second against worker count
+
+Run from azure-mcp-server/:
+
+    python -m benchmarks.workspace_benchmark --files 2000 [--workers 1,2,4,8] [--executor process]
+
+Each level analyzes the same synthetic project (Python modules of a few
+hundred lines) with a cold cache on a fresh pool, after one warm-up run
+that starts the workers. "cached files/s" repeats the run with the
+content-hash cache filled: the cost of re-reviewing an unchanged
+project. Scaling needs real cores; on a single core extra workers only
+add overhead.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.shared.workspace import AnalysisCache, WorkspaceAnalyzer
+
+MODULE = '''import os
+import subprocess
+
+
+class Handler{n}:
+    """Request handler {n}"""
+
+    def __init__(self, config):
+        self.config = config
+        self.api_key = "sk-{n:08d}-example"
+
+    def process(self, items):
+        results = []
+        for item in items:
+            if item.get("enabled"):
+                for child in item.get("children", []):
+                    for leaf in child:
+                        if leaf and leaf % 2 == 0:
+                            results.append(leaf)
+            elif item.get("legacy"):
+                try:
+                    results.append(eval(item["expr"]))
+                except:
+                    pass
+        return results
+
+    def run(self, command):
+        # TODO: validate command
+        return subprocess.run(command, shell=True)
+'''
+
+
+def build_project(count: int) -> List[Tuple[str, bytes]]:
+    # Repeat the module body to a realistic file size, with unique content per file
+    return [(f"pkg{n % 20}/module_{n}.py", "\n".join(MODULE.format(n=n * 10 + k) for k in range(8)).encode())
+            for n in range(count)]
+
+
+def default_levels() -> str:
+    cores = os.cpu_count() or 1
+    return ",".join(str(n) for n in sorted({1, 2, 4, 8, cores}) if n <= cores)
+
+
+async def measure(files: List[Tuple[str, bytes]], workers: int, executor: str) -> Dict[str, Any]:
+    analyzer = WorkspaceAnalyzer(workers=workers, executor=executor, cache=AnalysisCache(0))
+    try:
+        # Start the workers outside the timing
+        await analyzer.analyze(files[:workers])
+        started = time.perf_counter()
+        await analyzer.analyze(files)
+        elapsed = time.perf_counter() - started
+
+        analyzer.cache.max_entries = len(files)
+        await analyzer.analyze(files)
+        started = time.perf_counter()
+        await analyzer.analyze(files)
+        cached = time.perf_counter() - started
+    finally:
+        analyzer.close()
+    return {"workers": workers, "seconds": round(elapsed, 3), "files_per_second": round(len(files) / elapsed, 1),
+            "cached_files_per_second": round(len(files) / cached, 1)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--workers", default=default_levels())
+    parser.add_argument("--executor", choices=("process", "thread"), default="process")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    files = build_project(args.files)
+    size_mb = sum(len(content) for _, content in files) / 1e6
+    print(f"{args.files} files, {size_mb:.1f} MB, {os.cpu_count()} cores, {args.executor} pool")
+
+    results = []
+    for workers in (int(n) for n in args.workers.split(",") if n):
+        results.append(asyncio.run(measure(files, workers, args.executor)))
+
+    base = results[0]["files_per_second"] if results else 0
+    print(f"{'workers':>7} {'seconds':>9} {'files/s':>10} {'speedup':>8} {'cached files/s':>15}")
+    for r in results:
+        r["speedup"] = round(r["files_per_second"] / base, 2) if base else 0
+        print(f"{r['workers']:>7} {r['seconds']:>9} {r['files_per_second']:>10} {r['speedup']:>8} "
+              f"{r['cached_files_per_second']:>15}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,19 @@
+"""Local stand-ins for Azure AD and API Management
+
+Lets the whole request path (token issue, JWKS fetch, gateway JWT check,
+function handlers) run on one machine without cloud resources.
+"""
+from .keys import KeyRing, SigningKey
+from .identity import FakeAzureAD
+from .gateway import ApimGateway, HttpBackend, InProcessBackend
+from .stack import LocalStack
+
+__all__ = [
+    "KeyRing",
+    "SigningKey",
+    "FakeAzureAD",
+    "ApimGateway",
+    "HttpBackend",
+    "InProcessBackend",
+    "LocalStack",
+]
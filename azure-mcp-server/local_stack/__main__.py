@@ -0,0 +1,65 @@
+"""Run the local stand-in stack
+
+    cd azure-mcp-server
+    python -m local_stack                                # handlers in-process
+    python -m local_stack --backend http://localhost:7071  # in front of `func start`
+
+Prints the environment for the Functions host and for the integration
+tests, then serves until interrupted.
+"""
+import sys
+import asyncio
+import argparse
+import logging
+from typing import List, Optional
+
+from .stack import LocalStack, DEFAULT_TENANT_ID, DEFAULT_CLIENT_ID, DEFAULT_CLIENT_SECRET
+
+
+async def _run(args: argparse.Namespace):
+    stack = LocalStack(
+        tenant_id=args.tenant_id,
+        client_id=args.client_id,
+        client_secret=args.client_secret,
+        backend=None if args.backend == "inprocess" else args.backend,
+        host=args.host,
+        identity_port=args.identity_port,
+        gateway_port=args.gateway_port,
+        rotate_every=args.rotate_every,
+        function_key=args.function_key
+    )
+    async with stack:
+        print("# Functions host settings")
+        for name, value in stack.server_environment().items():
+            print(f"export {name}={value}")
+        print("# Integration test settings")
+        for name, value in stack.client_environment().items():
+            print(f"export {name}={value}")
+        sys.stdout.flush()
+        await asyncio.Event().wait()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Local Azure AD and APIM stand-ins")
+    parser.add_argument("--backend", default="inprocess",
+                        help="Functions host base URL, or 'inprocess' to call the handlers directly")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--identity-port", type=int, default=8400)
+    parser.add_argument("--gateway-port", type=int, default=8080)
+    parser.add_argument("--tenant-id", default=DEFAULT_TENANT_ID)
+    parser.add_argument("--client-id", default=DEFAULT_CLIENT_ID)
+    parser.add_argument("--client-secret", default=DEFAULT_CLIENT_SECRET)
+    parser.add_argument("--rotate-every", type=float, help="Roll the signing key every N seconds")
+    parser.add_argument("--function-key", help="Sent to the backend as x-functions-key")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""Thin reverse proxy standing in for API Management
+
+Applies the parts of infrastructure/opentofu/policies/simple-jwt-policy.xml
+that sit on the request path: validate-jwt, the x-functions-key header and
+the CORS policy, then maps the API path (/mcp/...) onto the function app's
+routes (/api/mcp/...). Responses are streamed back chunk by chunk so SSE
+passes through unbuffered.
+"""
+import json
+import importlib
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+from multidict import CIMultiDict
+
+DEFAULT_ALLOWED_ORIGINS = (
+    "http://localhost:5500",
+    "http://127.0.0.1:5500",
+    "https://github.com",
+    "https://copilot.github.com"
+)
+
+# Not forwarded in either direction
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te",
+    "trailer", "transfer-encoding", "upgrade", "host", "content-length"
+})
+
+Handler = Callable[..., Awaitable[Any]]
+
+FUNCTIONS_DIR = Path(__file__).resolve().parent.parent / "src" / "functions"
+
+
+def _forwardable(headers: Iterable) -> Dict[str, str]:
+    return {name: value for name, value in headers if name.lower() not in HOP_BY_HOP_HEADERS}
+
+
+class HttpBackend:
+    """Forwards to a running Functions host, e.g. `func start` on :7071"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def handle(self, request: web.Request, path: str, headers: Dict[str, str], body: bytes,
+                     extra_headers: Dict[str, str]) -> web.StreamResponse:
+        if self._session is None:
+            # One pooled session for the gateway's lifetime; content codings pass through untouched
+            self._session = aiohttp.ClientSession(auto_decompress=False)
+        async with self._session.request(request.method, f"{self.base_url}{path}", params=request.query,
+                                         headers=headers, data=body or None) as upstream:
+            response = web.StreamResponse(status=upstream.status, headers={
+                **_forwardable(upstream.headers.items()), **extra_headers
+            })
+            await response.prepare(request)
+            async for chunk in upstream.content.iter_any():
+                await response.write(chunk)
+            await response.write_eof()
+            return response
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class InProcessBackend:
+    """Calls the function handlers directly instead of a Functions host
+
+    Routes and methods come from each src/functions/*/function.json, so
+    only the Python worker is on the measured path. Handler responses are
+    complete bodies, as func.HttpResponse cannot carry a stream.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Handler]] = None):
+        # route -> (handler, allowed methods or None for any)
+        self.routes: Dict[str, Tuple[Handler, Optional[FrozenSet[str]]]] = (
+            {route: (handler, None) for route, handler in routes.items()} if routes is not None
+            else self.discover_routes()
+        )
+
+    @staticmethod
+    def discover_routes() -> Dict[str, Tuple[Handler, Optional[FrozenSet[str]]]]:
+        routes = {}
+        for config_path in sorted(FUNCTIONS_DIR.glob("*/function.json")):
+            config = json.loads(config_path.read_text())
+            trigger = next((b for b in config.get("bindings", []) if b.get("type") == "httpTrigger"), None)
+            if not trigger:
+                continue
+            name = config_path.parent.name
+            module = importlib.import_module(f"src.functions.{name}")
+            methods = frozenset(m.upper() for m in trigger.get("methods", [])) or None
+            routes[trigger.get("route") or name] = (module.main, methods)
+        return routes
+
+    async def handle(self, request: web.Request, path: str, headers: Dict[str, str], body: bytes,
+                     extra_headers: Dict[str, str]) -> web.StreamResponse:
+        import azure.functions as func
+
+        route = path[len("/api/"):] if path.startswith("/api/") else path.lstrip("/")
+        if route not in self.routes:
+            return web.json_response({"statusCode": 404, "message": "Resource not found"}, status=404)
+        handler, methods = self.routes[route]
+        if methods is not None and request.method not in methods:
+            return web.Response(status=405, headers=extra_headers)
+
+        result = await handler(func.HttpRequest(
+            request.method, f"http://{request.host}{path}", headers=headers, params=dict(request.query), body=body
+        ))
+        response_headers = CIMultiDict(_forwardable(result.headers.items()))
+        response_headers.setdefault("Content-Type", result.mimetype)
+        response_headers.update(extra_headers)
+        return web.Response(status=result.status_code, headers=response_headers, body=result.get_body())
+
+    async def close(self):
+        pass
+
+
+class ApimGateway:
+    """API path prefix, validate-jwt and CORS in front of a backend"""
+
+    def __init__(self, backend: Any, validator: Any, api_path: str = "/mcp", backend_path: str = "/api/mcp",
+                 function_key: Optional[str] = None,
+                 allowed_origins: Iterable[str] = DEFAULT_ALLOWED_ORIGINS):
+        self.backend = backend
+        self.validator = validator
+        self.api_path = api_path.rstrip("/")
+        self.backend_path = backend_path.rstrip("/")
+        self.function_key = function_key
+        self.allowed_origins = frozenset(allowed_origins)
+        self.rejected = 0
+        self.forwarded = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", self.api_path + "{tail:(/.*)?}", self.handle)
+        app.on_cleanup.append(self._close)
+        return app
+
+    async def _close(self, app: web.Application):
+        await self.backend.close()
+        await self.validator.close()
+
+    def _cors_headers(self, request: web.Request) -> Dict[str, str]:
+        origin = request.headers.get("Origin")
+        if origin not in self.allowed_origins:
+            return {}
+        return {
+            "Access-Control-Allow-Origin": origin,
+            "Access-Control-Allow-Credentials": "true",
+            "Vary": "Origin"
+        }
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        cors = self._cors_headers(request)
+        if request.method == "OPTIONS":
+            # The cors policy answers preflight without reaching the backend
+            return web.Response(status=200, headers={
+                **cors,
+                "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+                "Access-Control-Allow-Headers": "Authorization, Content-Type, X-Session-Id"
+            })
+
+        auth_header = request.headers.get("Authorization", "")
+        if not auth_header.startswith("Bearer "):
+            return self._unauthorized(cors)
+        try:
+            await self.validator.validate_token(auth_header[len("Bearer "):])
+        except Exception:
+            return self._unauthorized(cors)
+
+        headers = _forwardable(request.headers.items())
+        if self.function_key:
+            headers["x-functions-key"] = self.function_key
+        body = await request.read()
+        self.forwarded += 1
+        path = self.backend_path + request.match_info["tail"]
+        return await self.backend.handle(request, path, headers, body, cors)
+
+    def _unauthorized(self, cors: Dict[str, str]) -> web.Response:
+        self.rejected += 1
+        return web.json_response({"statusCode": 401, "message": "Unauthorized"}, status=401, headers=cors)
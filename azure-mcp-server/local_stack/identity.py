@@ -0,0 +1,140 @@
+"""Stand-in for the Azure AD endpoints the server and clients use
+
+Serves, per tenant:
+
+    GET  /{tenant}/v2.0/.well-known/openid-configuration
+    GET  /{tenant}/discovery/v2.0/keys
+    POST /{tenant}/oauth2/v2.0/token        (client_credentials only)
+    POST /_admin/rotate                      (roll the signing key)
+
+Tokens look like the v1 app-only access tokens Azure AD issues for an
+`api://{client_id}/.default` scope: issuer https://sts.windows.net/{tenant}/,
+audience `api://{client_id}` and a `roles` claim instead of `scp`.
+"""
+import time
+import uuid
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from .keys import KeyRing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROLES = ["MCP.Access"]
+
+
+class FakeAzureAD:
+    """Token issuer and JWKS host for one tenant"""
+
+    def __init__(self, tenant_id: str, clients: Dict[str, str], roles: Optional[List[str]] = None,
+                 token_lifetime: int = 3600, issuer: Optional[str] = None, retain_keys: int = 1):
+        self.tenant_id = tenant_id
+        self.clients = dict(clients)
+        self.roles = roles or DEFAULT_ROLES
+        self.token_lifetime = token_lifetime
+        self.issuer = issuer or f"https://sts.windows.net/{tenant_id}/"
+        self.keys = KeyRing(retain=retain_keys)
+        self.tokens_issued = 0
+        self.jwks_requests = 0
+
+    def app(self, rotate_every: Optional[float] = None) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/{tenant}/v2.0/.well-known/openid-configuration", self.openid_configuration)
+        app.router.add_get("/{tenant}/discovery/v2.0/keys", self.jwks)
+        app.router.add_get("/{tenant}/discovery/keys", self.jwks)
+        app.router.add_post("/{tenant}/oauth2/v2.0/token", self.token)
+        app.router.add_post("/_admin/rotate", self.rotate)
+        if rotate_every:
+            app.cleanup_ctx.append(self._rotation_task(rotate_every))
+        return app
+
+    def _rotation_task(self, interval: float):
+        async def ctx(app: web.Application):
+            async def loop():
+                while True:
+                    await asyncio.sleep(interval)
+                    key = self.keys.rotate()
+                    logger.info(f"Rotated signing key, active kid={key.kid}")
+            task = asyncio.create_task(loop())
+            yield
+            task.cancel()
+        return ctx
+
+    def issue_token(self, client_id: str, resource: str) -> str:
+        """Mint an app-only access token for client_id"""
+        now = int(time.time())
+        object_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{self.tenant_id}/{client_id}"))
+        self.tokens_issued += 1
+        return self.keys.sign({
+            "iss": self.issuer,
+            "aud": resource,
+            "sub": object_id,
+            "oid": object_id,
+            "tid": self.tenant_id,
+            "appid": client_id,
+            "idtyp": "app",
+            "roles": self.roles,
+            "iat": now,
+            "nbf": now,
+            "exp": now + self.token_lifetime,
+            "ver": "1.0"
+        })
+
+    def _check_tenant(self, request: web.Request):
+        if request.match_info["tenant"] != self.tenant_id:
+            raise web.HTTPBadRequest(
+                content_type="application/json",
+                text='{"error": "invalid_tenant", "error_description": "AADSTS90002: Tenant not found."}'
+            )
+
+    async def openid_configuration(self, request: web.Request) -> web.Response:
+        self._check_tenant(request)
+        base = f"{request.scheme}://{request.host}/{self.tenant_id}"
+        return web.json_response({
+            "issuer": self.issuer,
+            "token_endpoint": f"{base}/oauth2/v2.0/token",
+            "jwks_uri": f"{base}/discovery/v2.0/keys",
+            "id_token_signing_alg_values_supported": ["RS256"],
+            "token_endpoint_auth_methods_supported": ["client_secret_post"]
+        })
+
+    async def jwks(self, request: web.Request) -> web.Response:
+        self._check_tenant(request)
+        self.jwks_requests += 1
+        return web.json_response(self.keys.jwks())
+
+    async def token(self, request: web.Request) -> web.Response:
+        self._check_tenant(request)
+        form = await request.post()
+        if form.get("grant_type") != "client_credentials":
+            return _oauth_error("unsupported_grant_type",
+                                "AADSTS70003: The app requested an unsupported grant type.")
+        client_id = form.get("client_id")
+        if client_id not in self.clients or self.clients[client_id] != form.get("client_secret"):
+            return _oauth_error("invalid_client", "AADSTS7000215: Invalid client secret provided.", 401)
+        scope = form.get("scope", "")
+        if not scope.endswith("/.default"):
+            return _oauth_error("invalid_scope",
+                                "AADSTS1002012: The provided value for scope is not valid. "
+                                "Client credential flows must have a scope value with /.default suffixed.")
+        token = self.issue_token(client_id, scope[:-len("/.default")])
+        return web.json_response({
+            "token_type": "Bearer",
+            "expires_in": self.token_lifetime,
+            "ext_expires_in": self.token_lifetime,
+            "access_token": token
+        })
+
+    async def rotate(self, request: web.Request) -> web.Response:
+        key = self.keys.rotate()
+        return web.json_response({
+            "active": key.kid,
+            "published": [k.kid for k in self.keys.published()]
+        })
+
+
+def _oauth_error(error: str, description: str, status: int = 400) -> web.Response:
+    return web.json_response({"error": error, "error_description": description}, status=status)
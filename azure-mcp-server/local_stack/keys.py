@@ -0,0 +1,74 @@
+import time
+import uuid
+import base64
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+
+def _b64url_uint(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+class SigningKey:
+    """RS256 private key published as a JWK"""
+
+    def __init__(self, kid: Optional[str] = None, key_size: int = 2048):
+        self.kid = kid or uuid.uuid4().hex
+        self.created_at = time.time()
+        self._key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+        self._pem = self._key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        )
+
+    def jwk(self) -> Dict[str, Any]:
+        numbers = self._key.public_key().public_numbers()
+        return {
+            "kty": "RSA",
+            "use": "sig",
+            "alg": "RS256",
+            "kid": self.kid,
+            "n": _b64url_uint(numbers.n),
+            "e": _b64url_uint(numbers.e)
+        }
+
+    def sign(self, claims: Dict[str, Any]) -> str:
+        return jwt.encode(claims, self._pem, algorithm="RS256", headers={"kid": self.kid})
+
+
+class KeyRing:
+    """Signing keys rotated the way Azure AD rolls them
+
+    The next key is published in the JWKS before it signs anything, so a
+    validator holding a cached key set keeps accepting tokens across a
+    rotation. Retired keys stay published for `retain` rotations.
+    """
+
+    def __init__(self, retain: int = 1):
+        self.active = SigningKey()
+        self.next = SigningKey()
+        self.retired: Deque[SigningKey] = deque(maxlen=retain)
+        self.rotations = 0
+
+    def rotate(self) -> SigningKey:
+        """Promote the staged key and stage a new one"""
+        if self.retired.maxlen:
+            self.retired.appendleft(self.active)
+        self.active, self.next = self.next, SigningKey()
+        self.rotations += 1
+        return self.active
+
+    def published(self) -> List[SigningKey]:
+        return [self.active, self.next, *self.retired]
+
+    def jwks(self) -> Dict[str, Any]:
+        return {"keys": [key.jwk() for key in self.published()]}
+
+    def sign(self, claims: Dict[str, Any]) -> str:
+        return self.active.sign(claims)
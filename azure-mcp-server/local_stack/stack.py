@@ -0,0 +1,95 @@
+import os
+from typing import Any, Dict, List, Optional, Union
+
+from aiohttp import web
+
+from src.shared.auth import AzureADAuthValidator
+
+from .identity import FakeAzureAD
+from .gateway import ApimGateway, HttpBackend, InProcessBackend
+
+DEFAULT_TENANT_ID = "00000000-0000-0000-0000-0000000000aa"
+DEFAULT_CLIENT_ID = "11111111-1111-1111-1111-1111111111aa"
+DEFAULT_CLIENT_SECRET = "local-stack-secret"
+
+
+class LocalStack:
+    """Fake Azure AD plus APIM gateway, each on its own local port
+
+    `backend` is a Functions host URL, a backend object, or None to call
+    the function handlers in this process. The in-process backend imports
+    the function modules after exporting server_environment(), so their
+    validators trust the fake identity provider.
+    """
+
+    def __init__(self, tenant_id: str = DEFAULT_TENANT_ID, client_id: str = DEFAULT_CLIENT_ID,
+                 client_secret: str = DEFAULT_CLIENT_SECRET, backend: Union[str, Any, None] = None,
+                 host: str = "127.0.0.1", identity_port: int = 0, gateway_port: int = 0,
+                 rotate_every: Optional[float] = None, function_key: Optional[str] = None):
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.host = host
+        self.identity_port = identity_port
+        self.gateway_port = gateway_port
+        self.rotate_every = rotate_every
+        self.function_key = function_key
+        self._backend = backend
+        self.identity = FakeAzureAD(tenant_id, {client_id: client_secret})
+        self.gateway: Optional[ApimGateway] = None
+        self.authority_host: Optional[str] = None
+        self.gateway_url: Optional[str] = None
+        self._runners: List[web.AppRunner] = []
+
+    async def _serve(self, app: web.Application, port: int) -> str:
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, self.host, port).start()
+        self._runners.append(runner)
+        bound_port = runner.addresses[0][1]
+        return f"http://{self.host}:{bound_port}"
+
+    async def start(self) -> "LocalStack":
+        self.authority_host = await self._serve(self.identity.app(self.rotate_every), self.identity_port)
+
+        if isinstance(self._backend, str):
+            backend = HttpBackend(self._backend)
+        elif self._backend is None:
+            os.environ.update(self.server_environment())
+            backend = InProcessBackend()
+        else:
+            backend = self._backend
+
+        validator = AzureADAuthValidator(self.tenant_id, self.client_id, authority_host=self.authority_host)
+        self.gateway = ApimGateway(backend, validator, function_key=self.function_key)
+        self.gateway_url = await self._serve(self.gateway.app(), self.gateway_port)
+        return self
+
+    async def stop(self):
+        for runner in reversed(self._runners):
+            await runner.cleanup()
+        self._runners.clear()
+
+    async def __aenter__(self) -> "LocalStack":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    def server_environment(self) -> Dict[str, str]:
+        """Settings for a Functions host validating tokens from this stack"""
+        return {
+            "AZURE_TENANT_ID": self.tenant_id,
+            "AZURE_CLIENT_ID": self.client_id,
+            "AZURE_AUTHORITY_HOST": self.authority_host
+        }
+
+    def client_environment(self) -> Dict[str, str]:
+        """Settings for tests/test_mcp_integration.py"""
+        return {
+            "API_BASE_URL": self.gateway_url,
+            "AUTHORITY_HOST": self.authority_host,
+            "TENANT_ID": self.tenant_id,
+            "CLIENT_ID": self.client_id,
+            "CLIENT_SECRET": self.client_secret
+        }
@@ -1,174 +1,157 @@
 import azure.functions as func
 import logging
 import json
-import asyncio
-import os
-from datetime import datetime
-from opencensus.ext.azure.log_exporter import AzureLogHandler
+import time
+from typing import Any, Dict, Optional, Tuple, Union
 
-from ..shared.auth import AzureADAuthValidator, TokenManager
-from ..shared.mcp_protocol import (
-    MCPServer, MCPRequest, MCPResponse, MCPError, MCPSession
-)
+from ..shared import runtime
+from ..shared.mcp_protocol import MCPRequest, STATIC_RESPONSE_METHODS
+from ..shared.client_requests import is_response
+from ..shared.compression import encode_body
+from ..shared.deadlines import RequestContext, timeout_from_headers
+from ..shared import responses
+from ..shared.responses import ResponseBuilder
+from ..shared.sampled_log import SampledLogger
+from ..shared.telemetry import span
+from ..shared import log_pipeline
+from ..shared.recorder import recorder, COMMAND
+from ..shared.metrics import registry
 
 logger = logging.getLogger(__name__)
 
-# Configure Application Insights
-if "APPLICATIONINSIGHTS_CONNECTION_STRING" in os.environ:
-    logger.addHandler(AzureLogHandler())
+# Application Insights export runs on the log pipeline's thread
+log_pipeline.attach(logger)
+
+
+REQUESTS = registry.counter("mcp_requests_total", "Handled MCP commands", labelnames=("method", "status"))
+REJECTED = registry.counter("mcp_command_rejected_total", "Commands rejected before dispatch",
+                            labelnames=("reason",))
+
+RESPONSES = ResponseBuilder(methods="POST, OPTIONS")
+# Identical failures (e.g. one expired-token wave) are logged a few times per interval
+error_log = SampledLogger(logger)
+
+
+def _parse_message(req: func.HttpRequest) -> Tuple[Optional[Union[MCPRequest, Dict[str, Any]]], Optional[str]]:
+    """The body as an MCPRequest (or a client's response dict), or the reason it is neither"""
+    try:
+        data = json.loads(req.get_body())
+        if is_response(data):
+            return data, None
+        return MCPRequest.model_validate(data), None
+    except ValueError as e:
+        # json's and pydantic's errors are both ValueErrors
+        return None, str(e).split("\n", 1)[0]
+
+
+def _accepted(request_id) -> func.HttpResponse:
+    """202 acknowledging a request whose response will arrive over SSE"""
+    return RESPONSES.json_bytes(json.dumps({
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "result": {"status": "accepted"}
+    }).encode("utf-8"), 202)
 
-auth_validator = AzureADAuthValidator()
-token_manager = TokenManager()
-mcp_server = MCPServer()
 
 async def main(req: func.HttpRequest) -> func.HttpResponse:
     """Command endpoint for MCP requests"""
-    logger.info("MCP command endpoint called")
-    
-    # Handle CORS preflight
+    # Handle CORS preflight before any auth or JSON work
     if req.method == "OPTIONS":
-        return func.HttpResponse(
-            "",
-            status_code=204,
-            headers={
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "Authorization, X-Session-Id, Content-Type",
-                "Access-Control-Allow-Methods": "POST, OPTIONS"
-            }
-        )
+        return RESPONSES.preflight()
+    
+    started = time.perf_counter()
+    logger.info("MCP command endpoint called")
     
     # Extract authorization header
     auth_header = req.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
-        return func.HttpResponse(
-            json.dumps({"error": "Missing or invalid authorization header"}),
-            status_code=401,
-            headers={
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*"
-            }
-        )
+        return RESPONSES.json_bytes(responses.MISSING_AUTHORIZATION, 401)
     
     token = auth_header.split(" ")[1]
+    mcp_server = runtime.get_server()
     
     try:
-        # Validate token
-        token_data = await auth_validator.validate_token(token)
+        # Validate token; rejections come back as a result, not an exception
+        with span("auth.validate_token"):
+            check = await runtime.get_auth_validator().check_token(token)
+        if not check.ok:
+            REJECTED.inc(reason="auth")
+            error_log.warning("Authentication error", check.error)
+            return RESPONSES.error(responses.AUTHENTICATION_ERROR, 401)
+        token_data = check.claims
         user_id = token_data.get("sub")
         
         # Get session
         session_id = req.headers.get("X-Session-Id")
         if not session_id:
-            return func.HttpResponse(
-                json.dumps({"error": "Missing session ID"}),
-                status_code=400,
-                headers={
-                    "Content-Type": "application/json",
-                    "Access-Control-Allow-Origin": "*"
-                }
-            )
+            REJECTED.inc(reason="session")
+            return RESPONSES.json_bytes(responses.MISSING_SESSION, 400)
         
-        session = mcp_server.get_session(session_id)
+        with span("session.lookup"):
+            session = await mcp_server.find_session(session_id)
         if not session or session.user_id != user_id:
-            return func.HttpResponse(
-                json.dumps({"error": "Invalid session"}),
-                status_code=401,
-                headers={
-                    "Content-Type": "application/json",
-                    "Access-Control-Allow-Origin": "*"
-                }
-            )
+            REJECTED.inc(reason="session")
+            return RESPONSES.json_bytes(responses.INVALID_SESSION, 401)
         
         # Parse request body
-        try:
-            request_data = req.get_json()
-            mcp_request = MCPRequest(**request_data)
-        except Exception as e:
-            return func.HttpResponse(
-                json.dumps({
-                    "jsonrpc": "2.0",
-                    "id": None,
-                    "error": {
-                        "code": -32700,
-                        "message": "Parse error",
-                        "data": str(e)
-                    }
-                }),
-                status_code=400,
-                headers={
-                    "Content-Type": "application/json",
-                    "Access-Control-Allow-Origin": "*"
-                }
-            )
+        with span("request.parse"):
+            mcp_request, parse_error = _parse_message(req)
+        if mcp_request is None:
+            REJECTED.inc(reason="parse")
+            error_log.info("Unparseable MCP request", parse_error)
+            return RESPONSES.error(responses.PARSE_ERROR, 400)
+        
+        if isinstance(mcp_request, dict):
+            # The client answering a request this server sent over SSE
+            if mcp_server.handle_client_response(session, mcp_request):
+                return RESPONSES.empty(202)
+            REJECTED.inc(reason="unknown_response")
+            return RESPONSES.json_bytes(responses.UNKNOWN_REQUEST_ID, 404)
         
         # Log request
-        logger.info(f"MCP request: method={mcp_request.method}, user={user_id}")
+        logger.info("MCP request: method=%s, user=%s", mcp_request.method, user_id)
+        
+        # Tools that wait on the client run after this invocation returns
+        if mcp_server.runs_deferred(mcp_request, session):
+            mcp_server.start_deferred(mcp_request, session)
+            REQUESTS.inc(method=mcp_request.method, status="deferred")
+            log_pipeline.audit(user_id, mcp_request, started, "deferred")
+            recorder.record(COMMAND, started, session_id, user_id, mcp_request, 202)
+            return _accepted(mcp_request.id)
         
         # Handle request
-        response = await mcp_server.handle_request(mcp_request, session)
+        with span("request.handle", method=mcp_request.method):
+            response = await mcp_server.handle_request(
+                mcp_request, session, RequestContext(timeout_from_headers(req.headers))
+            )
+        REQUESTS.inc(method=mcp_request.method, status="ok" if response.error is None else "error")
+        log_pipeline.audit(user_id, mcp_request, started,
+                           "ok" if response.error is None else f"error:{response.error.code}")
         
         # Send response via SSE if needed
         if response.result and "async" in response.result:
             # Queue response for SSE delivery
             await session.send_message(response)
+            recorder.record(COMMAND, started, session_id, user_id, mcp_request, 202)
             
             # Return acknowledgment
-            return func.HttpResponse(
-                json.dumps({
-                    "jsonrpc": "2.0",
-                    "id": mcp_request.id,
-                    "result": {"status": "accepted"}
-                }),
-                status_code=202,
-                headers={
-                    "Content-Type": "application/json",
-                    "Access-Control-Allow-Origin": "*"
-                }
-            )
+            return _accepted(mcp_request.id)
         else:
-            # Return direct response
+            # Return direct response, compressed when large enough
+            with span("response.serialize", method=mcp_request.method):
+                body, encoding_headers = encode_body(
+                    mcp_server.encode_response(mcp_request, response),
+                    req.headers.get("Accept-Encoding"),
+                    static=mcp_request.method in STATIC_RESPONSE_METHODS
+                )
+            status_code, status_headers = responses.status_for(response.error)
+            recorder.record(COMMAND, started, session_id, user_id, mcp_request, status_code, len(body))
             return func.HttpResponse(
-                json.dumps(response.model_dump(exclude_none=True)),
-                status_code=200 if response.error is None else 400,
-                headers={
-                    "Content-Type": "application/json",
-                    "Access-Control-Allow-Origin": "*"
-                }
+                body,
+                status_code=status_code,
+                headers={**RESPONSES.json, **encoding_headers, **status_headers}
             )
         
-    except ValueError as e:
-        logger.error(f"Authentication error: {str(e)}")
-        return func.HttpResponse(
-            json.dumps({
-                "jsonrpc": "2.0",
-                "id": None,
-                "error": {
-                    "code": -32000,
-                    "message": "Authentication error",
-                    "data": str(e)
-                }
-            }),
-            status_code=401,
-            headers={
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*"
-            }
-        )
     except Exception as e:
-        logger.error(f"Command endpoint error: {str(e)}", exc_info=True)
-        return func.HttpResponse(
-            json.dumps({
-                "jsonrpc": "2.0",
-                "id": None,
-                "error": {
-                    "code": -32603,
-                    "message": "Internal error",
-                    "data": str(e)
-                }
-            }),
-            status_code=500,
-            headers={
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*"
-            }
-        )
\ No newline at end of file
+        error_log.error("Command endpoint error", f"{type(e).__name__}: {str(e)}", exc_info=True)
+        return RESPONSES.error(responses.INTERNAL_ERROR, 500)
\ No newline at end of file
@@ -0,0 +1,161 @@
+import azure.functions as func
+import logging
+import json
+import time
+from typing import Mapping, Union
+
+from ..shared import runtime
+from ..shared.mcp_protocol import MCPRequest, MCPMethod, STATIC_RESPONSE_METHODS
+from ..shared.client_requests import is_response
+from ..shared.compression import encode_body
+from ..shared.deadlines import RequestContext, timeout_from_headers
+from ..shared import responses
+from ..shared.responses import ResponseBuilder
+from ..shared.transport import EVENT_STREAM, choose_response_mode, format_sse_event, stream_request
+from ..shared.telemetry import span
+from ..shared import log_pipeline
+from ..shared.recorder import recorder, ENDPOINT
+
+logger = logging.getLogger(__name__)
+
+# Application Insights export runs on the log pipeline's thread
+log_pipeline.attach(logger)
+
+
+RESPONSES = ResponseBuilder(
+    methods="POST, DELETE, OPTIONS",
+    allow_headers="Authorization, Mcp-Session-Id, X-Session-Id, Content-Type, Accept, X-MCP-Timeout-Ms",
+    expose_headers="Mcp-Session-Id"
+)
+
+
+def _json_response(body: Union[dict, bytes], status_code: int, session_id: str = None,
+                   accept_encoding: str = None, static: bool = False,
+                   extra_headers: Mapping[str, str] = responses.NO_HEADERS) -> func.HttpResponse:
+    with span("response.serialize"):
+        if isinstance(body, dict):
+            body = json.dumps(body).encode("utf-8")
+        payload, encoding_headers = encode_body(body, accept_encoding, static)
+    headers = {**RESPONSES.json, **encoding_headers, **extra_headers}
+    if session_id:
+        headers["Mcp-Session-Id"] = session_id
+    return func.HttpResponse(payload, status_code=status_code, headers=headers)
+
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    """Streamable HTTP endpoint: one POST per request, JSON or SSE response"""
+    # Handle CORS preflight before any auth or JSON work
+    if req.method == "OPTIONS":
+        return RESPONSES.preflight()
+
+    started = time.perf_counter()
+    logger.info("MCP streamable HTTP endpoint called")
+
+    # Extract authorization header
+    auth_header = req.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return RESPONSES.json_bytes(responses.MISSING_AUTHORIZATION, 401)
+
+    token = auth_header.split(" ")[1]
+    mcp_server = runtime.get_server()
+
+    try:
+        # Validate token
+        with span("auth.validate_token"):
+            token_data = await runtime.get_auth_validator().validate_token(token)
+        user_id = token_data.get("sub")
+
+        session_id = req.headers.get("Mcp-Session-Id") or req.headers.get("X-Session-Id")
+        with span("session.lookup"):
+            session = await mcp_server.find_session(session_id) if session_id else None
+        if session_id and (not session or session.user_id != user_id):
+            return RESPONSES.json_bytes(responses.INVALID_SESSION, 404)
+
+        # Explicit session termination
+        if req.method == "DELETE":
+            if not session:
+                return RESPONSES.json_bytes(responses.MISSING_SESSION, 400)
+            mcp_server.remove_session(session_id)
+            runtime.get_token_manager().invalidate_session(session_id)
+            return RESPONSES.empty(204)
+
+        # Parse request body
+        try:
+            with span("request.parse"):
+                data = req.get_json()
+                if session and is_response(data):
+                    # The client answering a request this server sent
+                    if mcp_server.handle_client_response(session, data):
+                        return RESPONSES.empty(202)
+                    return RESPONSES.json_bytes(responses.UNKNOWN_REQUEST_ID, 404)
+                mcp_request = MCPRequest(**data)
+        except Exception as e:
+            logger.info("Unparseable MCP request: %s", e)
+            return RESPONSES.error(responses.PARSE_ERROR, 400)
+
+        # Sessions are created by initialize; everything else needs one
+        if not session:
+            if mcp_request.method != MCPMethod.INITIALIZE:
+                return RESPONSES.json_bytes(responses.MISSING_SESSION, 400)
+            if mcp_server.draining:
+                return RESPONSES.draining()
+            session_id = runtime.get_token_manager().create_session(user_id, token_data)
+            session = mcp_server.create_session(session_id, user_id, token_data.get("tid"))
+
+        logger.info("MCP request: method=%s, user=%s", mcp_request.method, user_id)
+        context = RequestContext(timeout_from_headers(req.headers))
+
+        # Notifications get no response body
+        if mcp_request.id is None:
+            session.update_activity()
+            return RESPONSES.empty(202)
+
+        if choose_response_mode(mcp_server, mcp_request, req.headers.get("Accept")) == "sse":
+            if session.has_stream_reader():
+                # The client polls /mcp/stream: progress goes out on those polls
+                # as it happens, and this body carries only the final response
+                with span("request.handle", method=mcp_request.method):
+                    response = await mcp_server.handle_request(mcp_request, session, context)
+                frames = [format_sse_event("message", response.model_dump(exclude_none=True))]
+            else:
+                # The HTTP worker buffers response bodies, so without a session
+                # stream the request's frames arrive together when it ends
+                frames = [frame async for frame in stream_request(mcp_server, mcp_request, session, context)]
+            log_pipeline.audit(user_id, mcp_request, started, "stream")
+            body, encoding_headers = encode_body("".join(frames).encode("utf-8"),
+                                                 req.headers.get("Accept-Encoding"))
+            recorder.record(ENDPOINT, started, session_id, user_id, mcp_request, 200, len(body))
+            return func.HttpResponse(
+                body,
+                status_code=200,
+                headers={
+                    "Content-Type": EVENT_STREAM,
+                    "Cache-Control": "no-cache",
+                    "Mcp-Session-Id": session_id,
+                    **RESPONSES.cors,
+                    **encoding_headers
+                }
+            )
+
+        with span("request.handle", method=mcp_request.method):
+            response = await mcp_server.handle_request(mcp_request, session, context)
+        log_pipeline.audit(user_id, mcp_request, started,
+                           "ok" if response.error is None else f"error:{response.error.code}")
+        status_code, status_headers = responses.status_for(response.error)
+        body = mcp_server.encode_response(mcp_request, response)
+        recorder.record(ENDPOINT, started, session_id, user_id, mcp_request, status_code, len(body))
+        return _json_response(
+            body,
+            status_code,
+            session_id=session_id,
+            accept_encoding=req.headers.get("Accept-Encoding"),
+            static=mcp_request.method in STATIC_RESPONSE_METHODS,
+            extra_headers=status_headers
+        )
+
+    except ValueError as e:
+        logger.error("Authentication error: %s", e)
+        return RESPONSES.error(responses.AUTHENTICATION_ERROR, 401)
+    except Exception as e:
+        logger.error("MCP endpoint error: %s", e, exc_info=True)
+        return RESPONSES.error(responses.INTERNAL_ERROR, 500)
@@ -0,0 +1,20 @@
+import azure.functions as func
+
+# Every module that registers metrics, so a fresh worker's first scrape
+# lists all series, not just those of handlers that already ran here
+from ..shared import (  # noqa: F401
+    auth, compression, log_pipeline, mcp_protocol, recorder, sampled_log, telemetry, tenants, warmup
+)
+from . import mcp_command, sse_stream  # noqa: F401
+from ..shared.metrics import registry
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    """Prometheus scrape endpoint for this worker process"""
+    return func.HttpResponse(
+        registry.render(),
+        status_code=200,
+        headers={"Content-Type": CONTENT_TYPE, "Cache-Control": "no-store"}
+    )
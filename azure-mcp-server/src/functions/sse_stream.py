@@ -2,43 +2,128 @@
 import logging
 import json
 import asyncio
-from typing import AsyncGenerator
+import time
+from typing import AsyncGenerator, Optional
 import os
 from datetime import datetime
+from types import MappingProxyType
 
-from ..shared.auth import AzureADAuthValidator, TokenManager
-from ..shared.mcp_protocol import MCPServer, MCPSession, MCPNotification
+from ..shared import runtime
+from ..shared.mcp_protocol import MCPSession, MCPNotification
+from ..shared.replay import parse_last_event_id
+from ..shared.transport import format_sse_event
+from ..shared.compression import negotiate_encoding, compress
+from ..shared import responses
+from ..shared.responses import ResponseBuilder
+from ..shared.telemetry import span
+from ..shared.recorder import recorder, STREAM
+from ..shared.metrics import registry
 
 logger = logging.getLogger(__name__)
-auth_validator = AzureADAuthValidator()
-token_manager = TokenManager()
-mcp_server = MCPServer()
 
-async def generate_sse_events(session: MCPSession) -> AsyncGenerator[str, None]:
-    """Generate SSE events for the session"""
+# Events already queued are sent together as one write (and one flush)
+SSE_BATCH_SIZE = int(os.environ.get("MCP_SSE_BATCH_SIZE", "32"))
+# Compressing poll bodies is opt-in; they are mostly small
+SSE_COMPRESSION = os.environ.get("MCP_SSE_COMPRESSION", "false").lower() == "true"
+# func.HttpResponse cannot carry a stream, so each GET is a long poll: it
+# waits up to SSE_POLL_WAIT for events, returns them once no more arrive
+# within SSE_POLL_WINDOW, and the client reconnects with Last-Event-ID
+# after the `retry:` delay sent at the end of the body.
+SSE_POLL_WAIT = float(os.environ.get("MCP_SSE_POLL_WAIT_SECONDS", "20"))
+SSE_POLL_WINDOW = float(os.environ.get("MCP_SSE_POLL_WINDOW_SECONDS", "0.05"))
+SSE_RETRY_MS = int(os.environ.get("MCP_SSE_RETRY_MS", "1000"))
+
+ACTIVE_STREAMS = registry.gauge("mcp_sse_active_streams", "SSE generators currently running")
+
+RESPONSES = ResponseBuilder(methods="GET, OPTIONS", expose_headers="X-Session-Id")
+STREAM_HEADERS = MappingProxyType({
+    "Content-Type": "text/event-stream",
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    **RESPONSES.cors
+})
+
+
+async def generate_sse_events(session: MCPSession,
+                              last_event_id: Optional[int] = None) -> AsyncGenerator[str, None]:
+    """Generate SSE events for the session
+    
+    When the client resumes with Last-Event-ID, the buffered events it
+    missed are replayed before live delivery continues.
+    """
     # Send initial connection event
-    yield f"event: connected\ndata: {json.dumps({'session_id': session.session_id})}\n\n"
+    yield format_sse_event("connected", {"session_id": session.session_id})
     
     # Send heartbeat every 30 seconds to keep connection alive
     heartbeat_task = asyncio.create_task(send_heartbeats(session))
+    ACTIVE_STREAMS.inc()
+    session.attach_reader()
     
     try:
+        last_sent = 0
+        if last_event_id is not None:
+            missed = await session.events_after(last_event_id)
+            if missed and missed[0][0] > last_event_id + 1:
+                # Part of the gap already fell out of the replay buffer
+                yield format_sse_event("replay_gap", {
+                    "last_event_id": last_event_id,
+                    "first_available_id": missed[0][0]
+                })
+            for event_id, message in missed:
+                yield format_sse_event("message", message, event_id)
+            last_sent = missed[-1][0] if missed else last_event_id
+        
         while session.active:
             # Get next message from session queue
-            message = await session.get_message()
+            event = await session.get_event()
             
-            if message:
-                yield f"event: message\ndata: {json.dumps(message)}\n\n"
-            else:
+            if event:
+                frames = []
+                for event_id, message in [event] + session.drain_events(SSE_BATCH_SIZE - 1):
+                    if event_id is not None and event_id <= last_sent:
+                        # Already replayed above
+                        continue
+                    frames.append(format_sse_event("message", message, event_id))
+                if frames:
+                    yield "".join(frames)
+            elif session.active:
                 # Send heartbeat if no message
-                yield f"event: heartbeat\ndata: {json.dumps({'timestamp': datetime.utcnow().isoformat()})}\n\n"
+                yield format_sse_event("heartbeat", {"timestamp": datetime.utcnow().isoformat()})
                 
     except Exception as e:
-        logger.error(f"SSE stream error: {str(e)}")
-        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        logger.error("SSE stream error: %s", e)
+        yield format_sse_event("error", {"error": str(e)})
     finally:
+        ACTIVE_STREAMS.dec()
+        session.detach_reader()
         heartbeat_task.cancel()
-        session.active = False
+
+async def collect_sse_events(session: MCPSession, last_event_id: Optional[int] = None,
+                             wait: Optional[float] = None, window: Optional[float] = None) -> str:
+    """Body of one long poll of the session stream
+
+    Waits up to `wait` seconds for the first event, then returns once
+    `window` seconds pass without another. The body ends with a `retry:`
+    field so the client's reconnect delay is set by the server.
+    """
+    wait = SSE_POLL_WAIT if wait is None else wait
+    window = SSE_POLL_WINDOW if window is None else window
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    stream = generate_sse_events(session, last_event_id)
+    frames = []
+    try:
+        # The connected frame is always ready and does not end the poll
+        frames.append(await stream.__anext__())
+        while True:
+            timeout = window if len(frames) > 1 else max(deadline - loop.time(), 0)
+            frames.append(await asyncio.wait_for(stream.__anext__(), timeout=timeout))
+    except (asyncio.TimeoutError, StopAsyncIteration):
+        pass
+    finally:
+        await stream.aclose()
+    frames.append(f"retry: {SSE_RETRY_MS}\n\n")
+    return "".join(frames)
 
 async def send_heartbeats(session: MCPSession):
     """Send periodic heartbeats"""
@@ -48,77 +133,65 @@ async def send_heartbeats(session: MCPSession):
             await session.send_message(MCPNotification(
                 method="heartbeat",
                 params={"timestamp": datetime.utcnow().isoformat()}
-            ))
+            ), replay=False)
 
 async def main(req: func.HttpRequest) -> func.HttpResponse:
     """SSE endpoint for MCP communication"""
+    # Handle CORS preflight before any auth or JSON work
+    if req.method == "OPTIONS":
+        return RESPONSES.preflight()
+    
+    started = time.perf_counter()
     logger.info("SSE stream endpoint called")
     
     # Extract authorization header
     auth_header = req.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
-        return func.HttpResponse(
-            json.dumps({"error": "Missing or invalid authorization header"}),
-            status_code=401,
-            headers={"Content-Type": "application/json"}
-        )
+        return RESPONSES.json_bytes(responses.MISSING_AUTHORIZATION, 401)
     
     token = auth_header.split(" ")[1]
+    mcp_server = runtime.get_server()
+    if mcp_server.draining:
+        # Shutting down: the client reconnects to another instance
+        return RESPONSES.draining()
     
     try:
         # Validate token
-        token_data = await auth_validator.validate_token(token)
+        with span("auth.validate_token"):
+            token_data = await runtime.get_auth_validator().validate_token(token)
         user_id = token_data.get("sub")
         
         # Create or get session
         session_id = req.headers.get("X-Session-Id")
         
         if session_id:
-            session = mcp_server.get_session(session_id)
-            if not session or session.user_id != user_id:
-                return func.HttpResponse(
-                    json.dumps({"error": "Invalid session"}),
-                    status_code=401,
-                    headers={"Content-Type": "application/json"}
-                )
+            with span("session.lookup"):
+                session = await mcp_server.find_session(session_id)
+            # Polls attach as readers; a closed session stays closed
+            if not session or session.user_id != user_id or not session.active:
+                return RESPONSES.json_bytes(responses.INVALID_SESSION, 401)
         else:
             # Create new session
-            session_id = token_manager.create_session(user_id, token_data)
-            session = mcp_server.create_session(session_id, user_id)
+            session_id = runtime.get_token_manager().create_session(user_id, token_data)
+            session = mcp_server.create_session(session_id, user_id, token_data.get("tid"))
         
         # Set up SSE response headers
-        headers = {
-            "Content-Type": "text/event-stream",
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Session-Id": session_id,
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "Authorization, X-Session-Id, Content-Type",
-            "Access-Control-Allow-Methods": "GET, POST, OPTIONS"
-        }
+        encoding = negotiate_encoding(req.headers.get("Accept-Encoding")) if SSE_COMPRESSION else None
+        headers = {**STREAM_HEADERS, "X-Session-Id": session_id}
         
-        # Generate SSE stream
-        async def stream_generator():
-            async for event in generate_sse_events(session):
-                yield event.encode('utf-8')
+        # Resume after the last event the client saw, if any
+        last_event_id = parse_last_event_id(req.headers.get("Last-Event-ID"))
         
-        return func.HttpResponse(
-            stream_generator(),
-            status_code=200,
-            headers=headers
-        )
+        body = (await collect_sse_events(session, last_event_id)).encode("utf-8")
+        recorder.record(STREAM, started, session_id, user_id, None, 200, len(body))
+        if encoding:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+        return func.HttpResponse(body, status_code=200, headers=headers)
         
     except ValueError as e:
-        logger.error(f"Authentication error: {str(e)}")
-        return func.HttpResponse(
-            json.dumps({"error": str(e)}),
-            status_code=401,
-            headers={"Content-Type": "application/json"}
-        )
+        logger.error("Authentication error: %s", e)
+        return RESPONSES.json_bytes(json.dumps({"error": str(e)}).encode("utf-8"), 401)
     except Exception as e:
-        logger.error(f"SSE endpoint error: {str(e)}")
-        return func.HttpResponse(
-            json.dumps({"error": "Internal server error"}),
-            status_code=500,
-            headers={"Content-Type": "application/json"}
-        )
\ No newline at end of file
+        logger.error("SSE endpoint error: %s", e)
+        return RESPONSES.json_bytes(responses.INTERNAL_SERVER_ERROR, 500)
\ No newline at end of file
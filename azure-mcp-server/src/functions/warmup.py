@@ -0,0 +1,13 @@
+import azure.functions as func
+import logging
+
+from ..shared.warmup import warm_up
+
+logger = logging.getLogger(__name__)
+
+
+async def main(warmupContext: func.Context) -> None:
+    """Warm-up trigger: runs on new instances before they receive traffic"""
+    report = await warm_up()
+    if report["errors"]:
+        logger.warning("Warm-up completed with errors: %s", report["errors"])
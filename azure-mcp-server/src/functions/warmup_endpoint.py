@@ -0,0 +1,18 @@
+import azure.functions as func
+import json
+
+from ..shared.warmup import warm_up
+
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    """Run warm-up on demand and report each step's duration
+
+    Returns 503 while any step fails, so it can gate traffic as a
+    readiness probe.
+    """
+    report = await warm_up()
+    return func.HttpResponse(
+        json.dumps(report),
+        status_code=503 if report["errors"] else 200,
+        headers={"Content-Type": "application/json", "Cache-Control": "no-store"}
+    )
@@ -0,0 +1,169 @@
+"""Per-file static checks used by the analyze_workspace tool
+
+Everything here is a plain function of (path, content), with only the
+standard library, so batches can run in worker processes. Bump
+ANALYZER_VERSION whenever the rules change: it is part of the
+content-hash cache key.
+"""
+import re
+import ast
+from typing import Any, Dict, List, Sequence, Tuple
+
+ANALYZER_VERSION = "1"
+
+LANGUAGES = {
+    ".py": "python", ".js": "javascript", ".jsx": "javascript", ".mjs": "javascript",
+    ".ts": "typescript", ".tsx": "typescript", ".java": "java", ".cs": "csharp", ".go": "go",
+    ".rs": "rust", ".rb": "ruby", ".php": "php", ".c": "c", ".h": "c", ".cpp": "cpp", ".hpp": "cpp",
+    ".sh": "shell", ".ps1": "powershell", ".sql": "sql", ".json": "json", ".yaml": "yaml",
+    ".yml": "yaml", ".md": "markdown", ".tf": "terraform", ".bicep": "bicep",
+}
+
+_HASH_COMMENTS = ("#",)
+_SLASH_COMMENTS = ("//", "/*", "*")
+COMMENT_PREFIXES = {
+    "python": _HASH_COMMENTS, "shell": _HASH_COMMENTS, "ruby": _HASH_COMMENTS, "powershell": _HASH_COMMENTS,
+    "yaml": _HASH_COMMENTS, "terraform": _HASH_COMMENTS + ("//",), "sql": ("--",),
+    "javascript": _SLASH_COMMENTS, "typescript": _SLASH_COMMENTS, "java": _SLASH_COMMENTS,
+    "csharp": _SLASH_COMMENTS, "go": _SLASH_COMMENTS, "rust": _SLASH_COMMENTS, "php": _SLASH_COMMENTS,
+    "c": _SLASH_COMMENTS, "cpp": _SLASH_COMMENTS, "bicep": _SLASH_COMMENTS,
+}
+
+MAX_LINE_LENGTH = 120
+MAX_ISSUES_PER_FILE = 100
+MAX_FUNCTION_COMPLEXITY = 10
+MAX_LOOP_DEPTH = 3
+
+_MARKERS = re.compile(r"\b(TODO|FIXME|XXX|HACK)\b")
+_SECRETS = (
+    (re.compile(r"(?i)\b(password|passwd|secret|api[_-]?key|access[_-]?token)\b\s*[:=]\s*[\"'][^\"'\s]{6,}[\"']"),
+     "hardcoded-secret", "Credential assigned from a string literal"),
+    (re.compile(r"\bAKIA[0-9A-Z]{16}\b"), "aws-access-key", "AWS access key id in source"),
+    (re.compile(r"-----BEGIN (?:RSA |EC |OPENSSH )?PRIVATE KEY-----"), "private-key", "Private key in source"),
+    (re.compile(r"(?i)AccountKey=[A-Za-z0-9+/=]{20,}"), "storage-account-key", "Azure storage account key in source"),
+)
+_BRANCHES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.With, ast.AsyncWith,
+             ast.ExceptHandler, ast.BoolOp, ast.IfExp, ast.comprehension)
+_LOOPS = (ast.For, ast.AsyncFor, ast.While)
+
+
+def language_for(path: str) -> str:
+    """Language from the file extension ("text" when unknown)"""
+    dot = path.rfind(".")
+    return LANGUAGES.get(path[dot:].lower(), "text") if dot > path.rfind("/") else "text"
+
+
+class _Findings(list):
+    """Issues of the requested category, capped at MAX_ISSUES_PER_FILE"""
+
+    def __init__(self, analysis_type: str):
+        super().__init__()
+        self.wanted = None if analysis_type == "all" else analysis_type
+
+    def add(self, line: int, severity: str, category: str, rule: str, message: str):
+        if len(self) < MAX_ISSUES_PER_FILE and self.wanted in (None, category):
+            self.append({"line": line, "severity": severity, "category": category, "rule": rule,
+                         "message": message})
+
+
+def _check_lines(lines: Sequence[str], language: str, issues: _Findings) -> Tuple[int, int]:
+    """Line-level checks; returns (comment lines, blank lines)"""
+    prefixes = COMMENT_PREFIXES.get(language, ())
+    comments = blanks = 0
+    long_lines = trailing = 0
+    indents = set()
+    for number, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if not stripped:
+            blanks += 1
+            continue
+        if prefixes and stripped.startswith(prefixes):
+            comments += 1
+        if len(line) > MAX_LINE_LENGTH:
+            long_lines += 1
+            if long_lines == 1:
+                issues.add(number, "info", "quality", "line-too-long",
+                           f"Line exceeds {MAX_LINE_LENGTH} characters")
+        if line != line.rstrip():
+            trailing += 1
+        if line[0] in " \t":
+            indents.add(line[0])
+        marker = _MARKERS.search(line)
+        if marker:
+            issues.add(number, "info", "quality", "todo", f"{marker.group(1)} marker")
+        for pattern, rule, message in _SECRETS:
+            if pattern.search(line):
+                issues.add(number, "error", "security", rule, message)
+    if long_lines > 1:
+        issues.add(0, "info", "quality", "line-too-long", f"{long_lines} lines exceed {MAX_LINE_LENGTH} characters")
+    if trailing:
+        issues.add(0, "info", "quality", "trailing-whitespace", f"{trailing} lines end in whitespace")
+    if len(indents) > 1:
+        issues.add(0, "warning", "quality", "mixed-indentation", "Both tabs and spaces used for indentation")
+    return comments, blanks
+
+
+def _loop_depth(node: ast.AST, depth: int = 0) -> int:
+    deepest = depth
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        deepest = max(deepest, _loop_depth(child, depth + isinstance(child, _LOOPS)))
+    return deepest
+
+
+def _check_python(text: str, issues: _Findings) -> Dict[str, Any]:
+    """Syntax, complexity and risky-call checks for Python sources"""
+    try:
+        tree = ast.parse(text)
+    except SyntaxError as e:
+        issues.add(e.lineno or 0, "error", "quality", "syntax-error", f"Syntax error: {e.msg}")
+        return {"functions": 0, "classes": 0, "max_complexity": 0}
+
+    functions = classes = max_complexity = 0
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions += 1
+            complexity = 1 + sum(isinstance(child, _BRANCHES) for child in ast.walk(node))
+            max_complexity = max(max_complexity, complexity)
+            if complexity > MAX_FUNCTION_COMPLEXITY:
+                issues.add(node.lineno, "warning", "quality", "complex-function",
+                           f"{node.name} has cyclomatic complexity {complexity}")
+            depth = _loop_depth(node)
+            if depth >= MAX_LOOP_DEPTH:
+                issues.add(node.lineno, "warning", "performance", "nested-loops",
+                           f"{node.name} nests loops {depth} deep")
+        elif isinstance(node, ast.ClassDef):
+            classes += 1
+        elif isinstance(node, ast.ExceptHandler) and node.type is None:
+            issues.add(node.lineno, "warning", "quality", "bare-except", "Bare except catches everything")
+        elif isinstance(node, ast.ImportFrom) and any(alias.name == "*" for alias in node.names):
+            issues.add(node.lineno, "info", "quality", "wildcard-import", f"from {node.module} import *")
+        elif isinstance(node, ast.Call):
+            name = node.func.id if isinstance(node.func, ast.Name) else getattr(node.func, "attr", None)
+            if name in ("eval", "exec"):
+                issues.add(node.lineno, "error", "security", "dynamic-code", f"Call to {name}()")
+            elif any(k.arg == "shell" and isinstance(k.value, ast.Constant) and k.value.value is True
+                     for k in node.keywords):
+                issues.add(node.lineno, "error", "security", "shell-injection", f"{name}() with shell=True")
+    return {"functions": functions, "classes": classes, "max_complexity": max_complexity}
+
+
+def analyze_source(path: str, text: str, analysis_type: str = "all") -> Dict[str, Any]:
+    """Findings and metrics for one file"""
+    language = language_for(path)
+    lines = text.splitlines()
+    issues = _Findings(analysis_type)
+    # Syntax-aware checks first, so line-level noise cannot crowd them out of the cap
+    metrics: Dict[str, Any] = _check_python(text, issues) if language == "python" else {}
+    comments, blanks = _check_lines(lines, language, issues)
+    metrics.update(lines=len(lines), code_lines=len(lines) - comments - blanks,
+                   comment_lines=comments, blank_lines=blanks)
+    issues.sort(key=lambda issue: issue["line"])
+    return {"language": language, "metrics": metrics, "issues": list(issues)}
+
+
+def analyze_batch(items: Sequence[Tuple[str, bytes]], analysis_type: str = "all") -> List[Dict[str, Any]]:
+    """Analyze several (path, content) pairs; one pool job per batch keeps IPC overhead low"""
+    return [analyze_source(path, content.decode("utf-8", errors="replace"), analysis_type)
+            for path, content in items]
@@ -1,31 +1,94 @@
 import os
-import jwt
+import time
+import hashlib
 import logging
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple, Union
 from datetime import datetime, timedelta
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
-import msal
-from jose import jwt as jose_jwt, JWTError
-import aiohttp
 import asyncio
+import weakref
+
+from .metrics import registry
 
 logger = logging.getLogger(__name__)
 
-class AzureADAuthValidator:
+DEFAULT_AUTHORITY_HOST = "https://login.microsoftonline.com"
+
+# Rejected tokens are remembered briefly so a client looping on a bad
+# token costs a hash lookup instead of a header parse and RSA verify
+NEGATIVE_CACHE_TTL = float(os.environ.get("MCP_AUTH_NEGATIVE_CACHE_TTL_SECONDS", "30"))
+NEGATIVE_CACHE_SIZE = int(os.environ.get("MCP_AUTH_NEGATIVE_CACHE_SIZE", "10000"))
+# An unknown kid may mean the keys rotated, so it triggers a JWKS refetch,
+# but at most once per kid per interval and never more often than the
+# global minimum, however many distinct kids clients make up
+UNKNOWN_KID_RETRY_SECONDS = float(os.environ.get("MCP_AUTH_UNKNOWN_KID_RETRY_SECONDS", "300"))
+JWKS_REFRESH_MIN_SECONDS = float(os.environ.get("MCP_AUTH_JWKS_REFRESH_MIN_SECONDS", "30"))
+UNKNOWN_KID_TRACKED = 256
+
+NEGATIVE_CACHE = registry.counter("mcp_auth_negative_cache_total", "Rejected-token cache lookups and stores",
+                                  labelnames=("result",))
+UNKNOWN_KIDS = registry.counter("mcp_auth_unknown_kid_total", "Tokens signed with a kid missing from the JWKS",
+                                labelnames=("action",))
+
+class HttpSessionPool:
+    """One aiohttp session per event loop, kept open between requests"""
+
     def __init__(self):
-        self.tenant_id = os.environ.get("AZURE_TENANT_ID")
-        self.client_id = os.environ.get("AZURE_CLIENT_ID")
-        self.authority = f"https://login.microsoftonline.com/{self.tenant_id}"
+        self._session = None
+        self._loop = None
+
+    def get(self):
+        import aiohttp
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession()
+            self._loop = loop
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class AzureADAuthValidator:
+    def __init__(self, tenant_id: Optional[str] = None, client_id: Optional[str] = None,
+                 authority_host: Optional[str] = None, issuer: Optional[Union[str, List[str]]] = None,
+                 audiences: Optional[List[str]] = None, http: Optional[HttpSessionPool] = None):
+        self.tenant_id = tenant_id or os.environ.get("AZURE_TENANT_ID")
+        self.client_id = client_id or os.environ.get("AZURE_CLIENT_ID")
+        # AZURE_AUTHORITY_HOST points the validator at another identity
+        # provider, e.g. the local stand-in stack in local_stack/
+        self.authority_host = (authority_host or os.environ.get("AZURE_AUTHORITY_HOST")
+                               or DEFAULT_AUTHORITY_HOST).rstrip("/")
+        self.authority = f"{self.authority_host}/{self.tenant_id}"
         self.jwks_uri = f"{self.authority}/discovery/v2.0/keys"
-        self.issuer = f"https://sts.windows.net/{self.tenant_id}/"
-        self.valid_audiences = [
+        # One issuer or a list of accepted issuers
+        self.issuer = (issuer or os.environ.get("AZURE_TOKEN_ISSUER")
+                       or f"https://sts.windows.net/{self.tenant_id}/")
+        self.valid_audiences = audiences or [
             self.client_id,
             f"api://{self.client_id}"
         ]
         self._jwks_cache = None
         self._jwks_cache_time = None
         self._cache_duration = timedelta(hours=1)
+        # Parsed signing keys by kid, rebuilt whenever the JWKS changes
+        self._key_index: Dict[str, Any] = {}
+        self._indexed_jwks = None
+        # A pool passed in is shared (e.g. across tenants) and not closed here
+        self._owns_http = http is None
+        self.http = http or HttpSessionPool()
+        # token digest -> (expires at, rejection reason)
+        self._rejected: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+        # kid -> when it last triggered a JWKS refetch
+        self._unknown_kids: "OrderedDict[str, float]" = OrderedDict()
+        self._last_jwks_refresh = float("-inf")
+        _live_validators.add(self)
+    
+    async def close(self):
+        if self._owns_http:
+            await self.http.close()
         
     async def get_jwks(self) -> Dict[str, Any]:
         """Fetch and cache JWKS from Azure AD"""
@@ -34,46 +97,107 @@ async def get_jwks(self) -> Dict[str, Any]:
         if (self._jwks_cache and self._jwks_cache_time and 
             now - self._jwks_cache_time < self._cache_duration):
             return self._jwks_cache
-            
-        async with aiohttp.ClientSession() as session:
-            async with session.get(self.jwks_uri) as response:
-                self._jwks_cache = await response.json()
-                self._jwks_cache_time = now
-                return self._jwks_cache
+        
+        async with self.http.get().get(self.jwks_uri) as response:
+            self._jwks_cache = await response.json()
+            self._jwks_cache_time = now
+            return self._jwks_cache
     
-    async def validate_token(self, token: str) -> Dict[str, Any]:
-        """Validate Azure AD JWT token"""
+    async def refresh_jwks(self) -> Dict[str, Any]:
+        """Drop the cached JWKS and fetch it again"""
+        self._jwks_cache_time = None
+        return await self.get_jwks()
+    
+    def _key_for(self, jwks: Dict[str, Any], kid: str):
+        """Parsed key for kid; parsing happens once per JWKS, not per token"""
+        if jwks is not self._indexed_jwks:
+            from jose import jwk as jose_jwk
+            index = {}
+            for entry in jwks.get("keys", []):
+                try:
+                    index[entry["kid"]] = jose_jwk.construct(entry, entry.get("alg") or "RS256")
+                except Exception as e:
+                    logger.warning("Skipping unusable JWKS entry %s: %s", entry.get("kid"), e)
+            self._key_index = index
+            self._indexed_jwks = jwks
+        return self._key_index.get(kid)
+    
+    async def _find_key(self, kid: str):
+        """The key for kid, refetching the JWKS (throttled) when it is unknown"""
+        key = self._key_for(await self.get_jwks(), kid)
+        if key is not None:
+            return key
+        
+        now = time.monotonic()
+        last = self._unknown_kids.get(kid)
+        if ((last is not None and now - last < UNKNOWN_KID_RETRY_SECONDS)
+                or now - self._last_jwks_refresh < JWKS_REFRESH_MIN_SECONDS):
+            UNKNOWN_KIDS.inc(action="throttled")
+            return None
+        
+        self._unknown_kids[kid] = now
+        self._unknown_kids.move_to_end(kid)
+        if len(self._unknown_kids) > UNKNOWN_KID_TRACKED:
+            self._unknown_kids.popitem(last=False)
+        self._last_jwks_refresh = now
+        UNKNOWN_KIDS.inc(action="refetch")
+        key = self._key_for(await self.refresh_jwks(), kid)
+        if key is not None:
+            self._unknown_kids.pop(kid, None)
+        return key
+    
+    def _reject(self, digest: bytes, error: str) -> "TokenCheck":
+        self._rejected[digest] = (time.monotonic() + NEGATIVE_CACHE_TTL, error)
+        if len(self._rejected) > NEGATIVE_CACHE_SIZE:
+            self._rejected.popitem(last=False)
+        NEGATIVE_CACHE.inc(result="store")
+        return TokenCheck(error=error)
+    
+    async def check_token(self, token: str) -> "TokenCheck":
+        """Validate Azure AD JWT token, returning rejections instead of raising
+
+        Expired, malformed or wrongly signed tokens are an expected outcome
+        (and arrive in waves when many clients' tokens expire together), so
+        they come back as TokenCheck.error rather than as exceptions.
+        Failures to reach the identity provider still raise. Rejections
+        are cached by token digest for NEGATIVE_CACHE_TTL seconds.
+        """
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+        rejected = self._rejected.get(digest)
+        if rejected is not None:
+            if rejected[0] > time.monotonic():
+                NEGATIVE_CACHE.inc(result="hit")
+                return TokenCheck(error=rejected[1])
+            del self._rejected[digest]
+        
+        # Imported on first use to keep jose off the cold-start import path
+        from jose import jwt as jose_jwt, JWTError
+        
+        # Decode header to get kid
         try:
-            # Decode header to get kid
             unverified_header = jose_jwt.get_unverified_header(token)
-            kid = unverified_header.get("kid")
-            
-            if not kid:
-                raise ValueError("Token missing 'kid' header")
-            
-            # Get JWKS
-            jwks = await self.get_jwks()
-            
-            # Find the key
-            key = None
-            for jwk in jwks.get("keys", []):
-                if jwk.get("kid") == kid:
-                    key = jwk
-                    break
-                    
-            if not key:
-                raise ValueError(f"Unable to find key with kid: {kid}")
-            
-            # Validate token
+        except JWTError as e:
+            return self._reject(digest, f"Invalid token: {str(e)}")
+        kid = unverified_header.get("kid")
+        if not kid:
+            return self._reject(digest, "Token missing 'kid' header")
+        
+        # Find the key
+        key = await self._find_key(kid)
+        if key is None:
+            return self._reject(digest, f"Unable to find key with kid: {kid}")
+        
+        # Validate token (audience is checked below: jose only
+        # accepts a single expected audience)
+        try:
             payload = jose_jwt.decode(
                 token,
                 key,
                 algorithms=["RS256"],
-                audience=self.valid_audiences,
                 issuer=self.issuer,
                 options={
                     "verify_signature": True,
-                    "verify_aud": True,
+                    "verify_aud": False,
                     "verify_iat": True,
                     "verify_exp": True,
                     "verify_nbf": True,
@@ -84,26 +208,53 @@ async def validate_token(self, token: str) -> Dict[str, Any]:
                     "require_nbf": True,
                 }
             )
+        except JWTError as e:
+            return self._reject(digest, f"Invalid token: {str(e)}")
+        
+        # Additional validation
+        audiences = payload.get("aud")
+        if isinstance(audiences, str):
+            audiences = [audiences]
+        elif not isinstance(audiences, list):
+            # Missing, or a number or object the spec does not allow
+            audiences = []
+        if not any(isinstance(aud, str) and aud in self.valid_audiences for aud in audiences):
+            return self._reject(digest, "Invalid token: audience not accepted")
             
-            # Additional validation
-            if "scp" not in payload and "roles" not in payload:
-                raise ValueError("Token missing required scopes or roles")
-                
-            return payload
+        if "scp" not in payload and "roles" not in payload:
+            return self._reject(digest, "Token missing required scopes or roles")
             
-        except JWTError as e:
-            logger.error(f"JWT validation error: {str(e)}")
-            raise ValueError(f"Invalid token: {str(e)}")
-        except Exception as e:
-            logger.error(f"Token validation error: {str(e)}")
-            raise
+        return TokenCheck(claims=payload)
+    
+    async def validate_token(self, token: str) -> Dict[str, Any]:
+        """Validate Azure AD JWT token; raises ValueError when it is rejected"""
+        result = await self.check_token(token)
+        if result.error is not None:
+            raise ValueError(result.error)
+        return result.claims
+
+
+class TokenCheck:
+    """Outcome of AzureADAuthValidator.check_token: claims or a rejection reason"""
+
+    __slots__ = ("claims", "error")
+
+    def __init__(self, claims: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        self.claims = claims
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 class TokenManager:
     def __init__(self):
         self.sessions: Dict[str, Dict[str, Any]] = {}
+        _live_token_managers.add(self)
         
     def create_session(self, user_id: str, token_data: Dict[str, Any]) -> str:
         """Create a new session for authenticated user"""
+        import jwt
         session_id = jwt.encode(
             {
                 "user_id": user_id,
@@ -140,4 +291,22 @@ def cleanup_expired_sessions(self):
                 expired.append(session_id)
                 
         for session_id in expired:
-            del self.sessions[session_id]
\ No newline at end of file
+            del self.sessions[session_id]
+
+_live_validators: "weakref.WeakSet[AzureADAuthValidator]" = weakref.WeakSet()
+_live_token_managers: "weakref.WeakSet[TokenManager]" = weakref.WeakSet()
+
+def _jwks_cache_ages() -> Dict[tuple, float]:
+    now = datetime.utcnow()
+    ages: Dict[tuple, float] = {}
+    for validator in list(_live_validators):
+        if validator._jwks_cache_time is None:
+            continue
+        key = (str(validator.tenant_id),)
+        ages[key] = max(ages.get(key, 0.0), (now - validator._jwks_cache_time).total_seconds())
+    return ages
+
+registry.gauge("mcp_jwks_cache_age_seconds", "Age of the cached Azure AD signing keys",
+               labelnames=("tenant",), callback=_jwks_cache_ages)
+registry.gauge("mcp_token_sessions", "Sessions tracked by TokenManager",
+               callback=lambda: sum(len(m.sessions) for m in list(_live_token_managers)))
@@ -0,0 +1,113 @@
+"""Server-wide notifications fanned out to many sessions
+
+A broadcast is serialized once into an EncodedMessage, an immutable
+payload, JSON string and SSE frame, and the same object is queued for
+every target session. The SSE writer only prefixes the per-session
+event id. Targets are chosen from indexes (user, tenant, declared
+capability) kept up to date as sessions come and go, so a filtered
+broadcast never scans sessions it does not deliver to.
+"""
+import json
+import time
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Optional, Set
+
+from .metrics import registry
+
+FANOUT_MS = registry.histogram("mcp_broadcast_fanout_ms", "Time to queue a broadcast for all target sessions")
+FANOUT_SESSIONS = registry.counter("mcp_broadcast_deliveries_total", "Broadcast messages queued to sessions")
+
+
+class EncodedMessage:
+    """A message serialized once and shared by reference between sessions"""
+
+    __slots__ = ("payload", "json", "frame")
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.payload: Mapping[str, Any] = MappingProxyType(payload)
+        self.json = json.dumps(payload)
+        # SSE frame without the per-session "id:" line
+        self.frame = f"event: message\ndata: {self.json}\n\n"
+
+    def __repr__(self) -> str:
+        return f"EncodedMessage({self.json[:60]})"
+
+
+class SessionIndex:
+    """Session ids by user, tenant and declared client capability"""
+
+    def __init__(self):
+        self.by_user: Dict[str, Set[str]] = {}
+        self.by_tenant: Dict[str, Set[str]] = {}
+        self.by_capability: Dict[str, Set[str]] = {}
+        self._entries: Dict[str, tuple] = {}
+
+    @staticmethod
+    def _add(index: Dict[str, Set[str]], key: Optional[str], session_id: str):
+        if key is not None:
+            index.setdefault(key, set()).add(session_id)
+
+    @staticmethod
+    def _remove(index: Dict[str, Set[str]], key: Optional[str], session_id: str):
+        members = index.get(key)
+        if members is not None:
+            members.discard(session_id)
+            if not members:
+                del index[key]
+
+    def add(self, session_id: str, user_id: Optional[str], tenant_id: Optional[str] = None,
+            capabilities: Iterable[str] = ()):
+        self.remove(session_id)
+        capabilities = tuple(capabilities)
+        self._entries[session_id] = (user_id, tenant_id, capabilities)
+        self._add(self.by_user, user_id, session_id)
+        self._add(self.by_tenant, tenant_id, session_id)
+        for capability in capabilities:
+            self._add(self.by_capability, capability, session_id)
+
+    def set_capabilities(self, session_id: str, capabilities: Iterable[str]):
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            self.add(session_id, entry[0], entry[1], capabilities)
+
+    def remove(self, session_id: str):
+        entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return
+        user_id, tenant_id, capabilities = entry
+        self._remove(self.by_user, user_id, session_id)
+        self._remove(self.by_tenant, tenant_id, session_id)
+        for capability in capabilities:
+            self._remove(self.by_capability, capability, session_id)
+
+    def select(self, user_id: Optional[str] = None, tenant_id: Optional[str] = None,
+               capability: Optional[str] = None) -> Optional[Set[str]]:
+        """Session ids matching every given filter; None means no filter was given"""
+        candidates = [index.get(key, set()) for index, key in (
+            (self.by_user, user_id), (self.by_tenant, tenant_id), (self.by_capability, capability)
+        ) if key is not None]
+        if not candidates:
+            return None
+        candidates.sort(key=len)
+        return candidates[0].intersection(*candidates[1:])
+
+
+class BroadcastReport:
+    """What a broadcast reached and how long queuing took"""
+
+    __slots__ = ("sessions", "fanout_ms")
+
+    def __init__(self, sessions: int, fanout_ms: float):
+        self.sessions = sessions
+        self.fanout_ms = fanout_ms
+
+
+def start_timer() -> float:
+    return time.perf_counter()
+
+
+def finish(started: float, sessions: int) -> BroadcastReport:
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    FANOUT_MS.observe(elapsed_ms)
+    FANOUT_SESSIONS.inc(sessions)
+    return BroadcastReport(sessions, round(elapsed_ms, 3))
@@ -0,0 +1,138 @@
+"""Server-to-client JSON-RPC requests (e.g. sampling/createMessage)
+
+The request goes out on the session's SSE stream. The client answers
+with a JSON-RPC response POSTed to /api/mcp/command or /api/mcp, which
+resolves the future the caller is waiting on. Sessions that do not read
+/api/mcp/stream cannot receive the request, so callers check
+MCPSession.has_stream_reader() first. No HTTP invocation is held open for the
+round trip. Each session allows a bounded number of requests in flight,
+and every request has a deadline. Waiters still pending when the session
+ends are failed rather than left hanging.
+"""
+import os
+import asyncio
+import itertools
+from typing import Any, Dict, Optional, Union
+
+from .metrics import registry
+
+CLIENT_REQUEST_TIMEOUT = float(os.environ.get("MCP_CLIENT_REQUEST_TIMEOUT_SECONDS", "60"))
+CLIENT_REQUESTS_PER_SESSION = int(os.environ.get("MCP_CLIENT_REQUESTS_PER_SESSION", "4"))
+# A client polling /mcp/stream still counts as reading for this long after a poll ends
+STREAM_READER_GRACE = float(os.environ.get("MCP_STREAM_READER_GRACE_SECONDS", "30"))
+
+# JSON-RPC error: the session has no stream that could carry a server request
+NO_STREAM = -32004
+
+CLIENT_REQUESTS = registry.counter("mcp_client_requests_total", "Server-to-client requests by outcome",
+                                   labelnames=("method", "outcome"))
+
+RequestId = Union[str, int]
+
+# Server-issued ids carry a prefix so they never collide with the client's
+_ids = itertools.count(1)
+
+
+class ClientRequestError(Exception):
+    """The client answered a server request with a JSON-RPC error"""
+
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+class SessionClosed(Exception):
+    """The session ended while a server request was waiting for its answer"""
+
+
+class PendingClientRequests:
+    """Outstanding server-to-client requests of one session, by id"""
+
+    def __init__(self, max_in_flight: int = CLIENT_REQUESTS_PER_SESSION):
+        self._pending: Dict[RequestId, asyncio.Future] = {}
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.closed = False
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def request(self, session: Any, method: str, params: Optional[Dict[str, Any]] = None,
+                      timeout: float = CLIENT_REQUEST_TIMEOUT,
+                      related_request_id: Optional[RequestId] = None) -> Any:
+        """Send a request to the client and wait for its result
+
+        Raises asyncio.TimeoutError when no answer arrives before the
+        deadline (time spent waiting for a free slot counts),
+        ClientRequestError when the client answers with an error and
+        SessionClosed when the session ends first.
+        """
+        from .mcp_protocol import MCPRequest
+
+        if self.closed:
+            raise SessionClosed(session.session_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        outcome = "timeout"
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            CLIENT_REQUESTS.inc(method=method, outcome="busy")
+            raise
+        request_id = f"srv-{next(_ids)}"
+        future = loop.create_future()
+        self._pending[request_id] = future
+        try:
+            await session.send_message(MCPRequest(id=request_id, method=method, params=params),
+                                       related_request_id=related_request_id)
+            result = await asyncio.wait_for(future, max(deadline - loop.time(), 0))
+            outcome = "ok"
+            return result
+        except ClientRequestError:
+            outcome = "error"
+            raise
+        except (SessionClosed, asyncio.CancelledError):
+            outcome = "cancelled"
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+            self._slots.release()
+            CLIENT_REQUESTS.inc(method=method, outcome=outcome)
+
+    def resolve(self, message: Dict[str, Any]) -> bool:
+        """Complete the waiter for a client's response; False if none is waiting"""
+        future = self._pending.get(message.get("id"))
+        if future is None or future.done():
+            return False
+        error = message.get("error")
+        if isinstance(error, dict):
+            future.set_exception(ClientRequestError(error.get("code", -32603), error.get("message", ""),
+                                                    error.get("data")))
+        elif error is not None:
+            # Not a JSON-RPC error object; the waiter still gets an answer
+            future.set_exception(ClientRequestError(-32603, "Malformed error from client", error))
+        else:
+            future.set_result(message.get("result"))
+        return True
+
+    def fail(self, request_id: RequestId, error: Exception) -> bool:
+        """Fail the waiter for a request that cannot reach the client"""
+        future = self._pending.get(request_id)
+        if future is None or future.done():
+            return False
+        future.set_exception(error)
+        return True
+
+    def close(self):
+        """Fail every waiter; called when the session ends"""
+        self.closed = True
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(SessionClosed())
+        self._pending.clear()
+
+
+def is_response(message: Any) -> bool:
+    """Whether a decoded JSON-RPC message is a response rather than a request"""
+    return (isinstance(message, dict) and "method" not in message
+            and ("result" in message or "error" in message))
@@ -0,0 +1,485 @@
+"""Per-session search index over uploaded files
+
+Three structures, all keyed by document id:
+- an inverted index from identifier tokens (including the parts of
+  snake_case and camelCase names) to documents;
+- a trigram index from every lowercase three-character sequence to
+  documents, so substring queries only scan files that can match;
+- a symbol table of classes, functions and methods with their lines.
+
+Postings are `array("I")` of document ids in ascending order, and the
+symbol table is a set of parallel arrays. Document ids only grow, so
+adding a file appends to the end of each posting. A changed file gets
+a new id, and its old id is marked dead in the `alive` bytearray.
+Queries skip dead ids. Once dead ids outnumber MCP_INDEX_COMPACT_RATIO
+of all documents, the postings are rewritten without them.
+
+Extraction (tokens, trigrams, symbols, line offsets) is a pure function
+that runs off the event loop. Applying its result is quick array work on
+the loop, so queries never see a half-updated index.
+
+Besides its own caps, every index draws on one process-wide budget of
+MCP_INDEX_TOTAL_BYTES. When a file does not fit, the least recently used
+indexes of other sessions are evicted (emptied) until it does.
+"""
+import os
+import re
+import time
+import hashlib
+import weakref
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .analysis import language_for
+from .metrics import registry
+
+MAX_FILES = int(os.environ.get("MCP_INDEX_MAX_FILES", "10000"))
+MAX_BYTES = int(os.environ.get("MCP_INDEX_MAX_BYTES", str(64 * 1024 * 1024)))
+COMPACT_RATIO = float(os.environ.get("MCP_INDEX_COMPACT_RATIO", "0.5"))
+# Text held by all session indexes in the process together
+TOTAL_BYTES = int(os.environ.get("MCP_INDEX_TOTAL_BYTES", str(256 * 1024 * 1024)))
+
+SYMBOL_KINDS = ("class", "function", "method", "interface", "struct", "enum", "trait", "record", "type")
+_KIND_CODES = {kind: code for code, kind in enumerate(SYMBOL_KINDS)}
+
+QUERY_MS = registry.histogram("mcp_index_query_ms", "Code index lookup latency",
+                              labelnames=("kind",),
+                              buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100))
+INDEX_FILES = registry.counter("mcp_index_files_total", "Files submitted to session indexes",
+                               labelnames=("outcome",))
+INDEX_EVICTIONS = registry.counter("mcp_index_evictions_total",
+                                   "Session indexes emptied to stay within MCP_INDEX_TOTAL_BYTES")
+
+# Languages without declarations worth indexing
+_PROSE = frozenset({"text", "markdown", "json", "yaml"})
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_CAMEL_PARTS = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+_PY_DEFINITION = re.compile(r"^([ \t]*)(class|def|async\s+def)\s+([A-Za-z_]\w*)")
+_DECLARATIONS = (
+    (re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:(?:public|private|protected|internal|static|abstract|"
+                r"sealed|partial|final|data)\s+)*(class|interface|struct|enum|trait|record|type)\s+"
+                r"([A-Za-z_$][\w$]*)"), None),
+    (re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\*?\s+([A-Za-z_$][\w$]*)"), "function"),
+    (re.compile(r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?"
+                r"(?:\([^)]*\)|[A-Za-z_$][\w$]*)\s*=>"), "function"),
+    (re.compile(r"^\s*func\s+(?:\([^)]*\)\s*)?([A-Za-z_]\w*)"), "function"),
+    (re.compile(r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?fn\s+([A-Za-z_]\w*)"), "function"),
+    (re.compile(r"^\s*def\s+(?:self\.)?([A-Za-z_]\w*[?!]?)"), "function"),
+)
+
+
+def tokens_of(text: str) -> Set[str]:
+    """Lowercase identifiers and their snake_case/camelCase parts"""
+    tokens: Set[str] = set()
+    for identifier in set(_IDENTIFIER.findall(text)):
+        if len(identifier) > 1:
+            tokens.add(identifier.lower())
+        for piece in identifier.split("_"):
+            for part in _CAMEL_PARTS.findall(piece):
+                if len(part) > 1:
+                    tokens.add(part.lower())
+    return tokens
+
+
+def trigrams_of(text: str) -> Set[str]:
+    lowered = text.lower()
+    return {lowered[i:i + 3] for i in range(len(lowered) - 2)}
+
+
+def _python_symbols(lines: Sequence[str]) -> List[Tuple[str, str, int, str]]:
+    """Classes, functions and methods, with containers from indentation
+
+    Much cheaper than walking an AST, which matters at thousands of files.
+    """
+    symbols: List[Tuple[str, str, int, str]] = []
+    # (indent, name, is class) of the enclosing definitions
+    stack: List[Tuple[int, str, bool]] = []
+    for number, line in enumerate(lines, 1):
+        match = _PY_DEFINITION.match(line)
+        if match is None:
+            continue
+        indent = len(match.group(1).expandtabs())
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        is_class = match.group(2) == "class"
+        kind = "class" if is_class else "method" if stack and stack[-1][2] else "function"
+        symbols.append((match.group(3), kind, number, ".".join(entry[1] for entry in stack)))
+        stack.append((indent, match.group(3), is_class))
+    return symbols
+
+
+def _declared_symbols(lines: Sequence[str]) -> List[Tuple[str, str, int, str]]:
+    symbols = []
+    for number, line in enumerate(lines, 1):
+        for pattern, kind in _DECLARATIONS:
+            match = pattern.match(line)
+            if match:
+                if kind is None:
+                    symbols.append((match.group(2), match.group(1), number, ""))
+                else:
+                    symbols.append((match.group(1), kind, number, ""))
+                break
+    return symbols
+
+
+class Extracted:
+    """Everything the index needs from one file, computed off the loop"""
+
+    __slots__ = ("path", "text", "digest", "language", "line_starts", "tokens", "trigrams", "symbols")
+
+    def __init__(self, path: str, content: bytes):
+        self.path = path
+        self.text = content.decode("utf-8", errors="replace")
+        self.digest = hashlib.blake2b(content, digest_size=16).digest()
+        self.language = language_for(path)
+        lines = self.text.split("\n")
+        starts = array("I", [0])
+        offset = 0
+        for line in lines[:-1]:
+            offset += len(line) + 1
+            starts.append(offset)
+        if len(starts) > 1 and starts[-1] == len(self.text):
+            # A trailing newline does not start another line
+            starts.pop()
+        self.line_starts = starts
+        self.tokens = tokens_of(self.text)
+        self.trigrams = trigrams_of(self.text)
+        if self.language == "python":
+            self.symbols = _python_symbols(lines)
+        else:
+            self.symbols = [] if self.language in _PROSE else _declared_symbols(lines)
+
+
+def extract(files: Iterable[Tuple[str, bytes]]) -> List[Extracted]:
+    return [Extracted(path, content) for path, content in files]
+
+
+class _Document:
+    __slots__ = ("path", "text", "digest", "language", "line_starts", "symbol_count")
+
+    def __init__(self, extracted: Extracted):
+        self.path = extracted.path
+        self.text = extracted.text
+        self.digest = extracted.digest
+        self.language = extracted.language
+        self.line_starts = extracted.line_starts
+        self.symbol_count = len(extracted.symbols)
+
+    def line_of(self, offset: int) -> int:
+        return bisect_right(self.line_starts, offset)
+
+    def line_text(self, line: int) -> str:
+        start = self.line_starts[line - 1]
+        end = self.line_starts[line] - 1 if line < len(self.line_starts) else len(self.text)
+        return self.text[start:end].rstrip("\r\n")
+
+
+class IndexBudget:
+    """Text bytes of every live index, evicting the least recently used first"""
+
+    def __init__(self, max_bytes: int = TOTAL_BYTES):
+        self.max_bytes = max_bytes
+        self.used = 0
+        # id(index) -> bytes charged, least recently used first
+        self._sizes: "OrderedDict[int, int]" = OrderedDict()
+        self._refs: Dict[int, "weakref.ref[CodeIndex]"] = {}
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def touch(self, index: "CodeIndex") -> int:
+        key = id(index)
+        if key not in self._refs:
+            # Indexes of ended sessions give their bytes back when collected
+            self._refs[key] = weakref.ref(index, lambda _, key=key: self._forget(key))
+            self._sizes[key] = 0
+        self._sizes.move_to_end(key)
+        return key
+
+    def charge(self, index: "CodeIndex", size: int):
+        self._sizes[self.touch(index)] += size
+        self.used += size
+
+    def reserve(self, index: "CodeIndex", size: int) -> bool:
+        """Evict other indexes until size more bytes fit; False if they cannot"""
+        key = self.touch(index)
+        for other_key in list(self._sizes):
+            if self.used + size <= self.max_bytes:
+                break
+            if other_key == key:
+                continue
+            other = self._refs[other_key]()
+            self._forget(other_key)
+            if other is not None:
+                other.evict()
+        return self.used + size <= self.max_bytes
+
+    def _forget(self, key: int):
+        self._refs.pop(key, None)
+        self.used -= self._sizes.pop(key, 0)
+
+
+BUDGET = IndexBudget()
+
+
+def _contains(posting: array, doc_id: int) -> bool:
+    i = bisect_left(posting, doc_id)
+    return i < len(posting) and posting[i] == doc_id
+
+
+class CodeIndex:
+    """Token, trigram and symbol index for one session's files"""
+
+    def __init__(self, max_files: int = MAX_FILES, max_bytes: int = MAX_BYTES,
+                 budget: Optional[IndexBudget] = None):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.budget = BUDGET if budget is None else budget
+        # Set when the budget emptied this index for another session's files
+        self.evicted = False
+        self._clear()
+
+    def _clear(self):
+        self.docs: List[Optional[_Document]] = []
+        self.alive = bytearray()
+        self.paths: Dict[str, int] = {}
+        self.tokens: Dict[str, array] = {}
+        self.trigrams: Dict[str, array] = {}
+        self.symbol_ids: Dict[str, array] = {}
+        self.sym_name: List[str] = []
+        self.sym_container: List[str] = []
+        self.sym_doc = array("I")
+        self.sym_line = array("I")
+        self.sym_kind = bytearray()
+        self.text_bytes = 0
+        self.dead = 0
+        self._sorted_names: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def changed(self, files: Iterable[Tuple[str, bytes]]) -> List[Tuple[str, bytes]]:
+        """Files whose content differs from what is indexed"""
+        result = []
+        for path, content in files:
+            doc_id = self.paths.get(path)
+            if doc_id is not None and self.docs[doc_id].digest == hashlib.blake2b(content, digest_size=16).digest():
+                INDEX_FILES.inc(outcome="unchanged")
+                continue
+            result.append((path, content))
+        return result
+
+    def add(self, extracted: Extracted) -> bool:
+        """Index one file, replacing an older version; False when over the limits"""
+        previous = self.paths.get(extracted.path)
+        size = len(extracted.text)
+        if previous is None and len(self.paths) >= self.max_files:
+            return False
+        freed = len(self.docs[previous].text) if previous is not None else 0
+        if self.text_bytes - freed + size > self.max_bytes:
+            return False
+        if not self.budget.reserve(self, size - freed):
+            return False
+        if previous is not None:
+            self._kill(previous)
+        INDEX_FILES.inc(outcome="updated" if previous is not None else "added")
+        self.evicted = False
+
+        doc_id = len(self.docs)
+        self.docs.append(_Document(extracted))
+        self.alive.append(1)
+        self.paths[extracted.path] = doc_id
+        self.text_bytes += size
+        self.budget.charge(self, size)
+        for token in extracted.tokens:
+            self.tokens.setdefault(token, array("I")).append(doc_id)
+        for trigram in extracted.trigrams:
+            self.trigrams.setdefault(trigram, array("I")).append(doc_id)
+        for name, kind, line, container in extracted.symbols:
+            symbol_id = len(self.sym_name)
+            self.sym_name.append(name)
+            self.sym_container.append(container)
+            self.sym_doc.append(doc_id)
+            self.sym_line.append(line)
+            self.sym_kind.append(_KIND_CODES.get(kind, _KIND_CODES["type"]))
+            self.symbol_ids.setdefault(name.lower(), array("I")).append(symbol_id)
+        self._sorted_names = None
+        return True
+
+    def remove(self, path: str) -> bool:
+        doc_id = self.paths.pop(path, None)
+        if doc_id is None:
+            return False
+        self._kill(doc_id)
+        INDEX_FILES.inc(outcome="removed")
+        self._maybe_compact()
+        return True
+
+    def _kill(self, doc_id: int):
+        self.alive[doc_id] = 0
+        self.text_bytes -= len(self.docs[doc_id].text)
+        self.budget.charge(self, -len(self.docs[doc_id].text))
+        self.dead += 1
+        self._sorted_names = None
+
+    def _maybe_compact(self):
+        if self.dead and self.dead >= COMPACT_RATIO * (len(self.paths) + self.dead):
+            self.compact()
+
+    def compact(self):
+        """Rewrite postings and the symbol table without dead documents"""
+        alive = self.alive
+        for doc_id, doc in enumerate(self.docs):
+            if doc is not None and not alive[doc_id]:
+                self.docs[doc_id] = None
+        for index in (self.tokens, self.trigrams):
+            for key, posting in list(index.items()):
+                kept = array("I", (d for d in posting if alive[d]))
+                if not kept:
+                    del index[key]
+                elif len(kept) < len(posting):
+                    index[key] = kept
+
+        keep = [s for s in range(len(self.sym_name)) if alive[self.sym_doc[s]]]
+        self.sym_name = [self.sym_name[s] for s in keep]
+        self.sym_container = [self.sym_container[s] for s in keep]
+        self.sym_doc = array("I", (self.sym_doc[s] for s in keep))
+        self.sym_line = array("I", (self.sym_line[s] for s in keep))
+        self.sym_kind = bytearray(self.sym_kind[s] for s in keep)
+        self.symbol_ids = {}
+        for symbol_id, name in enumerate(self.sym_name):
+            self.symbol_ids.setdefault(name.lower(), array("I")).append(symbol_id)
+        self.dead = 0
+        self._sorted_names = None
+
+    def evict(self):
+        """Drop every document; the budget has already released their bytes"""
+        self._clear()
+        self.evicted = True
+        INDEX_EVICTIONS.inc()
+
+    def finish_update(self):
+        """Compact if this update left too many dead documents behind"""
+        self._maybe_compact()
+
+    def _candidates(self, postings: List[Optional[array]]) -> List[int]:
+        """Live documents present in every posting"""
+        if not postings or any(p is None for p in postings):
+            return []
+        postings = sorted(postings, key=len)
+        alive = self.alive
+        return [d for d in postings[0] if alive[d] and all(_contains(p, d) for p in postings[1:])]
+
+    def _hit(self, doc_id: int, offset: int, length: int) -> Dict[str, Any]:
+        doc = self.docs[doc_id]
+        line = doc.line_of(offset)
+        return {"path": doc.path, "line": line, "column": offset - doc.line_starts[line - 1] + 1,
+                "match": doc.text[offset:offset + length], "text": doc.line_text(line).strip()[:200]}
+
+    def search(self, query: str, mode: str = "substring", limit: int = 50,
+               path_prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Substring or token search; hits are (path, line, column, line text)"""
+        started = time.perf_counter()
+        self.budget.touch(self)
+        hits: List[Dict[str, Any]] = []
+        needle = query.lower()
+        if mode == "token":
+            words = [w.lower() for w in _IDENTIFIER.findall(query)]
+            doc_ids = self._candidates([self.tokens.get(w) for w in words]) if words else []
+            # Tokens include camelCase parts, so match anywhere in the line
+            patterns = [re.compile(re.escape(w), re.IGNORECASE) for w in words]
+        elif len(needle) >= 3:
+            doc_ids = self._candidates([self.trigrams.get(t) for t in trigrams_of(needle)])
+            patterns = []
+        else:
+            # Too short for trigrams: scan every live document
+            doc_ids = [d for d in self.paths.values()]
+            patterns = []
+        for doc_id in sorted(doc_ids):
+            doc = self.docs[doc_id]
+            if path_prefix and not doc.path.startswith(path_prefix):
+                continue
+            if patterns:
+                for line in range(1, len(doc.line_starts) + 1):
+                    text = doc.line_text(line)
+                    matches = [p.search(text) for p in patterns]
+                    if all(matches):
+                        hits.append(self._hit(doc_id, doc.line_starts[line - 1] + matches[0].start(),
+                                              len(words[0])))
+                        if len(hits) >= limit:
+                            break
+            else:
+                lowered = doc.text.lower()
+                if len(lowered) == len(doc.text) and len(needle) == len(query):
+                    # Lowering kept every character's length, so offsets carry over
+                    offset = lowered.find(needle)
+                    while offset != -1 and len(hits) < limit:
+                        hits.append(self._hit(doc_id, offset, len(needle)))
+                        offset = lowered.find(needle, offset + 1)
+                else:
+                    # e.g. "İ" lowers to two characters: match the original text instead
+                    pattern = re.compile(re.escape(query), re.IGNORECASE)
+                    for match in pattern.finditer(doc.text):
+                        hits.append(self._hit(doc_id, match.start(), match.end() - match.start()))
+                        if len(hits) >= limit:
+                            break
+            if len(hits) >= limit:
+                break
+        QUERY_MS.observe((time.perf_counter() - started) * 1000, kind=mode)
+        return hits
+
+    def find_symbol(self, name: str, kind: Optional[str] = None, prefix: bool = False,
+                    limit: int = 50) -> List[Dict[str, Any]]:
+        """Definitions of a symbol by exact (case-insensitive) name or name prefix"""
+        started = time.perf_counter()
+        self.budget.touch(self)
+        key = name.lower()
+        if prefix:
+            if self._sorted_names is None:
+                self._sorted_names = sorted(self.symbol_ids)
+            names = self._sorted_names
+            start = bisect_left(names, key)
+            symbol_ids: List[int] = []
+            for candidate in names[start:]:
+                if not candidate.startswith(key) or len(symbol_ids) >= limit * 4:
+                    break
+                symbol_ids.extend(self.symbol_ids[candidate])
+        else:
+            symbol_ids = list(self.symbol_ids.get(key, ()))
+        results = []
+        for symbol_id in symbol_ids:
+            doc_id = self.sym_doc[symbol_id]
+            symbol_kind = SYMBOL_KINDS[self.sym_kind[symbol_id]]
+            if not self.alive[doc_id] or (kind and symbol_kind != kind):
+                continue
+            doc = self.docs[doc_id]
+            line = self.sym_line[symbol_id]
+            results.append({"name": self.sym_name[symbol_id], "kind": symbol_kind,
+                            "container": self.sym_container[symbol_id] or None, "path": doc.path,
+                            "line": line, "text": doc.line_text(line).strip()[:200]})
+            if len(results) >= limit:
+                break
+        QUERY_MS.observe((time.perf_counter() - started) * 1000, kind="symbol")
+        return results
+
+    def file(self, path: str) -> Optional[_Document]:
+        doc_id = self.paths.get(path)
+        return self.docs[doc_id] if doc_id is not None else None
+
+    def files(self) -> List[Dict[str, Any]]:
+        return [{"path": path, "language": self.docs[d].language, "lines": len(self.docs[d].line_starts),
+                 "symbols": self.docs[d].symbol_count} for path, d in sorted(self.paths.items())]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "files": len(self.paths),
+            "bytes": self.text_bytes,
+            "tokens": len(self.tokens),
+            "trigrams": len(self.trigrams),
+            "symbols": len(self.sym_name),
+            "postings": sum(len(p) for p in self.tokens.values()) + sum(len(p) for p in self.trigrams.values()),
+            "dead_documents": self.dead,
+        }
@@ -0,0 +1,120 @@
+import os
+import gzip
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from .metrics import registry
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip is always available
+    brotli = None
+
+GZIP = "gzip"
+BROTLI = "br"
+
+MIN_COMPRESS_BYTES = int(os.environ.get("MCP_COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("MCP_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("MCP_BROTLI_QUALITY", "5"))
+
+COMPRESSION_CACHE_EVENTS = registry.counter(
+    "mcp_compression_cache_total", "Compressed static response lookups", labelnames=("result",)
+)
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    """Encodings this worker can produce, in order of preference"""
+    return (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick a content coding from an Accept-Encoding header
+
+    Returns None when the response should be sent as-is.
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        fields = part.strip().split(";")
+        coding = fields[0].strip().lower()
+        quality = 1.0
+        for param in fields[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            weights[coding] = quality
+
+    best, best_quality = None, 0.0
+    for coding in supported_encodings():
+        quality = weights.get(coding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress a complete body"""
+    if encoding == BROTLI:
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == GZIP:
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class CompressionCache:
+    """LRU of compressed bodies keyed by content digest
+
+    Static responses (tools/list, resources/list, ...) repeat byte for
+    byte, so hashing is far cheaper than compressing them again.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[bytes, str], bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compress(self, data: bytes, encoding: str) -> bytes:
+        key = (hashlib.blake2b(data, digest_size=16).digest(), encoding)
+        compressed = self._entries.get(key)
+        if compressed is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            COMPRESSION_CACHE_EVENTS.inc(result="hit")
+            return compressed
+
+        self.misses += 1
+        COMPRESSION_CACHE_EVENTS.inc(result="miss")
+        compressed = compress(data, encoding)
+        self._entries[key] = compressed
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return compressed
+
+
+response_cache = CompressionCache()
+
+
+def encode_body(body: bytes, accept_encoding: Optional[str],
+                static: bool = False) -> Tuple[bytes, Dict[str, str]]:
+    """Compress a response body when it is worth it
+
+    Returns the body to send and the headers describing it. Bodies below
+    MIN_COMPRESS_BYTES are sent uncompressed; static bodies go through
+    the compression cache.
+    """
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+        return body, {"Vary": "Accept-Encoding"}
+
+    if static:
+        body = response_cache.get_or_compress(body, encoding)
+    else:
+        body = compress(body, encoding)
+    return body, {"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
@@ -0,0 +1,257 @@
+"""Adaptive concurrency limits for tool execution
+
+Each tool belongs to a pool (e.g. "analysis", "generation"). Every pool
+has its own limit, adjusted from the latency of completed runs by AIMD:
+- additive increase: while a pool is busy and its recent latency stays
+  close to its baseline, the limit grows by about one per limit-sized
+  batch of completions;
+- multiplicative decrease: when a run hits its deadline, or the pool is
+  saturated (busy or queueing) and recent latency exceeds the baseline by
+  MCP_TOOL_LATENCY_TOLERANCE, the limit is multiplied by
+  MCP_TOOL_CONCURRENCY_BACKOFF (at most once per recent latency interval).
+  Baselines under MCP_TOOL_LATENCY_FLOOR_MS count as the floor, so jitter
+  of near-instant tools is not mistaken for overload.
+
+Calls over the limit wait in a short FIFO queue. When the queue is full,
+or a call waits longer than MCP_TOOL_QUEUE_TIMEOUT_MS, the call is shed
+with ServerBusy, which callers answer as a JSON-RPC "Server busy" error.
+Only tool runs pass through a pool. Metadata methods (initialize,
+tools/list, ping, ...) never wait behind slow tools.
+
+MCP_TOOL_POOLS overrides the defaults per pool as JSON:
+
+    {"sampling": {"initial": 4, "max_limit": 16}, "analysis": {"queue_size": 100}}
+"""
+import os
+import json
+import time
+import asyncio
+import weakref
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from .deadlines import current
+from .metrics import registry
+
+# JSON-RPC server-defined error for shed calls
+SERVER_BUSY = -32003
+
+DEFAULT_POOL = "default"
+POOL_DEFAULTS = {
+    "initial": int(os.environ.get("MCP_TOOL_CONCURRENCY_INITIAL", "8")),
+    "min_limit": int(os.environ.get("MCP_TOOL_CONCURRENCY_MIN", "1")),
+    # Keep the sum over pools below host.json maxConcurrentRequests
+    "max_limit": int(os.environ.get("MCP_TOOL_CONCURRENCY_MAX", "24")),
+    "queue_size": int(os.environ.get("MCP_TOOL_QUEUE_SIZE", "32")),
+    "queue_timeout_ms": float(os.environ.get("MCP_TOOL_QUEUE_TIMEOUT_MS", "2000")),
+    "tolerance": float(os.environ.get("MCP_TOOL_LATENCY_TOLERANCE", "2.0")),
+    "backoff": float(os.environ.get("MCP_TOOL_CONCURRENCY_BACKOFF", "0.9")),
+}
+# Latency below which ratios to the baseline are noise
+LATENCY_FLOOR_MS = float(os.environ.get("MCP_TOOL_LATENCY_FLOOR_MS", "1.0"))
+
+# Smoothing of the recent and baseline latency averages
+RECENT_WEIGHT = 0.2
+BASELINE_WEIGHT = 0.02
+# Completions seen before latency may lower a limit
+WARMUP_SAMPLES = 10
+
+SHED = registry.counter("mcp_tool_shed_total", "Tool calls rejected as server busy",
+                        labelnames=("pool", "reason"))
+LIMIT_CHANGES = registry.counter("mcp_tool_concurrency_changes_total", "Adaptive limit adjustments",
+                                 labelnames=("pool", "direction"))
+
+
+class ServerBusy(Exception):
+    """A tool call was shed because its pool is saturated"""
+
+    def __init__(self, pool: str, reason: str, retry_after_ms: int):
+        super().__init__("Server busy")
+        self.pool = pool
+        self.reason = reason
+        self.retry_after_ms = retry_after_ms
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit with a bounded wait queue for one pool"""
+
+    def __init__(self, pool: str, initial: int = 8, min_limit: int = 1, max_limit: int = 24,
+                 queue_size: int = 32, queue_timeout_ms: float = 2000, tolerance: float = 2.0,
+                 backoff: float = 0.9):
+        self.pool = pool
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.max_queue = queue_size
+        self.queue_timeout = queue_timeout_ms / 1000
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self.recent_ms: Optional[float] = None
+        self.baseline_ms: Optional[float] = None
+        self.samples = 0
+        self.shed = 0
+        self._last_decrease = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def capacity(self) -> int:
+        return int(self.limit)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def run(self, execute: Callable[[], Awaitable[Any]]) -> Any:
+        """Run execute() once a slot is free; raises ServerBusy when shed"""
+        await self._acquire()
+        started = time.monotonic()
+        latency: Optional[float] = None
+        dropped = False
+        try:
+            result = await execute()
+            latency = time.monotonic() - started
+            return result
+        except asyncio.CancelledError:
+            # Runs stopped at their deadline signal overload; a caller
+            # going away says nothing about latency
+            context = current()
+            if context is not None and context.remaining() == 0:
+                latency, dropped = time.monotonic() - started, True
+            raise
+        except Exception:
+            latency = time.monotonic() - started
+            raise
+        finally:
+            self._release(latency, dropped)
+
+    async def _acquire(self):
+        if not self._waiters and self.in_flight < self.capacity:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._shed("queue_full")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._shed("queue_timeout")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before the cancellation
+                self._release(None, False)
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+
+    def _release(self, latency: Optional[float], dropped: bool):
+        busy = self.in_flight >= self.limit / 2
+        self.in_flight -= 1
+        if latency is not None:
+            self._adjust(latency * 1000, dropped, busy)
+        # Hand freed slots to waiters in arrival order
+        while self._waiters and self.in_flight < self.capacity:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _adjust(self, latency_ms: float, dropped: bool, busy: bool):
+        self.samples += 1
+        if self.recent_ms is None:
+            self.recent_ms = self.baseline_ms = latency_ms
+        else:
+            self.recent_ms += RECENT_WEIGHT * (latency_ms - self.recent_ms)
+            # The baseline moves slowly both ways, so a run of fast calls
+            # does not make ordinary slower ones look like overload
+            self.baseline_ms += BASELINE_WEIGHT * (self.recent_ms - self.baseline_ms)
+
+        # Latency only signals overload while calls compete for slots; a
+        # quiet pool with mixed tool latencies must keep its limit
+        saturated = busy or self.queued > 0
+        congested = dropped or (saturated and self.samples >= WARMUP_SAMPLES
+                                and self.recent_ms > max(self.baseline_ms, LATENCY_FLOOR_MS) * self.tolerance)
+        now = time.monotonic()
+        if congested:
+            # One decrease per latency interval, so a burst of slow
+            # completions from the same overload counts once
+            if now - self._last_decrease >= self.recent_ms / 1000 and self.limit > self.min_limit:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+                LIMIT_CHANGES.inc(pool=self.pool, direction="down")
+        elif busy and self.limit < self.max_limit:
+            # Only grow a limit the traffic is actually using
+            previous = self.capacity
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            if self.capacity > previous:
+                LIMIT_CHANGES.inc(pool=self.pool, direction="up")
+
+    def _shed(self, reason: str) -> ServerBusy:
+        self.shed += 1
+        SHED.inc(pool=self.pool, reason=reason)
+        return ServerBusy(self.pool, reason, int(self.recent_ms or 1000))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "recent_ms": round(self.recent_ms or 0, 2),
+            "baseline_ms": round(self.baseline_ms or 0, 2),
+            "shed": self.shed,
+        }
+
+
+def load_pool_settings(raw: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Parse MCP_TOOL_POOLS into per-pool limiter settings"""
+    raw = (os.environ.get("MCP_TOOL_POOLS", "") if raw is None else raw).strip()
+    return {pool: {**POOL_DEFAULTS, **overrides} for pool, overrides in json.loads(raw).items()} if raw else {}
+
+
+class ToolLimiters:
+    """The adaptive limiters of one server, created per pool on first use"""
+
+    def __init__(self, settings: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.settings = load_pool_settings() if settings is None else settings
+        self.pools: Dict[str, AdaptiveLimiter] = {}
+        _live_limiters.add(self)
+
+    def for_pool(self, pool: str) -> AdaptiveLimiter:
+        limiter = self.pools.get(pool)
+        if limiter is None:
+            limiter = self.pools[pool] = AdaptiveLimiter(pool, **self.settings.get(pool, POOL_DEFAULTS))
+        return limiter
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current state of every pool, for tuning"""
+        return {pool: limiter.snapshot() for pool, limiter in self.pools.items()}
+
+
+_live_limiters: "weakref.WeakSet[ToolLimiters]" = weakref.WeakSet()
+
+
+def _pool_values(read: Callable[[AdaptiveLimiter], float]) -> Callable[[], Dict[Tuple[str, ...], float]]:
+    def collect() -> Dict[Tuple[str, ...], float]:
+        values: Dict[Tuple[str, ...], float] = {}
+        for limiters in list(_live_limiters):
+            for pool, limiter in list(limiters.pools.items()):
+                values[(pool,)] = values.get((pool,), 0) + read(limiter)
+        return values
+    return collect
+
+
+registry.gauge("mcp_tool_concurrency_limit", "Current adaptive concurrency limit per tool pool",
+               labelnames=("pool",), callback=_pool_values(lambda l: l.limit))
+registry.gauge("mcp_tool_concurrency_in_flight", "Tool runs executing per pool",
+               labelnames=("pool",), callback=_pool_values(lambda l: l.in_flight))
+registry.gauge("mcp_tool_concurrency_queued", "Tool calls waiting for a slot per pool",
+               labelnames=("pool",), callback=_pool_values(lambda l: l.queued))
+registry.gauge("mcp_tool_latency_recent_ms", "Smoothed recent tool latency per pool",
+               labelnames=("pool",), callback=_pool_values(lambda l: l.recent_ms or 0))
+registry.gauge("mcp_tool_latency_baseline_ms", "Baseline tool latency per pool",
+               labelnames=("pool",), callback=_pool_values(lambda l: l.baseline_ms or 0))
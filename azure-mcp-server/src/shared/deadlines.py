@@ -0,0 +1,134 @@
+"""Request deadlines and cancellation for tool work
+
+Each tools/call runs under a RequestContext. Its deadline is the
+earliest of three limits:
+- the caller's remaining budget (the X-MCP-Timeout-Ms header, which the
+  gateway or client sets to what it is still willing to wait);
+- the tool's own limit;
+- MCP_TOOL_TIMEOUT_SECONDS.
+
+The tool task is cancelled as soon as the deadline passes or the caller
+goes away: the session ends, or the response stream is closed. Results
+nobody is waiting for are therefore never computed. Tool code can read
+the active context with current() to size its own work, e.g. a pool job
+timeout.
+"""
+import os
+import time
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Mapping, Optional
+
+from .metrics import registry
+
+TIMEOUT_HEADER = "X-MCP-Timeout-Ms"
+# Azure's front end drops HTTP requests after 230 seconds
+DEFAULT_TOOL_TIMEOUT = float(os.environ.get("MCP_TOOL_TIMEOUT_SECONDS", "230"))
+
+DEADLINE = "deadline"
+DISCONNECT = "disconnect"
+
+CANCELLATIONS = registry.counter("mcp_tool_cancellations_total", "Tool runs stopped before completion",
+                                 labelnames=("reason",))
+CANCELLED_WORK_SECONDS = registry.counter("mcp_tool_cancelled_work_seconds_total",
+                                          "Time tool runs had spent when they were stopped",
+                                          labelnames=("reason",))
+
+_current: "contextvars.ContextVar[Optional[RequestContext]]" = contextvars.ContextVar("mcp_request_context",
+                                                                                      default=None)
+
+
+class RequestCancelled(Exception):
+    """The request's deadline passed or its caller went away"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Request cancelled: {reason}")
+        self.reason = reason
+
+
+class RequestContext:
+    """Deadline and cancellation state of one request"""
+
+    __slots__ = ("deadline", "reason", "_task")
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def narrow(self, timeout: Optional[float]) -> "RequestContext":
+        """Tighten the deadline to at most `timeout` seconds from now"""
+        if timeout:
+            deadline = time.monotonic() + timeout
+            if self.deadline is None or deadline < self.deadline:
+                self.deadline = deadline
+        return self
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None without a deadline"""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def cancel(self, reason: str = DISCONNECT):
+        """Stop the work running under this context"""
+        if self.reason is None:
+            self.reason = reason
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def run(self, work: Awaitable[Any]) -> Any:
+        """Await work, cancelling it at the deadline or on cancel()
+
+        Raises RequestCancelled in either case. Cancellation from outside
+        (e.g. the host abandoning the invocation) also cancels the work.
+        """
+        if self.reason is not None or self.remaining() == 0:
+            if asyncio.iscoroutine(work):
+                work.close()
+            raise self._stopped(self.reason or DEADLINE, 0.0)
+        token = _current.set(self)
+        try:
+            task = self._task = asyncio.ensure_future(work)
+        finally:
+            _current.reset(token)
+        started = time.monotonic()
+        try:
+            return await asyncio.wait_for(task, self.remaining())
+        except asyncio.TimeoutError:
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                raise  # the tool itself raised TimeoutError
+            self.reason = self.reason or DEADLINE
+            raise self._stopped(self.reason, time.monotonic() - started)
+        except asyncio.CancelledError:
+            if self.reason is None:
+                raise
+            raise self._stopped(self.reason, time.monotonic() - started)
+        finally:
+            self._task = None
+
+    def _stopped(self, reason: str, elapsed: float) -> RequestCancelled:
+        CANCELLATIONS.inc(reason=reason)
+        CANCELLED_WORK_SECONDS.inc(elapsed, reason=reason)
+        return RequestCancelled(reason)
+
+
+def current() -> Optional[RequestContext]:
+    """The context of the request whose work is running, if any"""
+    return _current.get()
+
+
+def timeout_from_headers(headers: Mapping[str, str]) -> Optional[float]:
+    """Caller's remaining budget in seconds from X-MCP-Timeout-Ms"""
+    value = headers.get(TIMEOUT_HEADER)
+    if not value:
+        return None
+    try:
+        timeout_ms = float(value)
+    except ValueError:
+        return None
+    return timeout_ms / 1000 if timeout_ms > 0 else None
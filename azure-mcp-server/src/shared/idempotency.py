@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+TOOL_CACHE_EVENTS = registry.counter(
+    "mcp_tool_cache_events_total", "Tool call outcomes in the idempotency layer", labelnames=("event",)
+)
+
+
+def idempotency_key(session_id: str, tool_name: str, arguments: Dict[str, Any]) -> str:
+    """Key a tool call by session, tool and canonicalized arguments"""
+    canonical = json.dumps(arguments or {}, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    digest = hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+    return f"{session_id}:{tool_name}:{digest}"
+
+
+class ResultStore(ABC):
+    """Short-lived store for completed tool results"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float):
+        pass
+
+    async def connect(self):
+        """Open backing connections ahead of the first request"""
+        pass
+
+
+class InMemoryResultStore(ResultStore):
+    """LRU of results with per-entry expiry, local to this worker"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class SharedResultStore(ResultStore):
+    """Results in a Redis-compatible store so retries hit any worker
+
+    `client` is an asyncio Redis client; values are stored as JSON.
+    """
+
+    def __init__(self, client: Any, key_prefix: str = "mcp:tool-result:"):
+        self.client = client
+        self.key_prefix = key_prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(f"{self.key_prefix}{key}")
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await self.client.set(f"{self.key_prefix}{key}", json.dumps(value), px=max(int(ttl * 1000), 1))
+
+    async def connect(self):
+        await self.client.ping()
+
+
+class IdempotencyCache:
+    """Collapses retried tool calls onto one execution
+
+    Identical calls that arrive while the first is still running wait
+    for its result instead of running the tool again. Results of
+    cacheable tools are kept for the tool's TTL afterwards.
+    """
+
+    def __init__(self, store: Optional[ResultStore] = None):
+        self.store = store or InMemoryResultStore()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.joined = 0
+        self.executions = 0
+
+    async def run(self, key: str, execute: Callable[[], Awaitable[Any]],
+                  cacheable: bool = False, ttl: float = 0) -> Any:
+        if cacheable and ttl > 0:
+            cached = await self.store.get(key)
+            if cached is not None:
+                self.hits += 1
+                TOOL_CACHE_EVENTS.inc(event="hit")
+                return cached
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.joined += 1
+            TOOL_CACHE_EVENTS.inc(event="joined")
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The call we joined was abandoned; run it ourselves
+                return await self.run(key, execute, cacheable, ttl)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.executions += 1
+        TOOL_CACHE_EVENTS.inc(event="execution")
+        try:
+            result = await execute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure is not logged
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        future.set_result(result)
+        if cacheable and ttl > 0:
+            try:
+                await self.store.set(key, result, ttl)
+            except Exception as e:
+                logger.warning("Could not cache tool result: %s", e)
+        return result
+
+
+def create_result_store() -> ResultStore:
+    """Build the tool result store from environment settings
+
+    MCP_TOOL_CACHE_MAX_ENTRIES bounds the in-memory LRU;
+    MCP_TOOL_CACHE_REDIS_URL switches to the shared backend.
+    """
+    redis_url = os.environ.get("MCP_TOOL_CACHE_REDIS_URL")
+    if redis_url:
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            logger.warning("MCP_TOOL_CACHE_REDIS_URL is set but redis is not installed; using in-memory cache")
+        else:
+            return SharedResultStore(redis.from_url(redis_url))
+
+    return InMemoryResultStore(int(os.environ.get("MCP_TOOL_CACHE_MAX_ENTRIES", "1024")))
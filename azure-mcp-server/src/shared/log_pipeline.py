@@ -0,0 +1,186 @@
+"""Request logging kept off the event loop
+
+Log records from the request path go into a bounded in-memory queue. A
+background thread formats them and hands them, in batches, to the
+exporting handlers (Application Insights). Nothing on the loop waits
+for an exporter.
+
+Records are formatted on that thread, not when they are logged, so the
+hot path should pass arguments (`logger.info("x=%s", x)`) rather than
+f-strings.
+
+The pipeline also collects one compact audit row per command: time,
+user, method, tool, latency and status. The rows are written to the
+`azure_mcp.audit` logger as one JSON record per batch.
+
+Both queues are bounded (MCP_LOG_QUEUE_SIZE). During a burst, new
+entries are dropped and counted in mcp_log_dropped_total{stream}; the
+loop is never blocked.
+"""
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from .metrics import registry
+
+QUEUE_SIZE = int(os.environ.get("MCP_LOG_QUEUE_SIZE", "10000"))
+BATCH_SIZE = int(os.environ.get("MCP_LOG_BATCH_SIZE", "500"))
+FLUSH_INTERVAL = float(os.environ.get("MCP_LOG_FLUSH_INTERVAL_MS", "1000")) / 1000
+AUDIT_ENABLED = os.environ.get("MCP_AUDIT_ENABLED", "true").lower() == "true"
+
+AUDIT_FIELDS = ("ts", "user", "method", "tool", "latency_ms", "status")
+
+audit_logger = logging.getLogger("azure_mcp.audit")
+
+DROPPED = registry.counter("mcp_log_dropped_total", "Log records and audit rows dropped on a full queue",
+                           labelnames=("stream",))
+EXPORTED = registry.counter("mcp_log_exported_total", "Log records and audit rows handed to exporters",
+                            labelnames=("stream",))
+
+AuditRow = Tuple[float, Optional[str], str, Optional[str], float, str]
+
+
+class _QueueHandler(logging.Handler):
+    """Enqueues records as they are, without formatting them"""
+
+    def __init__(self, pipeline: "LogPipeline"):
+        super().__init__()
+        self.pipeline = pipeline
+
+    def emit(self, record: logging.LogRecord):
+        self.pipeline.enqueue(record)
+
+
+class LogPipeline:
+    """Bounded queues of log records and audit rows, exported in batches
+
+    `targets` are the handlers that do the slow work; they only ever run
+    on the pipeline's thread (or in flush()). The thread starts with the
+    first record.
+    """
+
+    def __init__(self, queue_size: int = QUEUE_SIZE, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.targets: List[logging.Handler] = []
+        self.handler = _QueueHandler(self)
+        self._records: Deque[logging.LogRecord] = deque()
+        self._audit: Deque[AuditRow] = deque()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._export_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _start(self):
+        if self._thread is None and not self._stopped:
+            self._thread = threading.Thread(target=self._run, name="mcp-log-pipeline", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, record: logging.LogRecord):
+        if not self.targets:
+            return
+        if len(self._records) >= self.queue_size:
+            DROPPED.inc(stream="log")
+            return
+        self._records.append(record)
+        if self._thread is None:
+            self._start()
+        elif len(self._records) >= self.batch_size:
+            self._wake.set()
+
+    def audit(self, user: Optional[str], method: str, tool: Optional[str], latency_ms: float, status: str):
+        """Queue one audit row for the next batch"""
+        if len(self._audit) >= self.queue_size:
+            DROPPED.inc(stream="audit")
+            return
+        self._audit.append((round(time.time(), 3), user, method, tool, round(latency_ms, 1), status))
+        if self._thread is None:
+            self._start()
+        elif len(self._audit) >= self.batch_size:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Export everything queued so far"""
+        with self._export_lock:
+            while self._records:
+                batch = [self._records.popleft() for _ in range(min(self.batch_size, len(self._records)))]
+                for record in batch:
+                    for target in self.targets:
+                        if record.levelno >= target.level:
+                            target.handle(record)
+                EXPORTED.inc(len(batch), stream="log")
+            while self._audit:
+                rows = [self._audit.popleft() for _ in range(min(self.batch_size, len(self._audit)))]
+                audit_logger.info("%s", _AuditBatch(rows))
+                EXPORTED.inc(len(rows), stream="audit")
+
+    def depth(self) -> int:
+        return len(self._records) + len(self._audit)
+
+    def close(self, timeout: float = 2.0):
+        """Stop the thread after a final flush, then flush the exporters"""
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+        for target in self.targets:
+            target.flush()
+
+
+class _AuditBatch:
+    """Audit rows serialized only when a handler formats the record"""
+
+    __slots__ = ("rows",)
+
+    def __init__(self, rows: List[AuditRow]):
+        self.rows = rows
+
+    def __str__(self) -> str:
+        return json.dumps({"fields": AUDIT_FIELDS, "rows": self.rows}, separators=(",", ":"))
+
+
+pipeline = LogPipeline()
+
+registry.gauge("mcp_log_queue_depth", "Log records and audit rows waiting for export",
+               callback=pipeline.depth)
+
+
+def attach(logger: logging.Logger):
+    """Route a logger's exported records through the pipeline
+
+    Adds the Application Insights handler as a pipeline target when
+    APPLICATIONINSIGHTS_CONNECTION_STRING is set. The handler also
+    receives the audit batches.
+    """
+    if pipeline.handler not in logger.handlers:
+        logger.addHandler(pipeline.handler)
+    if "APPLICATIONINSIGHTS_CONNECTION_STRING" in os.environ and not pipeline.targets:
+        from opencensus.ext.azure.log_exporter import AzureLogHandler
+        exporter = AzureLogHandler()
+        pipeline.targets.append(exporter)
+        audit_logger.addHandler(exporter)
+
+
+def audit(user: Optional[str], request, started: float, status: str):
+    """Record a finished command; `started` is its time.perf_counter() start"""
+    if not AUDIT_ENABLED:
+        return
+    tool = (request.params or {}).get("name") if request.method == "tools/call" else None
+    pipeline.audit(user, request.method, tool, (time.perf_counter() - started) * 1000, status)
+
+
+atexit.register(pipeline.close)
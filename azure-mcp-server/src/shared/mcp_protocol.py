@@ -1,9 +1,41 @@
-from typing import Dict, Any, List, Optional, Union
-from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional, Tuple, Union
+from pydantic import BaseModel, ConfigDict, Field
 from enum import Enum
+import os
 import json
+import base64
+import logging
 import asyncio
+import random
+import time
+import hashlib
+import weakref
 from datetime import datetime
+from urllib.parse import unquote
+
+from .replay import ReplayStore, ReplayEvent, create_replay_store
+from .idempotency import IdempotencyCache, ResultStore, create_result_store, idempotency_key
+from .broadcast import EncodedMessage, SessionIndex, BroadcastReport, start_timer, finish
+from .concurrency import ToolLimiters, ServerBusy, SERVER_BUSY, DEFAULT_POOL
+from .deadlines import RequestContext, RequestCancelled, DEADLINE, DISCONNECT, DEFAULT_TOOL_TIMEOUT
+from .code_index import CodeIndex, SYMBOL_KINDS, extract
+from .spill import SpillStore, EncodedResult, RESULTS_URI, READ_MAX_BYTES
+from .snapshots import (SnapshotStore, create_snapshot_store, encode_snapshot, decode_snapshot,
+                        SNAPSHOTS, DRAIN_TIMEOUT, RECONNECT_SPREAD_MS)
+from .workspace import ANALYSIS_TYPES, WorkspaceAnalyzer, WorkspaceInputError, load_files, file_progress
+from .client_requests import (PendingClientRequests, ClientRequestError, SessionClosed, NO_STREAM,
+                              STREAM_READER_GRACE)
+from .telemetry import span
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Undelivered messages a session queues before dropping the oldest; a
+# client that resumes with Last-Event-ID gets dropped ones from the store
+SESSION_QUEUE_SIZE = int(os.environ.get("MCP_SESSION_QUEUE_SIZE", "1000"))
+
+QUEUE_DROPPED = registry.counter("mcp_session_queue_dropped_total",
+                                 "Messages dropped from full session queues")
 
 class MCPMessageType(str, Enum):
     REQUEST = "request"
@@ -32,12 +64,27 @@ class MCPMethod(str, Enum):
     # Sampling
     CREATE_MESSAGE = "sampling/createMessage"
 
+# Methods whose response body only changes when the server's registry does
+STATIC_RESPONSE_METHODS = frozenset({
+    MCPMethod.LIST_TOOLS,
+    MCPMethod.LIST_RESOURCES,
+    MCPMethod.LIST_PROMPTS
+})
+
+# Model validators and serializers are built on first use instead of at
+# import, keeping schema compilation off the cold-start path
+DEFERRED_BUILD = ConfigDict(defer_build=True)
+
 class MCPError(BaseModel):
+    model_config = DEFERRED_BUILD
+
     code: int
     message: str
     data: Optional[Dict[str, Any]] = None
 
 class MCPMessage(BaseModel):
+    model_config = DEFERRED_BUILD
+
     jsonrpc: str = "2.0"
     id: Optional[Union[str, int]] = None
     
@@ -60,6 +107,8 @@ class ResourceType(str, Enum):
     DATA = "data"
 
 class Resource(BaseModel):
+    model_config = DEFERRED_BUILD
+
     uri: str
     name: str
     description: Optional[str] = None
@@ -67,46 +116,224 @@ class Resource(BaseModel):
     type: ResourceType = ResourceType.TEXT
 
 class Tool(BaseModel):
+    model_config = DEFERRED_BUILD
+
     name: str
     description: str
     inputSchema: Dict[str, Any]
+    # Server-side hints, not part of the tools/list payload
+    streaming: bool = Field(default=False, exclude=True)
+    cacheable: bool = Field(default=False, exclude=True)
+    cache_ttl: float = Field(default=0, exclude=True)
+    # Runs after the command is acknowledged; the result arrives over SSE
+    deferred: bool = Field(default=False, exclude=True)
+    # Seconds before a call is cancelled (0: MCP_TOOL_TIMEOUT_SECONDS)
+    timeout: float = Field(default=0, exclude=True)
+    # Adaptive concurrency pool; tools with similar cost share one
+    pool: str = Field(default=DEFAULT_POOL, exclude=True)
+    # Asks the client's model (sampling/createMessage) while it runs
+    sampling: bool = Field(default=False, exclude=True)
 
 class Prompt(BaseModel):
+    model_config = DEFERRED_BUILD
+
     name: str
     description: str
     arguments: List[Dict[str, Any]] = []
 
 class MCPSession:
-    def __init__(self, session_id: str, user_id: str):
+    def __init__(self, session_id: str, user_id: str, replay_store: Optional[ReplayStore] = None,
+                 tenant_id: Optional[str] = None):
         self.session_id = session_id
         self.user_id = user_id
+        self.tenant_id = tenant_id
         self.created_at = datetime.utcnow()
         self.last_activity = datetime.utcnow()
         self.client_info: Optional[Dict[str, Any]] = None
         self.capabilities: Dict[str, Any] = {}
         self.active = True
         self._message_queue: asyncio.Queue = asyncio.Queue()
+        # Streams reading _message_queue now, and when the last one ended
+        self.stream_readers = 0
+        self._stream_read_at: Optional[float] = None
+        self._request_streams: Dict[Union[str, int], asyncio.Queue] = {}
+        self._replay_store = replay_store
+        self._last_event_id = 0
+        # Requests this server sent to the client, awaiting its response
+        self.client_requests = PendingClientRequests()
+        self._tasks: "set[asyncio.Task]" = set()
+        # Contexts of tool calls running for this session
+        self.in_flight: "set[RequestContext]" = set()
+        # Search index over files uploaded with index_files
+        self.code_index: Optional[CodeIndex] = None
         
     def update_activity(self):
         self.last_activity = datetime.utcnow()
         
-    async def send_message(self, message: Union[MCPResponse, MCPNotification]):
-        """Queue message for SSE delivery"""
-        await self._message_queue.put(message.model_dump())
+    def attach_reader(self):
+        """Called when a stream starts reading the session queue"""
+        self.stream_readers += 1
         
-    async def get_message(self) -> Optional[Dict[str, Any]]:
-        """Get next message from queue"""
+    def detach_reader(self):
+        self.stream_readers -= 1
+        self._stream_read_at = time.monotonic()
+        
+    def has_stream_reader(self) -> bool:
+        """Whether queued messages reach the client: a stream is open or was polled recently"""
+        if self.stream_readers:
+            return True
+        return (self._stream_read_at is not None
+                and time.monotonic() - self._stream_read_at < STREAM_READER_GRACE)
+        
+    def run_in_background(self, coro) -> asyncio.Task:
+        """Run work that outlives the HTTP invocation, cancelled on close()"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+        
+    def close(self):
+        """End the session: fail pending client requests, stop in-flight and background work"""
+        self.active = False
+        self.client_requests.close()
+        for context in list(self.in_flight):
+            context.cancel(DISCONNECT)
+        for task in list(self._tasks):
+            task.cancel()
+        # Wake a stream waiting for events so it ends now, not at its next timeout
+        self._message_queue.put_nowait(_WAKE)
+        
+    async def send_message(self, message: Union[MCPResponse, MCPNotification, MCPRequest, EncodedMessage],
+                           related_request_id: Optional[Union[str, int]] = None,
+                           replay: bool = True):
+        """Queue message for SSE delivery
+        
+        Messages related to a request that has its own response stream
+        (streamable HTTP transport) are delivered on that stream instead
+        of the session-wide one. Session-stream messages are given a
+        monotonic event id and kept for resumption unless replay is False.
+        The queue holds at most SESSION_QUEUE_SIZE; the oldest message is
+        dropped (see _drop_oldest).
+        An EncodedMessage is queued as is, shared with other sessions.
+        """
+        payload = message if isinstance(message, EncodedMessage) else message.model_dump()
+        if related_request_id is not None and related_request_id in self._request_streams:
+            await self._request_streams[related_request_id].put(payload)
+            return
+            
+        event_id = None
+        if replay and self._replay_store is not None:
+            self._last_event_id += 1
+            event_id = self._last_event_id
+            await self._replay_store.append(self.session_id, event_id, payload)
+        if self._message_queue.qsize() >= SESSION_QUEUE_SIZE:
+            # Sessions that never open a stream would otherwise grow forever
+            self._drop_oldest()
+        self._message_queue.put_nowait((event_id, payload))
+        
+    def _drop_oldest(self):
+        """Drop the oldest queued message, keeping wake-ups
+
+        A dropped server-to-client request never reaches the client, so its
+        waiter is failed now instead of at its deadline.
+        """
+        for _ in range(self._message_queue.qsize()):
+            event = self._message_queue.get_nowait()
+            if event is _WAKE:
+                # Still owed to the next reader
+                self._message_queue.put_nowait(event)
+                continue
+            payload = event[1]
+            if isinstance(payload, dict) and "method" in payload and payload.get("id") is not None:
+                self.client_requests.fail(payload["id"], ClientRequestError(
+                    NO_STREAM, "Dropped from the full session queue before the client read it"
+                ))
+            QUEUE_DROPPED.inc()
+            return
+        
+    async def events_after(self, last_event_id: int) -> List[ReplayEvent]:
+        """Buffered session-stream events newer than last_event_id"""
+        if self._replay_store is None:
+            return []
+        return await self._replay_store.events_after(self.session_id, last_event_id)
+        
+    def open_request_stream(self, request_id: Union[str, int]) -> asyncio.Queue:
+        """Route messages related to request_id to a dedicated queue"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._request_streams[request_id] = queue
+        return queue
+        
+    def close_request_stream(self, request_id: Union[str, int]):
+        """Stop routing messages to the request's queue"""
+        self._request_streams.pop(request_id, None)
+        
+    async def get_event(self) -> Optional[Tuple[Optional[int], Dict[str, Any]]]:
+        """Get next (event id, message) from queue"""
         try:
-            return await asyncio.wait_for(self._message_queue.get(), timeout=30)
+            event = await asyncio.wait_for(self._message_queue.get(), timeout=30)
         except asyncio.TimeoutError:
             return None
+        return None if event is _WAKE else event
+            
+    def snapshot_state(self) -> Dict[str, Any]:
+        """What a new instance needs to continue this session, taking queued messages"""
+        pending = [
+            [event_id, dict(message.payload) if isinstance(message, EncodedMessage) else message]
+            for event_id, message in self.drain_events(self._message_queue.qsize())
+        ]
+        return {
+            "user_id": self.user_id,
+            "tenant_id": self.tenant_id,
+            "created_at": self.created_at.isoformat(),
+            "client_info": self.client_info,
+            "capabilities": self.capabilities,
+            "last_event_id": self._last_event_id,
+            "pending": pending
+        }
+        
+    def drain_events(self, limit: int) -> List[Tuple[Optional[int], Dict[str, Any]]]:
+        """Take up to limit already-queued events without waiting"""
+        events = []
+        while len(events) < limit and not self._message_queue.empty():
+            event = self._message_queue.get_nowait()
+            if event is not _WAKE:
+                events.append(event)
+        return events
+        
+    async def get_message(self) -> Optional[Dict[str, Any]]:
+        """Get next message from queue"""
+        event = await self.get_event()
+        if not event:
+            return None
+        return dict(event[1].payload) if isinstance(event[1], EncodedMessage) else event[1]
 
 class MCPServer:
-    def __init__(self):
+    def __init__(self, replay_store: Optional[ReplayStore] = None,
+                 result_store: Optional[ResultStore] = None,
+                 spill_store: Optional[SpillStore] = None,
+                 snapshot_store: Optional[SnapshotStore] = None):
         self.resources: List[Resource] = []
         self.tools: List[Tool] = []
         self.prompts: List[Prompt] = []
         self.sessions: Dict[str, MCPSession] = {}
+        # Broadcast targets by user, tenant and client capability
+        self.index = SessionIndex()
+        self.replay_store = replay_store or create_replay_store()
+        self.idempotency = IdempotencyCache(result_store or create_result_store())
+        # Per-pool adaptive limits on concurrent tool runs
+        self.limiters = ToolLimiters()
+        # Worker pool and per-file result cache for analyze_workspace
+        self.workspace = WorkspaceAnalyzer()
+        # Disk store for tool results too large to inline
+        self.spill = spill_store or SpillStore()
+        # Session state saved by drain() and restored on first use
+        self.snapshots = snapshot_store or create_snapshot_store()
+        # Set by drain(): no new sessions or streams are accepted
+        self.draining = False
+        # List results and their JSON, built once (or by warm-up)
+        self._static_results: Dict[str, Dict[str, Any]] = {}
+        self._static_json: Dict[str, bytes] = {}
+        _live_servers.add(self)
         self._initialize_default_capabilities()
         
     def _initialize_default_capabilities(self):
@@ -127,7 +354,41 @@ def _initialize_default_capabilities(self):
                     }
                 },
                 "required": ["code", "language"]
-            }
+            },
+            cacheable=True,
+            cache_ttl=300,
+            pool="analysis"
+        ))
+        
+        # Whole-project analysis, one call for many files
+        self.tools.append(Tool(
+            name="analyze_workspace",
+            description="Analyze many files at once, given as a list or as a tar/zip archive",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "files": {
+                        "type": "array",
+                        "description": "Files to analyze",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "path": {"type": "string"},
+                                "content": {"type": "string"}
+                            },
+                            "required": ["path", "content"]
+                        }
+                    },
+                    "archive": {"type": "string", "description": "Base64-encoded tar or zip archive"},
+                    "analysis_type": {
+                        "type": "string",
+                        "enum": list(ANALYSIS_TYPES),
+                        "description": "Type of analysis to perform"
+                    }
+                }
+            },
+            streaming=True,
+            pool="workspace"
         ))
         
         # Code generation tool
@@ -142,7 +403,84 @@ def _initialize_default_capabilities(self):
                     "framework": {"type": "string", "description": "Framework to use (optional)"}
                 },
                 "required": ["description", "language"]
-            }
+            },
+            pool="generation"
+        ))
+        
+        # Search over files the session uploaded
+        self.tools.append(Tool(
+            name="index_files",
+            description="Add files (a list or a tar/zip archive) to this session's code index, or remove them",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "files": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "path": {"type": "string"},
+                                "content": {"type": "string"}
+                            },
+                            "required": ["path", "content"]
+                        }
+                    },
+                    "archive": {"type": "string", "description": "Base64-encoded tar or zip archive"},
+                    "remove": {"type": "array", "items": {"type": "string"}, "description": "Paths to drop"}
+                }
+            },
+            pool="workspace"
+        ))
+        
+        self.tools.append(Tool(
+            name="search_code",
+            description="Search indexed files by substring or identifier tokens",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Text to find"},
+                    "mode": {"type": "string", "enum": ["substring", "token"],
+                             "description": "Match anywhere (default) or by identifier tokens"},
+                    "path_prefix": {"type": "string", "description": "Only files under this path"},
+                    "limit": {"type": "integer", "description": "Maximum hits (default 50)"}
+                },
+                "required": ["query"]
+            },
+            pool="index"
+        ))
+        
+        self.tools.append(Tool(
+            name="find_symbol",
+            description="Find where classes, functions and methods are defined in indexed files",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string", "description": "Symbol name, case-insensitive"},
+                    "kind": {"type": "string", "enum": list(SYMBOL_KINDS)},
+                    "prefix": {"type": "boolean", "description": "Match names starting with name"},
+                    "limit": {"type": "integer", "description": "Maximum results (default 50)"}
+                },
+                "required": ["name"]
+            },
+            pool="index"
+        ))
+        
+        # Explanation written by the client's model (sampling/createMessage)
+        self.tools.append(Tool(
+            name="explain_code",
+            description="Explain code using the client's language model",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "code": {"type": "string", "description": "Code to explain"},
+                    "language": {"type": "string", "description": "Programming language"},
+                    "max_tokens": {"type": "integer", "description": "Length limit for the explanation"}
+                },
+                "required": ["code", "language"]
+            },
+            deferred=True,
+            pool="sampling",
+            sampling=True
         ))
         
         # Documentation resource
@@ -153,45 +491,278 @@ def _initialize_default_capabilities(self):
             type=ResourceType.TEXT
         ))
         
-    def create_session(self, session_id: str, user_id: str) -> MCPSession:
+        # Session code index; also resource://index/files/{path},
+        # resource://index/symbols/{name} and resource://index/search/{query}
+        self.resources.append(Resource(
+            uri=f"{INDEX_URI}stats",
+            name="Code index",
+            description="Files indexed in this session (see the index_files tool)",
+            mimeType="application/json",
+            type=ResourceType.DATA
+        ))
+        
+    def get_tool(self, name: Optional[str]) -> Optional[Tool]:
+        """Look up a registered tool by name"""
+        return next((t for t in self.tools if t.name == name), None)
+        
+    def wants_stream(self, request: MCPRequest) -> bool:
+        """Whether handling the request produces messages worth streaming"""
+        if request.method != MCPMethod.CALL_TOOL:
+            return False
+        tool = self.get_tool((request.params or {}).get("name"))
+        return bool(tool and tool.streaming)
+        
+    def runs_deferred(self, request: MCPRequest, session: Optional[MCPSession] = None) -> bool:
+        """Whether the request should be acknowledged now and answered over SSE
+
+        Not when the session has no stream the answer could arrive on.
+        """
+        if request.method != MCPMethod.CALL_TOOL:
+            return False
+        tool = self.get_tool((request.params or {}).get("name"))
+        return bool(tool and tool.deferred) and (session is None or session.has_stream_reader())
+        
+    def start_deferred(self, request: MCPRequest, session: MCPSession) -> asyncio.Task:
+        """Handle the request in the background and queue its response for SSE"""
+        async def run():
+            response = await self.handle_request(request, session)
+            await session.send_message(response)
+        return session.run_in_background(run())
+        
+    async def create_message(self, session: MCPSession, params: Dict[str, Any],
+                             timeout: Optional[float] = None,
+                             related_request_id: Optional[Union[str, int]] = None) -> Dict[str, Any]:
+        """Ask the client's model for a completion (sampling/createMessage)"""
+        error = self.sampling_unavailable(session)
+        if error is not None:
+            raise error
+        kwargs = {"related_request_id": related_request_id}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        return await session.client_requests.request(session, MCPMethod.CREATE_MESSAGE.value, params, **kwargs)
+        
+    def sampling_unavailable(self, session: MCPSession) -> Optional[ClientRequestError]:
+        """Why a sampling request could not reach the client, or None if it can"""
+        if "sampling" not in session.capabilities:
+            return ClientRequestError(-32601, "Client did not declare the sampling capability")
+        if not session.has_stream_reader():
+            # The request would sit in the session queue until it timed out
+            return ClientRequestError(NO_STREAM, "Sampling needs an open /mcp/stream for this session")
+        return None
+        
+    def handle_client_response(self, session: MCPSession, message: Dict[str, Any]) -> bool:
+        """Hand a client's JSON-RPC response to the request awaiting it"""
+        session.update_activity()
+        return session.client_requests.resolve(message)
+        
+    async def send_progress(self, request: MCPRequest, session: MCPSession,
+                            progress: float, total: Optional[float] = None,
+                            message: Optional[str] = None, details: Optional[Dict[str, Any]] = None):
+        """Emit a progress notification tied to an in-flight request
+
+        details adds tool-specific fields (e.g. the findings of a file) to
+        the notification's params.
+        """
+        meta = (request.params or {}).get("_meta") or {}
+        params: Dict[str, Any] = {
+            "progressToken": meta.get("progressToken", request.id),
+            "progress": progress
+        }
+        if total is not None:
+            params["total"] = total
+        if message is not None:
+            params["message"] = message
+        if details:
+            params.update(details)
+        await session.send_message(
+            MCPNotification(method="notifications/progress", params=params),
+            related_request_id=request.id
+        )
+        
+    def create_session(self, session_id: str, user_id: str, tenant_id: Optional[str] = None) -> MCPSession:
         """Create new MCP session"""
-        session = MCPSession(session_id, user_id)
+        session = MCPSession(session_id, user_id, self.replay_store, tenant_id)
         self.sessions[session_id] = session
+        self.index.add(session_id, user_id, tenant_id)
         return session
         
     def get_session(self, session_id: str) -> Optional[MCPSession]:
         """Get existing session"""
         return self.sessions.get(session_id)
         
+    async def find_session(self, session_id: str) -> Optional[MCPSession]:
+        """A live session, or one restored from a snapshot saved by a previous instance"""
+        session = self.sessions.get(session_id)
+        if session is not None or self.draining:
+            return session
+        data = await self.snapshots.take(session_id)
+        state = decode_snapshot(data, self.snapshots.ttl) if data else None
+        if state is None:
+            return None
+        # Another request may have restored it while the snapshot was read
+        session = self.sessions.get(session_id)
+        if session is not None:
+            return session
+        session = self.create_session(session_id, state["user_id"], state.get("tenant_id"))
+        session.created_at = datetime.fromisoformat(state["created_at"])
+        session.client_info = state.get("client_info")
+        session.capabilities = state.get("capabilities") or {}
+        self.index.set_capabilities(session_id, session.capabilities)
+        session._last_event_id = state.get("last_event_id", 0)
+        for event_id, message in state.get("pending", []):
+            if event_id is not None:
+                # Kept for Last-Event-ID resumption on this instance too
+                await self.replay_store.append(session_id, event_id, message)
+            session._message_queue.put_nowait((event_id, message))
+        SNAPSHOTS.inc(outcome="restored")
+        return session
+        
+    async def drain(self, timeout: float = DRAIN_TIMEOUT) -> Dict[str, int]:
+        """Prepare for shutdown and save every session for the next instance
+
+        New sessions and streams are refused from here on. Each session
+        is sent a reconnect hint with a spread-out delay. Connected
+        streams and running tool calls get up to `timeout` seconds to
+        finish. Then each session is saved, with the messages it has not
+        received yet, and closed.
+        """
+        self.draining = True
+        sessions = list(self.sessions.values())
+        for session in sessions:
+            hint = MCPNotification(method="notifications/reconnect", params={
+                "reason": "shutdown", "retryAfterMs": random.randint(0, RECONNECT_SPREAD_MS)
+            })
+            await session.send_message(hint, replay=False)
+            
+        # Only a connected stream can take queued messages; the rest are saved
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline and any(
+            s.in_flight or (s.stream_readers and s._message_queue.qsize()) for s in sessions
+        ):
+            await asyncio.sleep(0.05)
+            
+        saved = failed = 0
+        for session in sessions:
+            state = session.snapshot_state()
+            # The hint was for this instance's clients; do not replay it later
+            state["pending"] = [event for event in state["pending"]
+                                if not (event[0] is None and event[1].get("method") == "notifications/reconnect")]
+            try:
+                await self.snapshots.save(session.session_id, encode_snapshot(state))
+                saved += 1
+                SNAPSHOTS.inc(outcome="saved")
+            except Exception as e:
+                failed += 1
+                SNAPSHOTS.inc(outcome="failed")
+                logger.warning("Could not save session snapshot: %s", e)
+            session.close()
+        return {"sessions": len(sessions), "saved": saved, "failed": failed}
+        
     def remove_session(self, session_id: str):
         """Remove session"""
         if session_id in self.sessions:
-            self.sessions[session_id].active = False
+            self.sessions[session_id].close()
             del self.sessions[session_id]
+            self.index.remove(session_id)
+            self.replay_store.discard(session_id)
             
-    async def handle_request(self, request: MCPRequest, session: MCPSession) -> MCPResponse:
-        """Handle incoming MCP request"""
+    async def broadcast(self, method: str, params: Optional[Dict[str, Any]] = None, *,
+                        user_id: Optional[str] = None, tenant_id: Optional[str] = None,
+                        capability: Optional[str] = None, replay: bool = True) -> BroadcastReport:
+        """Send one notification to every session matching all given filters
+
+        The notification is serialized once; each session queues a
+        reference to the same encoded frame.
+        """
+        started = start_timer()
+        message = EncodedMessage(MCPNotification(method=method, params=params).model_dump())
+        session_ids = self.index.select(user_id, tenant_id, capability)
+        targets = (list(self.sessions.values()) if session_ids is None
+                   else [self.sessions[s] for s in session_ids if s in self.sessions])
+        for session in targets:
+            await session.send_message(message, replay=replay)
+        return finish(started, len(targets))
+        
+    async def notify_tools_changed(self) -> BroadcastReport:
+        """Drop cached list results and tell every session the tool list changed"""
+        self.invalidate_static_results()
+        return await self.broadcast("notifications/tools/list_changed")
+        
+    def static_result(self, method: str) -> Dict[str, Any]:
+        """Result of a list method, built on first use"""
+        result = self._static_results.get(method)
+        if result is None:
+            if method == MCPMethod.LIST_TOOLS:
+                result = {"tools": [tool.model_dump() for tool in self.tools]}
+            elif method == MCPMethod.LIST_RESOURCES:
+                result = {"resources": [resource.model_dump() for resource in self.resources]}
+            else:
+                raise KeyError(method)
+            self._static_results[method] = result
+        return result
+
+    def static_result_json(self, method: str) -> bytes:
+        """Pre-serialized JSON of static_result(method)"""
+        encoded = self._static_json.get(method)
+        if encoded is None:
+            encoded = json.dumps(self.static_result(method)).encode("utf-8")
+            self._static_json[method] = encoded
+        return encoded
+
+    def invalidate_static_results(self):
+        """Call after changing tools or resources"""
+        self._static_results.clear()
+        self._static_json.clear()
+
+    def encode_response(self, request: MCPRequest, response: MCPResponse) -> bytes:
+        """Serialize a response, splicing in pre-serialized list and tool results"""
+        result_json = None
+        if response.error is None:
+            static = self._static_results.get(request.method)
+            if static is not None and response.result is static:
+                result_json = self.static_result_json(request.method)
+            elif (isinstance(response.result, dict) and len(response.result) == 1
+                  and isinstance(response.result.get("toolResult"), EncodedResult)):
+                # Measured by the spill store; not serialized again
+                result_json = b'{"toolResult": ' + response.result["toolResult"].json + b"}"
+        if result_json is not None:
+            parts = [b'{"jsonrpc": ', json.dumps(response.jsonrpc).encode("utf-8")]
+            if response.id is not None:
+                parts += [b', "id": ', json.dumps(response.id).encode("utf-8")]
+            parts += [b', "result": ', result_json, b"}"]
+            return b"".join(parts)
+        return json.dumps(response.model_dump(exclude_none=True)).encode("utf-8")
+
+    async def handle_request(self, request: MCPRequest, session: MCPSession,
+                             context: Optional[RequestContext] = None) -> MCPResponse:
+        """Handle incoming MCP request
+
+        `context` carries the caller's deadline and cancellation into
+        tool calls.
+        """
         session.update_activity()
         
         try:
-            if request.method == MCPMethod.INITIALIZE:
-                return await self._handle_initialize(request, session)
-            elif request.method == MCPMethod.LIST_TOOLS:
-                return await self._handle_list_tools(request)
-            elif request.method == MCPMethod.CALL_TOOL:
-                return await self._handle_call_tool(request, session)
-            elif request.method == MCPMethod.LIST_RESOURCES:
-                return await self._handle_list_resources(request)
-            elif request.method == MCPMethod.READ_RESOURCE:
-                return await self._handle_read_resource(request, session)
-            else:
-                return MCPResponse(
-                    id=request.id,
-                    error=MCPError(
-                        code=-32601,
-                        message=f"Method not found: {request.method}"
+            with span("server.dispatch", method=request.method):
+                if request.method == MCPMethod.INITIALIZE:
+                    return await self._handle_initialize(request, session)
+                elif request.method == MCPMethod.LIST_TOOLS:
+                    return await self._handle_list_tools(request)
+                elif request.method == MCPMethod.CALL_TOOL:
+                    return await self._handle_call_tool(request, session, context)
+                elif request.method == MCPMethod.LIST_RESOURCES:
+                    return await self._handle_list_resources(request)
+                elif request.method == MCPMethod.READ_RESOURCE:
+                    return await self._handle_read_resource(request, session)
+                else:
+                    return MCPResponse(
+                        id=request.id,
+                        error=MCPError(
+                            code=-32601,
+                            message=f"Method not found: {request.method}"
+                        )
                     )
-                )
         except Exception as e:
             return MCPResponse(
                 id=request.id,
@@ -206,6 +777,7 @@ async def _handle_initialize(self, request: MCPRequest, session: MCPSession) ->
         params = request.params or {}
         session.client_info = params.get("clientInfo", {})
         session.capabilities = params.get("capabilities", {})
+        self.index.set_capabilities(session.session_id, session.capabilities)
         
         return MCPResponse(
             id=request.id,
@@ -226,21 +798,17 @@ async def _handle_initialize(self, request: MCPRequest, session: MCPSession) ->
         
     async def _handle_list_tools(self, request: MCPRequest) -> MCPResponse:
         """Handle list tools request"""
-        return MCPResponse(
-            id=request.id,
-            result={
-                "tools": [tool.model_dump() for tool in self.tools]
-            }
-        )
+        return MCPResponse(id=request.id, result=self.static_result(MCPMethod.LIST_TOOLS))
         
-    async def _handle_call_tool(self, request: MCPRequest, session: MCPSession) -> MCPResponse:
+    async def _handle_call_tool(self, request: MCPRequest, session: MCPSession,
+                                context: Optional[RequestContext] = None) -> MCPResponse:
         """Handle tool call request"""
         params = request.params or {}
         tool_name = params.get("name")
         arguments = params.get("arguments", {})
         
         # Find tool
-        tool = next((t for t in self.tools if t.name == tool_name), None)
+        tool = self.get_tool(tool_name)
         if not tool:
             return MCPResponse(
                 id=request.id,
@@ -250,33 +818,95 @@ async def _handle_call_tool(self, request: MCPRequest, session: MCPSession) -> M
                 )
             )
             
-        # Execute tool (simplified - in production, implement actual tool logic)
-        if tool_name == "analyze_code":
-            result = await self._analyze_code(arguments)
-        elif tool_name == "generate_code":
-            result = await self._generate_code(arguments)
-        else:
-            result = {"error": "Tool not implemented"}
+        if tool.sampling:
+            # Fail now rather than after the client-request timeout
+            error = self.sampling_unavailable(session)
+            if error is not None:
+                return MCPResponse(id=request.id, error=MCPError(code=error.code, message=str(error)))
+            
+        # The tool is cancelled at the deadline or when the caller goes away
+        context = (context or RequestContext()).narrow(tool.timeout or DEFAULT_TOOL_TIMEOUT)
+        session.in_flight.add(context)
+        try:
+            # Retried calls join the running execution or reuse a cached
+            # result; only actual executions take a slot in the tool's pool
+            limiter = self.limiters.for_pool(tool.pool)
+
+            async def execute():
+                # A large result is stored once; the cache and retries only
+                # carry the reference
+                return await self.spill.spill(
+                    await limiter.run(lambda: self._execute_tool(tool_name, arguments, session, request))
+                )
+
+            with span("tool.call", tool=tool_name):
+                result = await context.run(self.idempotency.run(
+                    idempotency_key(session.session_id, tool_name, arguments),
+                    execute,
+                    cacheable=tool.cacheable,
+                    ttl=tool.cache_ttl
+                ))
+        except ServerBusy as e:
+            return MCPResponse(
+                id=request.id,
+                error=MCPError(
+                    code=SERVER_BUSY,
+                    message=str(e),
+                    data={"pool": e.pool, "retryAfterMs": e.retry_after_ms}
+                )
+            )
+        except RequestCancelled as e:
+            return MCPResponse(
+                id=request.id,
+                error=MCPError(
+                    code=-32001 if e.reason == DEADLINE else -32800,
+                    message=str(e)
+                )
+            )
+        finally:
+            session.in_flight.discard(context)
             
         return MCPResponse(
             id=request.id,
             result={"toolResult": result}
         )
         
+    async def _execute_tool(self, tool_name: str, arguments: Dict[str, Any],
+                            session: Optional[MCPSession] = None,
+                            request: Optional[MCPRequest] = None) -> Dict[str, Any]:
+        """Run a tool's implementation"""
+        # Simplified - in production, implement actual tool logic
+        with span("tool.execute", tool=tool_name):
+            if tool_name == "analyze_code":
+                return await self._analyze_code(arguments)
+            elif tool_name == "analyze_workspace":
+                return await self._analyze_workspace(arguments, session, request)
+            elif tool_name == "index_files":
+                return await self._index_files(arguments, session)
+            elif tool_name == "search_code":
+                return self._search_code(arguments, session)
+            elif tool_name == "find_symbol":
+                return self._find_symbol(arguments, session)
+            elif tool_name == "generate_code":
+                return await self._generate_code(arguments)
+            elif tool_name == "explain_code":
+                return await self._explain_code(arguments, session)
+            return {"error": "Tool not implemented"}
+        
     async def _handle_list_resources(self, request: MCPRequest) -> MCPResponse:
         """Handle list resources request"""
-        return MCPResponse(
-            id=request.id,
-            result={
-                "resources": [resource.model_dump() for resource in self.resources]
-            }
-        )
+        return MCPResponse(id=request.id, result=self.static_result(MCPMethod.LIST_RESOURCES))
         
     async def _handle_read_resource(self, request: MCPRequest, session: MCPSession) -> MCPResponse:
         """Handle read resource request"""
         params = request.params or {}
         uri = params.get("uri")
         
+        if isinstance(uri, str) and uri.startswith(INDEX_URI):
+            return self._read_index_resource(request, session, uri)
+        if isinstance(uri, str) and uri.startswith(RESULTS_URI):
+            return await self._read_result_resource(request, uri)
+            
         # Find resource
         resource = next((r for r in self.resources if r.uri == uri), None)
         if not resource:
@@ -320,6 +950,141 @@ async def _analyze_code(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
             }
         }
         
+    async def _analyze_workspace(self, arguments: Dict[str, Any], session: Optional[MCPSession],
+                                 request: Optional[MCPRequest]) -> Dict[str, Any]:
+        """Analyze a batch of files, reporting each one as progress"""
+        analysis_type = arguments.get("analysis_type", "all")
+        if analysis_type not in ANALYSIS_TYPES:
+            return {"error": f"Unknown analysis_type: {analysis_type}"}
+        try:
+            # Decoding and decompressing an archive is CPU work; keep it off the loop
+            files, skipped = await asyncio.get_running_loop().run_in_executor(None, load_files, arguments)
+        except WorkspaceInputError as e:
+            return {"error": str(e)}
+            
+        on_file = None
+        if session is not None and request is not None:
+            done = 0
+            
+            async def on_file(path: str, result: Dict[str, Any]):
+                nonlocal done
+                done += 1
+                await self.send_progress(request, session, done, total=len(files),
+                                         message=f"{path}: {len(result['issues'])} issues",
+                                         details={"file": file_progress(path, result)})
+                
+        report = await self.workspace.analyze(files, analysis_type, on_file)
+        report["summary"]["skipped"] = len(skipped)
+        report["skipped"] = skipped
+        return report
+        
+    async def _index_files(self, arguments: Dict[str, Any], session: Optional[MCPSession]) -> Dict[str, Any]:
+        """Add, update or remove files in the session's code index"""
+        if session is None:
+            return {"error": "index_files needs a session"}
+        loop = asyncio.get_running_loop()
+        files, skipped = [], []
+        if arguments.get("files") or arguments.get("archive"):
+            try:
+                files, skipped = await loop.run_in_executor(None, load_files, arguments)
+            except WorkspaceInputError as e:
+                return {"error": str(e)}
+        if session.code_index is None:
+            session.code_index = CodeIndex()
+        index = session.code_index
+        
+        changed = index.changed(files)
+        # Tokenizing and parsing run off the loop; applying them is array appends
+        extracted = await loop.run_in_executor(None, extract, changed)
+        indexed = 0
+        for n, item in enumerate(extracted, 1):
+            if index.add(item):
+                indexed += 1
+            else:
+                skipped.append({"path": item.path, "reason": "index_limit"})
+            if n % 256 == 0:
+                await asyncio.sleep(0)
+        removed = sum(index.remove(path) for path in arguments.get("remove") or [])
+        index.finish_update()
+        return {"indexed": indexed, "unchanged": len(files) - len(changed), "removed": removed,
+                "skipped": skipped, "index": index.stats()}
+        
+    def _search_code(self, arguments: Dict[str, Any], session: Optional[MCPSession]) -> Dict[str, Any]:
+        """Substring or token search over the session's code index"""
+        index = session.code_index if session else None
+        query = arguments.get("query") or ""
+        if index is not None and index.evicted:
+            return {"error": "The code index was evicted to free memory; call index_files again"}
+        if index is None or not query:
+            return {"hits": [], "files": len(index) if index else 0}
+        hits = index.search(query, arguments.get("mode", "substring"), int(arguments.get("limit", 50)),
+                            arguments.get("path_prefix"))
+        return {"hits": hits, "files": len(index)}
+        
+    def _find_symbol(self, arguments: Dict[str, Any], session: Optional[MCPSession]) -> Dict[str, Any]:
+        """Symbol definitions from the session's code index"""
+        index = session.code_index if session else None
+        name = arguments.get("name") or ""
+        if index is not None and index.evicted:
+            return {"error": "The code index was evicted to free memory; call index_files again"}
+        if index is None or not name:
+            return {"symbols": []}
+        return {"symbols": index.find_symbol(name, arguments.get("kind"), bool(arguments.get("prefix")),
+                                             int(arguments.get("limit", 50)))}
+        
+    def _read_index_resource(self, request: MCPRequest, session: MCPSession, uri: str) -> MCPResponse:
+        """Serve resource://index/ URIs from the session's code index"""
+        index = session.code_index or CodeIndex()
+        section, _, rest = uri[len(INDEX_URI):].partition("/")
+        rest = unquote(rest)
+        mime_type, text = "application/json", None
+        if section == "stats":
+            text = json.dumps({**index.stats(), "files": index.files()})
+        elif section == "files" and rest:
+            document = index.file(rest)
+            if document is not None:
+                mime_type, text = "text/plain", document.text
+        elif section == "symbols" and rest:
+            text = json.dumps(index.find_symbol(rest))
+        elif section == "search" and rest:
+            text = json.dumps(index.search(rest))
+        if text is None:
+            return MCPResponse(
+                id=request.id,
+                error=MCPError(code=-32602, message=f"Resource not found: {uri}")
+            )
+        return MCPResponse(
+            id=request.id,
+            result={"contents": [{"uri": uri, "mimeType": mime_type, "text": text}]}
+        )
+        
+    async def _read_result_resource(self, request: MCPRequest, uri: str) -> MCPResponse:
+        """Serve a stored tool result, whole or from params offset/length"""
+        params = request.params or {}
+        try:
+            offset = int(params.get("offset", 0))
+            length = int(params.get("length", READ_MAX_BYTES))
+        except (TypeError, ValueError):
+            return MCPResponse(
+                id=request.id,
+                error=MCPError(code=-32602, message="offset and length must be integers")
+            )
+        found = await self.spill.read(uri[len(RESULTS_URI):], offset, length)
+        if found is None:
+            return MCPResponse(
+                id=request.id,
+                error=MCPError(code=-32602, message=f"Resource not found: {uri}")
+            )
+        data, size = found
+        content: Dict[str, Any] = {"uri": uri, "mimeType": "application/json"}
+        if offset <= 0 and len(data) == size:
+            content["text"] = data.decode("utf-8")
+        else:
+            # A range can split a UTF-8 sequence, so partial reads are raw bytes
+            content["blob"] = base64.b64encode(data).decode("ascii")
+            content["range"] = {"offset": max(0, offset), "length": len(data), "size": size}
+        return MCPResponse(id=request.id, result={"contents": [content]})
+        
     async def _generate_code(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Generate code implementation"""
         # Simplified implementation - in production, use actual generation logic
@@ -332,9 +1097,58 @@ async def _generate_code(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
             "description": "Code generated successfully"
         }
         
+    async def _explain_code(self, arguments: Dict[str, Any], session: MCPSession) -> Dict[str, Any]:
+        """Explain code with a completion from the client's model"""
+        language = arguments.get("language", "")
+        try:
+            result = await self.create_message(session, {
+                "messages": [{
+                    "role": "user",
+                    "content": {"type": "text",
+                                "text": f"Explain this {language} code:\n\n{arguments.get('code', '')}"}
+                }],
+                "maxTokens": arguments.get("max_tokens", 500)
+            })
+        except (ClientRequestError, SessionClosed, asyncio.TimeoutError) as e:
+            return {"error": f"Sampling failed: {str(e) or type(e).__name__}"}
+        content = (result or {}).get("content") or {}
+        return {
+            "language": language,
+            "explanation": content.get("text", ""),
+            "model": (result or {}).get("model")
+        }
+        
     async def _read_resource_content(self, resource: Resource) -> str:
         """Read resource content"""
         # Simplified implementation - in production, read from actual storage
         if resource.uri == "resource://docs/api":
             return "# API Documentation\n\nThis is the complete API documentation for the MCP server."
-        return "Resource content"
\ No newline at end of file
+        return "Resource content"
+
+_live_servers: "weakref.WeakSet[MCPServer]" = weakref.WeakSet()
+
+INDEX_URI = "resource://index/"
+
+# Queued by MCPSession.close() to wake a waiting stream; never delivered
+_WAKE = object()
+
+def _session_label(session_id: str) -> str:
+    # Session ids are bearer-like secrets; expose a short digest instead
+    return hashlib.blake2b(session_id.encode("utf-8"), digest_size=6).hexdigest()
+
+def _queue_depths() -> Dict[Tuple[str, ...], float]:
+    return {
+        (_session_label(session.session_id),): session._message_queue.qsize()
+        for server in list(_live_servers)
+        for session in list(server.sessions.values())
+    }
+
+registry.gauge("mcp_client_requests_pending", "Server-to-client requests awaiting a response",
+               callback=lambda: sum(len(session.client_requests) for server in list(_live_servers)
+                                    for session in list(server.sessions.values())))
+registry.gauge("mcp_sessions", "Live MCP sessions",
+               callback=lambda: sum(len(s.sessions) for s in list(_live_servers)))
+registry.gauge("mcp_session_queue_depth", "Messages waiting in a session's SSE queue",
+               labelnames=("session",), callback=_queue_depths)
+registry.gauge("mcp_session_queue_depth_total", "Messages waiting across all session queues",
+               callback=lambda: sum(_queue_depths().values()))
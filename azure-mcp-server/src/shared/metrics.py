@@ -0,0 +1,217 @@
+import os
+import bisect
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in milliseconds; the last bucket catches everything else
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+OVERFLOW_LABEL = "__overflow__"
+DEFAULT_MAX_SERIES = int(os.environ.get("MCP_METRICS_MAX_SERIES", "100"))
+
+LabelValues = Tuple[str, ...]
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram for one label combination"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def observe(self, value_ms: float):
+        self.counts[bisect.bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.sum_ms += value_ms
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum_ms, 3),
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99)
+        }
+
+
+class Metric:
+    """Named family of series, one per label combination
+
+    Once max_series combinations exist, new ones are folded into a single
+    series whose labels are all "__overflow__".
+    """
+
+    type = "untyped"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str,
+                 labelnames: Iterable[str] = (), max_series: Optional[int] = None):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series or DEFAULT_MAX_SERIES
+        self.series: Dict[LabelValues, Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        if key in self.series or len(self.series) < self.max_series:
+            return key
+        self.registry.series_overflow += 1
+        return (OVERFLOW_LABEL,) * len(self.labelnames)
+
+    def samples(self) -> Iterable[Tuple[str, LabelValues, Tuple[Tuple[str, str], ...], float]]:
+        """(suffix, label values, extra labels, value) tuples"""
+        for key, value in list(self.series.items()):
+            yield "", key, (), value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = self._key(labels)
+        self.series[key] = self.series.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, labelnames: Iterable[str] = (),
+                 max_series: Optional[int] = None,
+                 callback: Optional[Callable[[], Union[float, Dict[LabelValues, float]]]] = None):
+        super().__init__(registry, name, help, labelnames, max_series)
+        self.callback = callback
+
+    def set(self, value: float, **labels: Any):
+        self.series[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = self._key(labels)
+        self.series[key] = self.series.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.callback is None:
+            yield from super().samples()
+            return
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.warning("Gauge %s callback failed: %s", self.name, e)
+            return
+        if not isinstance(values, dict):
+            yield "", (), (), values
+            return
+        # Apply the same cardinality cap to computed series
+        overflow = (OVERFLOW_LABEL,) * len(self.labelnames)
+        kept: Dict[LabelValues, float] = {}
+        for key, value in values.items():
+            if key not in kept and len(kept) >= self.max_series:
+                key = overflow
+            kept[key] = kept.get(key, 0) + value
+        for key, value in kept.items():
+            yield "", key, (), value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, labelnames: Iterable[str] = (),
+                 max_series: Optional[int] = None, buckets: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        super().__init__(registry, name, help, labelnames, max_series)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels: Any):
+        key = self._key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = LatencyHistogram(self.buckets)
+        series.observe(value)
+
+    def samples(self):
+        for key, series in list(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                yield "_bucket", key, (("le", _format_value(bound)),), cumulative
+            yield "_bucket", key, (("le", "+Inf"),), series.count
+            yield "_sum", key, (), series.sum_ms
+            yield "_count", key, (), series.count
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """Process-wide set of metrics rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+        self.series_overflow = 0
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.type}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = (), **kwargs) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames, **kwargs)
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = (), **kwargs) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labelnames, **kwargs)
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), **kwargs) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, **kwargs)
+
+    def render(self) -> str:
+        """Text exposition format, version 0.0.4"""
+        lines: List[str] = []
+        for name in sorted(self._metrics):
+            metric = self._metrics[name]
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for suffix, key, extra, value in metric.samples():
+                pairs = list(zip(metric.labelnames, key)) + list(extra)
+                labels = ",".join(f'{label}="{_escape(v)}"' for label, v in pairs)
+                lines.append(f"{name}{suffix}{{{labels}}} {_format_value(value)}" if labels
+                             else f"{name}{suffix} {_format_value(value)}")
+        lines.append("# HELP mcp_metrics_series_overflow_total Label combinations folded into overflow series")
+        lines.append("# TYPE mcp_metrics_series_overflow_total counter")
+        lines.append(f"mcp_metrics_series_overflow_total {self.series_overflow}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,295 @@
+"""Opt-in capture of request traffic for replay benchmarks
+
+With MCP_RECORD_PATH set, the command, streamable HTTP and SSE stream
+handlers append one line per request to that file. Each line records:
+- when the request arrived, relative to the start of the capture;
+- the route and the (hashed) session and user;
+- the JSON-RPC envelope;
+- the response status, latency and size.
+
+Nothing secret is written:
+- Tokens and other headers are never recorded.
+- Every string inside params is replaced by filler of the same length, so
+  code bodies and file contents keep their size but not their content.
+- Archives become a valid zip of filler files with the same encoded length.
+  File paths keep only their separators and extension.
+- Tool names, protocol versions, client names and schema enums (language,
+  analysis_type, mode, kind) are kept. The structure of resource URIs is
+  kept too, so a replay still goes through the tools' success paths.
+
+benchmarks/replay_traffic.py plays a capture back against the handlers.
+With several worker processes, put `{pid}` in the path so that each
+process writes its own file; the replayer merges them.
+
+Lines are buffered and written by a single background thread. At most
+MCP_RECORD_BUFFER lines wait; when the buffer is full, new lines are
+dropped and counted in mcp_record_dropped_total.
+"""
+import io
+import os
+import json
+import time
+import base64
+import atexit
+import functools
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+RECORD_PATH = os.environ.get("MCP_RECORD_PATH")
+RECORD_BUFFER = int(os.environ.get("MCP_RECORD_BUFFER", "10000"))
+FORMAT_VERSION = 1
+
+# Route kinds in a capture
+COMMAND = "command"
+ENDPOINT = "mcp"
+STREAM = "stream"
+
+# Filler that still looks like code to the analysis tools
+_FILLER = "def handler(event):\n    return event\n"
+# Param strings kept verbatim: (method, path inside params)
+_KEPT = {
+    ("tools/call", ("name",)),
+    ("initialize", ("protocolVersion",)),
+    ("initialize", ("clientInfo", "name")),
+    ("initialize", ("clientInfo", "version")),
+}
+# Enum-like tool arguments, kept when they look like an identifier
+_ENUMS = {"language", "analysis_type", "mode", "kind"}
+# Largest filler file in a placeholder archive
+_ARCHIVE_MEMBER_BYTES = 64 * 1024
+
+DROPPED = registry.counter("mcp_record_dropped_total", "Captured requests dropped on a full buffer")
+
+
+def label(value: Optional[str]) -> Optional[str]:
+    """Stable short digest standing in for a session or user id"""
+    if value is None:
+        return None
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def filler(length: int) -> str:
+    repeats = length // len(_FILLER) + 1
+    return (_FILLER * repeats)[:length]
+
+
+def _zip(sizes: List[int]) -> bytes:
+    import zipfile
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for n, size in enumerate(sizes):
+            info = zipfile.ZipInfo(f"masked/file{n:05d}.py", date_time=(1980, 1, 1, 0, 0, 0))
+            archive.writestr(info, filler(size))
+    return buffer.getvalue()
+
+
+@functools.lru_cache(maxsize=16)
+def placeholder_archive(length: int, padding: int = 0) -> str:
+    """Base64 of a zip of filler files, `length` characters long
+
+    Archives smaller than the zip headers come out a little longer.
+    """
+    target = length // 4 * 3 - padding
+    count = max(1, -(-target // _ARCHIVE_MEMBER_BYTES))
+    content = max(0, target - len(_zip([0] * count)))
+    sizes = [content // count + (1 if n < content % count else 0) for n in range(count)]
+    return base64.b64encode(_zip(sizes)).decode("ascii")
+
+
+def _mask_path(path: str) -> str:
+    # Separators and a short extension survive, so files keep their type
+    stem, extension = os.path.splitext(path)
+    if len(extension) > 6 or not extension[1:].isalnum():
+        stem, extension = path, ""
+    return "".join(c if c == "/" else "x" for c in stem) + extension
+
+
+def _mask_uri(uri: str) -> str:
+    # resource://index/files/<path>: the scheme and two segments stay
+    scheme, separator, rest = uri.partition("://")
+    parts = rest.split("/", 2)
+    if not separator or len(parts) < 3:
+        return uri if separator else filler(len(uri))
+    return f"{scheme}://{parts[0]}/{parts[1]}/{_mask_path(parts[2])}"
+
+
+def _is_identifier(value: str) -> bool:
+    return len(value) <= 32 and value.replace("-", "").replace("_", "").isalnum()
+
+
+def _mask_string(value: str, method: str, path: tuple) -> str:
+    if (method, path) in _KEPT:
+        return value
+    key = path[-1] if path else None
+    if method == "tools/call" and path[:1] == ("arguments",):
+        if key in _ENUMS and len(path) == 2 and _is_identifier(value):
+            return value
+        if key == "archive" and len(path) == 2:
+            return placeholder_archive(len(value), value[-2:].count("="))
+    if key == "path":
+        return _mask_path(value)
+    if method == "resources/read" and path == ("uri",):
+        return _mask_uri(value)
+    return filler(len(value))
+
+
+def _mask(value: Any, method: str, path: tuple) -> Any:
+    if isinstance(value, str):
+        return _mask_string(value, method, path)
+    if isinstance(value, dict):
+        return {key: _mask(item, method, path + (key,)) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_mask(item, method, path + ("*",)) for item in value]
+    return value
+
+
+def sanitize(message: Any) -> Dict[str, Any]:
+    """The JSON-RPC envelope with every params string masked to its length"""
+    if hasattr(message, "model_dump"):
+        message = message.model_dump(exclude_none=True)
+    method = message.get("method") or ""
+    envelope = {"jsonrpc": message.get("jsonrpc", "2.0"), "method": method}
+    if message.get("id") is not None:
+        envelope["id"] = message["id"]
+    if message.get("params") is not None:
+        envelope["params"] = _mask(message["params"], method, ())
+    return envelope
+
+
+class TrafficRecorder:
+    """Appends captured requests to a JSON Lines file
+
+    The first line is a header with the format version and wall-clock
+    start. Every later line is one request, with `t` in milliseconds
+    since the start.
+    """
+
+    def __init__(self, path: Optional[str] = RECORD_PATH, buffer: int = RECORD_BUFFER):
+        self.path = path.replace("{pid}", str(os.getpid())) if path else path
+        self.enabled = bool(path)
+        self.buffer = buffer
+        self.recorded = 0
+        self._lines: List[str] = []
+        self._pending = 0
+        self._started: Optional[float] = None
+        self._flushed_at = 0.0
+        self._lock = threading.Lock()
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def record(self, kind: str, started: float, session_id: Optional[str], user_id: Optional[str],
+               message: Any, status: int, size: int = 0):
+        """Capture one handled request; `started` is its time.perf_counter() start"""
+        if not self.enabled:
+            return
+        if self._started is None:
+            self._started = started
+            self._lines.append(json.dumps({
+                "version": FORMAT_VERSION, "started": datetime.now(timezone.utc).isoformat()
+            }))
+        if self._pending + len(self._lines) >= self.buffer:
+            DROPPED.inc()
+            return
+        entry = {
+            "t": round((started - self._started) * 1000, 3),
+            "kind": kind,
+            "session": label(session_id),
+            "user": label(user_id),
+            "status": status,
+            "ms": round((time.perf_counter() - started) * 1000, 3),
+            "bytes": size
+        }
+        if message is not None:
+            entry["message"] = sanitize(message)
+        self._lines.append(json.dumps(entry, separators=(",", ":")))
+        self.recorded += 1
+        if len(self._lines) >= 256 or started - self._flushed_at >= 1.0:
+            self.flush()
+
+    def flush(self):
+        """Hand buffered lines to the writer thread"""
+        if not self._lines:
+            return
+        lines, self._lines = self._lines, []
+        self._flushed_at = time.perf_counter()
+        with self._lock:
+            self._pending += len(lines)
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mcp-recorder")
+        self._writer.submit(self._write, lines)
+
+    def _write(self, lines: List[str]):
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.warning("Could not write traffic capture: %s", e)
+        finally:
+            with self._lock:
+                self._pending -= len(lines)
+
+    def close(self):
+        """Write out everything captured so far"""
+        # At interpreter exit the writer may already be shut down, so the
+        # last lines are written here after it drains
+        lines, self._lines = self._lines, []
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+        if lines:
+            with self._lock:
+                self._pending += len(lines)
+            self._write(lines)
+
+
+def _read_file(path: str) -> Tuple[Optional[datetime], List[Dict[str, Any]]]:
+    # A file appended to by successive runs holds one header per run
+    started, offset, entries = None, 0.0, []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if "version" not in entry:
+                entry["t"] = entry["t"] + offset
+                entries.append(entry)
+                continue
+            if entry["version"] != FORMAT_VERSION:
+                raise ValueError(f"Unsupported capture version {entry['version']} in {path}")
+            run_started = datetime.fromisoformat(entry["started"])
+            started = started or run_started
+            offset = (run_started - started).total_seconds() * 1000
+    return started, entries
+
+
+def read_capture(*paths: str) -> List[Dict[str, Any]]:
+    """Requests from one or more capture files, oldest first
+
+    Each file's offsets are moved onto the clock of the earliest file.
+    """
+    files = [_read_file(path) for path in paths]
+    starts = [started for started, _ in files if started is not None]
+    first = min(starts) if starts else None
+    merged = []
+    for started, entries in files:
+        offset = (started - first).total_seconds() * 1000 if started and first else 0.0
+        for entry in entries:
+            entry["t"] = round(entry["t"] + offset, 3)
+            merged.append(entry)
+    merged.sort(key=lambda entry: entry["t"])
+    return merged
+
+
+recorder = TrafficRecorder()
+
+if recorder.enabled:
+    atexit.register(recorder.close)
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .broadcast import EncodedMessage
+
+logger = logging.getLogger(__name__)
+
+ReplayEvent = Tuple[int, Dict[str, Any]]
+
+
+class ReplayStore(ABC):
+    """Bounded per-session history of delivered SSE events
+
+    Keeps at most max_events per session and drops anything older than
+    max_age seconds, so a reconnecting client can be sent just the frames
+    it missed (Last-Event-ID).
+    """
+
+    def __init__(self, max_events: int = 256, max_age: float = 300.0):
+        self.max_events = max_events
+        self.max_age = max_age
+
+    @abstractmethod
+    async def append(self, session_id: str, event_id: int, data: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    async def events_after(self, session_id: str, last_event_id: int) -> List[ReplayEvent]:
+        pass
+
+    @abstractmethod
+    def discard(self, session_id: str):
+        pass
+
+    async def connect(self):
+        """Open backing connections ahead of the first request"""
+        pass
+
+
+class InMemoryReplayStore(ReplayStore):
+    """Ring buffer per session, local to this worker"""
+
+    def __init__(self, max_events: int = 256, max_age: float = 300.0):
+        super().__init__(max_events, max_age)
+        self._buffers: Dict[str, Deque[Tuple[int, float, Dict[str, Any]]]] = {}
+
+    def _prune(self, buffer: Deque, now: float):
+        cutoff = now - self.max_age
+        while buffer and buffer[0][1] < cutoff:
+            buffer.popleft()
+
+    async def append(self, session_id: str, event_id: int, data: Dict[str, Any]):
+        buffer = self._buffers.get(session_id)
+        if buffer is None:
+            buffer = self._buffers[session_id] = deque(maxlen=self.max_events)
+        now = time.monotonic()
+        buffer.append((event_id, now, data))
+        self._prune(buffer, now)
+
+    async def events_after(self, session_id: str, last_event_id: int) -> List[ReplayEvent]:
+        buffer = self._buffers.get(session_id)
+        if not buffer:
+            return []
+        self._prune(buffer, time.monotonic())
+        return [(event_id, data) for event_id, _, data in buffer if event_id > last_event_id]
+
+    def discard(self, session_id: str):
+        self._buffers.pop(session_id, None)
+
+
+class SharedReplayStore(ReplayStore):
+    """Replay history in a Redis-compatible store shared by all workers
+
+    `client` is an asyncio Redis client (e.g. `redis.asyncio.Redis`); each
+    session is one capped list that expires max_age seconds after its
+    last write.
+    """
+
+    def __init__(self, client: Any, max_events: int = 256, max_age: float = 300.0,
+                 key_prefix: str = "mcp:replay:"):
+        super().__init__(max_events, max_age)
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}"
+
+    async def append(self, session_id: str, event_id: int, data: Dict[str, Any]):
+        key = self._key(session_id)
+        if isinstance(data, EncodedMessage):
+            # Already serialized once for the whole broadcast
+            entry = f'{{"id": {event_id}, "ts": {time.time()!r}, "data": {data.json}}}'
+        else:
+            entry = json.dumps({"id": event_id, "ts": time.time(), "data": data})
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, entry)
+            pipe.ltrim(key, -self.max_events, -1)
+            pipe.expire(key, int(self.max_age) or 1)
+            await pipe.execute()
+
+    async def events_after(self, session_id: str, last_event_id: int) -> List[ReplayEvent]:
+        cutoff = time.time() - self.max_age
+        events = []
+        for raw in await self.client.lrange(self._key(session_id), 0, -1):
+            entry = json.loads(raw)
+            if entry["id"] > last_event_id and entry["ts"] >= cutoff:
+                events.append((entry["id"], entry["data"]))
+        return events
+
+    def discard(self, session_id: str):
+        # Entries expire on their own; other workers may still resume it
+        pass
+
+    async def connect(self):
+        await self.client.ping()
+
+
+def create_replay_store() -> ReplayStore:
+    """Build the replay store from environment settings
+
+    MCP_REPLAY_MAX_EVENTS / MCP_REPLAY_MAX_AGE_SECONDS bound each session's
+    buffer; MCP_REPLAY_REDIS_URL switches to the shared backend.
+    """
+    max_events = int(os.environ.get("MCP_REPLAY_MAX_EVENTS", "256"))
+    max_age = float(os.environ.get("MCP_REPLAY_MAX_AGE_SECONDS", "300"))
+    redis_url = os.environ.get("MCP_REPLAY_REDIS_URL")
+
+    if redis_url:
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            logger.warning("MCP_REPLAY_REDIS_URL is set but redis is not installed; using in-memory replay")
+        else:
+            return SharedReplayStore(redis.from_url(redis_url), max_events, max_age)
+
+    return InMemoryReplayStore(max_events, max_age)
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    """Parse a Last-Event-ID header; unknown formats are ignored"""
+    if not value:
+        return None
+    try:
+        return int(value.strip())
+    except ValueError:
+        return None
@@ -0,0 +1,103 @@
+"""Pre-built response headers and bodies shared by the HTTP functions
+
+Header maps are built once per endpoint and frozen, and the bodies of the
+standard JSON-RPC errors are encoded once at import, so the common
+responses (CORS preflight, auth failures, parse errors) are answered
+without building dicts or serializing JSON per request.
+"""
+import os
+import json
+import math
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Tuple
+
+import azure.functions as func
+
+from .concurrency import SERVER_BUSY
+
+CORS_ALLOW_ORIGIN = os.environ.get("MCP_CORS_ALLOW_ORIGIN", "*")
+# Lets browsers reuse a preflight result instead of repeating it per request
+CORS_MAX_AGE = os.environ.get("MCP_CORS_MAX_AGE_SECONDS", "7200")
+
+JSON = "application/json"
+
+PARSE_ERROR = -32700
+METHOD_NOT_FOUND = -32601
+AUTHENTICATION_ERROR = -32000
+INTERNAL_ERROR = -32603
+
+ERROR_MESSAGES = MappingProxyType({
+    PARSE_ERROR: "Parse error",
+    METHOD_NOT_FOUND: "Method not found",
+    AUTHENTICATION_ERROR: "Authentication error",
+    INTERNAL_ERROR: "Internal error",
+})
+
+
+def _encode(body: dict) -> bytes:
+    return json.dumps(body).encode("utf-8")
+
+
+# JSON-RPC error objects with a null id, encoded once
+ERROR_BODIES: Mapping[int, bytes] = MappingProxyType({
+    code: _encode({"jsonrpc": "2.0", "id": None, "error": {"code": code, "message": message}})
+    for code, message in ERROR_MESSAGES.items()
+})
+
+MISSING_AUTHORIZATION = _encode({"error": "Missing or invalid authorization header"})
+MISSING_SESSION = _encode({"error": "Missing session ID"})
+INVALID_SESSION = _encode({"error": "Invalid session"})
+UNKNOWN_REQUEST_ID = _encode({"error": "No pending request with this id"})
+INTERNAL_SERVER_ERROR = _encode({"error": "Internal server error"})
+DRAINING = _encode({"error": "Server is restarting; reconnect shortly"})
+
+NO_HEADERS: Mapping[str, str] = MappingProxyType({})
+
+
+def status_for(error: Optional[Any]) -> Tuple[int, Mapping[str, str]]:
+    """HTTP status and extra headers for a JSON-RPC response's error"""
+    if error is None:
+        return 200, NO_HEADERS
+    if error.code == SERVER_BUSY:
+        # Shed by the tool limiter: tell clients and APIM when to retry
+        retry_after_ms = (error.data or {}).get("retryAfterMs", 1000)
+        return 503, {"Retry-After": str(max(1, math.ceil(retry_after_ms / 1000)))}
+    return 400, NO_HEADERS
+
+
+class ResponseBuilder:
+    """Frozen header sets and ready-made responses for one endpoint"""
+
+    def __init__(self, methods: str, allow_headers: str = "Authorization, X-Session-Id, Content-Type, X-MCP-Timeout-Ms",
+                 expose_headers: Optional[str] = None):
+        cors = {"Access-Control-Allow-Origin": CORS_ALLOW_ORIGIN}
+        if expose_headers:
+            cors["Access-Control-Expose-Headers"] = expose_headers
+        self.cors: Mapping[str, str] = MappingProxyType(cors)
+        self.json: Mapping[str, str] = MappingProxyType({"Content-Type": JSON, **cors})
+        self.preflight_headers: Mapping[str, str] = MappingProxyType({
+            **cors,
+            "Access-Control-Allow-Headers": allow_headers,
+            "Access-Control-Allow-Methods": methods,
+            "Access-Control-Max-Age": CORS_MAX_AGE,
+        })
+        self.draining_headers: Mapping[str, str] = MappingProxyType({**self.json, "Retry-After": "1"})
+
+    def preflight(self) -> func.HttpResponse:
+        """204 answer to a CORS preflight"""
+        return func.HttpResponse(status_code=204, headers=self.preflight_headers)
+
+    def empty(self, status_code: int) -> func.HttpResponse:
+        return func.HttpResponse(status_code=status_code, headers=self.cors)
+
+    def json_bytes(self, body: bytes, status_code: int) -> func.HttpResponse:
+        """Response for an already encoded JSON body"""
+        return func.HttpResponse(body, status_code=status_code, headers=self.json)
+
+    def draining(self) -> func.HttpResponse:
+        """503 for new sessions and streams while the worker shuts down"""
+        return func.HttpResponse(DRAINING, status_code=503, headers=self.draining_headers)
+
+    def error(self, code: int, status_code: int) -> func.HttpResponse:
+        """Pre-encoded JSON-RPC error response for one of ERROR_MESSAGES"""
+        return func.HttpResponse(ERROR_BODIES[code], status_code=status_code, headers=self.json)
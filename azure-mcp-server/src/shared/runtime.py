@@ -0,0 +1,150 @@
+"""Process-wide server state shared by every function in the app
+
+The MCP server, token validator and token manager are built on first use
+instead of at import, so cold-start import does no setup work, and all
+function modules share one instance of each: a session opened through
+one route is visible on the others.
+
+When the host recycles the worker it sends SIGTERM. The shared server
+then drains: sessions are saved for the next instance and clients are
+told to reconnect (MCPServer.drain). The log pipeline and the traffic
+recorder are flushed, and the signal is passed on to whatever SIGTERM
+handler was installed before. Set MCP_DRAIN_ON_SIGTERM=false to keep the
+default exit.
+"""
+import os
+import signal
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Union
+
+from . import log_pipeline
+from .auth import AzureADAuthValidator, TokenManager
+from .mcp_protocol import MCPServer
+from .recorder import recorder
+from .tenants import TenantValidatorPool, build_validator
+
+logger = logging.getLogger(__name__)
+
+Validator = Union[AzureADAuthValidator, TenantValidatorPool]
+
+DRAIN_ON_SIGTERM = os.environ.get("MCP_DRAIN_ON_SIGTERM", "true").lower() == "true"
+
+_server: Optional[MCPServer] = None
+_auth_validator: Optional[Validator] = None
+_token_manager: Optional[TokenManager] = None
+_drain_loop: Optional[asyncio.AbstractEventLoop] = None
+# The SIGTERM disposition in place before the drain handler
+_previous_sigterm: Any = signal.SIG_DFL
+
+
+def get_server() -> MCPServer:
+    """Shared MCPServer, created on first call"""
+    global _server
+    if _server is None:
+        _server = MCPServer()
+        if DRAIN_ON_SIGTERM:
+            install_drain_handler()
+    return _server
+
+
+def get_auth_validator() -> Validator:
+    """Shared token validator (a tenant pool when MCP_TENANTS is set), created on first call"""
+    global _auth_validator
+    if _auth_validator is None:
+        _auth_validator = build_validator()
+    return _auth_validator
+
+
+def get_token_manager() -> TokenManager:
+    """Shared token manager, created on first call"""
+    global _token_manager
+    if _token_manager is None:
+        _token_manager = TokenManager()
+    return _token_manager
+
+
+def configure(server: Optional[MCPServer] = None, auth_validator: Optional[Validator] = None,
+              token_manager: Optional[TokenManager] = None):
+    """Install specific instances, e.g. from a benchmark harness"""
+    global _server, _auth_validator, _token_manager
+    if server is not None:
+        _server = server
+    if auth_validator is not None:
+        _auth_validator = auth_validator
+    if token_manager is not None:
+        _token_manager = token_manager
+
+
+@contextmanager
+def configured(server: Optional[MCPServer] = None, auth_validator: Optional[Validator] = None,
+               token_manager: Optional[TokenManager] = None) -> Iterator[None]:
+    """configure() for the duration of a block, then put the previous instances back"""
+    global _server, _auth_validator, _token_manager
+    previous = _server, _auth_validator, _token_manager
+    configure(server, auth_validator, token_manager)
+    try:
+        yield
+    finally:
+        _server, _auth_validator, _token_manager = previous
+
+
+def install_drain_handler():
+    """Drain the shared server, then exit, on SIGTERM
+
+    Installs on the running loop; a no-op outside the main thread or
+    without a loop. The handler that was installed before gets the
+    signal once the drain is done; a second SIGTERM during the drain
+    goes straight to it.
+    """
+    global _drain_loop, _previous_sigterm
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    if loop is _drain_loop:
+        return
+    previous = signal.getsignal(signal.SIGTERM)
+    try:
+        loop.add_signal_handler(signal.SIGTERM, _on_sigterm, loop)
+    except (NotImplementedError, RuntimeError, ValueError) as e:
+        logger.debug("SIGTERM drain handler not installed: %s", e)
+        return
+    _drain_loop = loop
+    # None: installed outside Python, so it cannot be restored
+    _previous_sigterm = signal.SIG_DFL if previous is None else previous
+
+
+def _on_sigterm(loop: asyncio.AbstractEventLoop):
+    loop.remove_signal_handler(signal.SIGTERM)
+    signal.signal(signal.SIGTERM, _previous_sigterm)
+    loop.create_task(_drain_and_exit())
+
+
+def _close_sinks():
+    # The default SIGTERM action skips atexit, which would otherwise flush these
+    recorder.close()
+    log_pipeline.pipeline.close()
+
+
+async def _drain_and_exit():
+    try:
+        if _server is not None:
+            report = await _server.drain()
+            logger.info("Drained before shutdown: %s", report)
+    finally:
+        if _previous_sigterm is signal.SIG_IGN:
+            # The process was set up to outlive SIGTERM; only flush
+            recorder.flush()
+            log_pipeline.pipeline.flush()
+        else:
+            _close_sinks()
+            # The previous handler, or the default action, ends the process
+            os.kill(os.getpid(), signal.SIGTERM)
+
+
+def reset():
+    """Drop the shared instances; the next call builds fresh ones"""
+    global _server, _auth_validator, _token_manager
+    _server = _auth_validator = _token_manager = None
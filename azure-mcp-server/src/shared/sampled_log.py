@@ -0,0 +1,87 @@
+"""Rate-limited logging for errors that arrive in bursts
+
+During an expired-token wave thousands of requests fail for the same
+reason within seconds. Formatting and shipping a log record for each one
+costs more than rejecting the request, so identical (event, reason)
+pairs are logged only a few times per interval, and the number of
+suppressed repeats is reported when the interval rolls over.
+"""
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from .metrics import registry
+
+LOG_INTERVAL = float(os.environ.get("MCP_LOG_SAMPLE_INTERVAL_SECONDS", "10"))
+LOG_BURST = int(os.environ.get("MCP_LOG_SAMPLE_BURST", "5"))
+# After the burst, one in this many repeats is still logged (0 disables)
+LOG_SAMPLE_EVERY = int(os.environ.get("MCP_LOG_SAMPLE_EVERY", "1000"))
+MAX_KEYS = 256
+
+SUPPRESSED = registry.counter("mcp_log_suppressed_total", "Log records dropped by sampling",
+                              labelnames=("event",))
+
+
+class _Window:
+    __slots__ = ("started", "seen", "suppressed")
+
+    def __init__(self, started: float):
+        self.started = started
+        self.seen = 0
+        self.suppressed = 0
+
+
+class SampledLogger:
+    """Logs the first `burst` repeats of each (event, reason) per interval"""
+
+    def __init__(self, logger: logging.Logger, interval: float = LOG_INTERVAL, burst: int = LOG_BURST,
+                 sample_every: int = LOG_SAMPLE_EVERY, max_keys: int = MAX_KEYS):
+        self.logger = logger
+        self.interval = interval
+        self.burst = burst
+        self.sample_every = sample_every
+        self.max_keys = max_keys
+        self._windows: "OrderedDict[Tuple[str, str], _Window]" = OrderedDict()
+
+    def log(self, level: int, event: str, reason: str = "", now: Optional[float] = None,
+            exc_info: bool = False) -> bool:
+        """Log `event: reason` unless sampled out; returns whether it was logged"""
+        if not self.logger.isEnabledFor(level):
+            return False
+        now = time.monotonic() if now is None else now
+        key = (event, reason)
+        window = self._windows.get(key)
+        suppressed = 0
+        if window is None or now - window.started >= self.interval:
+            suppressed = window.suppressed if window is not None else 0
+            window = _Window(now)
+            self._windows[key] = window
+            if len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+        self._windows.move_to_end(key)
+
+        window.seen += 1
+        over = window.seen - self.burst
+        if over > 0 and (self.sample_every <= 0 or over % self.sample_every):
+            window.suppressed += 1
+            SUPPRESSED.inc(event=event)
+            return False
+
+        message = f"{event}: {reason}" if reason else event
+        if suppressed:
+            message = f"{message} ({suppressed} similar suppressed in the previous {self.interval:g}s)"
+        elif over > 0:
+            message = f"{message} (sampled 1 in {self.sample_every})"
+        self.logger.log(level, message, exc_info=exc_info)
+        return True
+
+    def error(self, event: str, reason: str = "", exc_info: bool = False) -> bool:
+        return self.log(logging.ERROR, event, reason, exc_info=exc_info)
+
+    def warning(self, event: str, reason: str = "") -> bool:
+        return self.log(logging.WARNING, event, reason)
+
+    def info(self, event: str, reason: str = "") -> bool:
+        return self.log(logging.INFO, event, reason)
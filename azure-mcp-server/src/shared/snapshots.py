@@ -0,0 +1,159 @@
+"""Session state saved across worker recycles
+
+When the host recycles a worker, MCPServer.drain() saves each live
+session. The next instance restores a session only when its id is
+first seen again (MCPServer.find_session). The session's client then
+keeps its id, declared capabilities and undelivered messages instead of
+initializing again.
+
+A snapshot is one compact binary blob per session: a magic/version
+prefix followed by zlib-compressed JSON. Snapshots are keyed by a digest
+of the session id and read once. Backends:
+- files under MCP_SNAPSHOT_DIR, on local disk or a mounted share;
+- a Redis-compatible store (MCP_SNAPSHOT_REDIS_URL), shared by every
+  instance.
+
+Snapshots older than MCP_SNAPSHOT_TTL_SECONDS are ignored.
+"""
+import os
+import json
+import time
+import zlib
+import asyncio
+import hashlib
+import logging
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MCPS\x01"
+SNAPSHOT_TTL = float(os.environ.get("MCP_SNAPSHOT_TTL_SECONDS", "600"))
+SNAPSHOT_DIR = os.environ.get("MCP_SNAPSHOT_DIR") or os.path.join(tempfile.gettempdir(), "azure-mcp-sessions")
+# How long drain() lets streams and tool calls finish before saving
+DRAIN_TIMEOUT = float(os.environ.get("MCP_DRAIN_TIMEOUT_SECONDS", "5"))
+# Reconnect hints are spread over this window so clients do not return at once
+RECONNECT_SPREAD_MS = int(os.environ.get("MCP_RECONNECT_SPREAD_MS", "5000"))
+
+SNAPSHOTS = registry.counter("mcp_session_snapshots_total", "Session snapshots by outcome",
+                             labelnames=("outcome",))
+
+
+def snapshot_key(session_id: str) -> str:
+    # Session ids are bearer-like secrets; never use them as names
+    return hashlib.blake2b(session_id.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def encode_snapshot(state: Dict[str, Any]) -> bytes:
+    """The binary form of a session's state"""
+    state = {**state, "saved_at": time.time()}
+    return MAGIC + zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_snapshot(data: bytes, ttl: float = SNAPSHOT_TTL) -> Optional[Dict[str, Any]]:
+    """A session's state, or None when the blob is unknown, corrupt or expired"""
+    if not data.startswith(MAGIC):
+        return None
+    try:
+        state = json.loads(zlib.decompress(data[len(MAGIC):]))
+    except (zlib.error, ValueError):
+        return None
+    if time.time() - state.get("saved_at", 0) > ttl:
+        return None
+    return state
+
+
+class SnapshotStore(ABC):
+    """Saved session state, read at most once per snapshot"""
+
+    def __init__(self, ttl: float = SNAPSHOT_TTL):
+        self.ttl = ttl
+
+    @abstractmethod
+    async def save(self, session_id: str, data: bytes):
+        pass
+
+    @abstractmethod
+    async def take(self, session_id: str) -> Optional[bytes]:
+        """Remove and return a session's snapshot"""
+
+    async def connect(self):
+        """Open backing connections ahead of the first request"""
+        pass
+
+
+class FileSnapshotStore(SnapshotStore):
+    """One file per session; disk access runs in the default executor"""
+
+    def __init__(self, directory: str = SNAPSHOT_DIR, ttl: float = SNAPSHOT_TTL):
+        super().__init__(ttl)
+        self.directory = directory
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, snapshot_key(session_id))
+
+    def _save(self, session_id: str, data: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, self._path(session_id))
+
+    def _take(self, session_id: str) -> Optional[bytes]:
+        path = self._path(session_id)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.remove(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    async def save(self, session_id: str, data: bytes):
+        await asyncio.get_running_loop().run_in_executor(None, self._save, session_id, data)
+
+    async def take(self, session_id: str) -> Optional[bytes]:
+        return await asyncio.get_running_loop().run_in_executor(None, self._take, session_id)
+
+
+class SharedSnapshotStore(SnapshotStore):
+    """Snapshots in a Redis-compatible store, expiring after the TTL
+
+    `client` is an asyncio Redis client.
+    """
+
+    def __init__(self, client: Any, ttl: float = SNAPSHOT_TTL, key_prefix: str = "mcp:session-snapshot:"):
+        super().__init__(ttl)
+        self.client = client
+        self.key_prefix = key_prefix
+
+    async def save(self, session_id: str, data: bytes):
+        await self.client.set(f"{self.key_prefix}{snapshot_key(session_id)}", data,
+                              px=max(int(self.ttl * 1000), 1))
+
+    async def take(self, session_id: str) -> Optional[bytes]:
+        return await self.client.getdel(f"{self.key_prefix}{snapshot_key(session_id)}")
+
+    async def connect(self):
+        await self.client.ping()
+
+
+def create_snapshot_store() -> SnapshotStore:
+    """Build the snapshot store from environment settings
+
+    MCP_SNAPSHOT_REDIS_URL selects the shared backend; otherwise
+    snapshots are files under MCP_SNAPSHOT_DIR.
+    """
+    redis_url = os.environ.get("MCP_SNAPSHOT_REDIS_URL")
+    if redis_url:
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            logger.warning("MCP_SNAPSHOT_REDIS_URL is set but redis is not installed; using local snapshots")
+        else:
+            return SharedSnapshotStore(redis.from_url(redis_url))
+
+    return FileSnapshotStore()
@@ -0,0 +1,199 @@
+"""Large tool results kept on local disk instead of in responses
+
+A tool result whose JSON is larger than MCP_RESULT_SPILL_THRESHOLD bytes
+is written once to a content-addressed file under MCP_RESULT_SPILL_DIR.
+The response then carries only a resource://results/<hash> reference.
+Clients read the stored JSON through resources/read, whole or in byte
+ranges.
+
+The store is capped at MCP_RESULT_SPILL_MAX_BYTES. When it is full, the
+least recently written or read results are evicted. The digest is 256
+bits of the content, so a reference can only be produced by someone who
+was given it or already holds the content.
+"""
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+RESULTS_URI = "resource://results/"
+
+THRESHOLD = int(os.environ.get("MCP_RESULT_SPILL_THRESHOLD", str(256 * 1024)))
+MAX_BYTES = int(os.environ.get("MCP_RESULT_SPILL_MAX_BYTES", str(1024 * 1024 * 1024)))
+SPILL_DIR = os.environ.get("MCP_RESULT_SPILL_DIR") or os.path.join(tempfile.gettempdir(), "azure-mcp-results")
+# Largest range served by one resources/read
+READ_MAX_BYTES = int(os.environ.get("MCP_RESULT_READ_MAX_BYTES", str(1024 * 1024)))
+
+SPILLS = registry.counter("mcp_result_spills_total", "Tool results written to the result store",
+                          labelnames=("outcome",))
+EVICTIONS = registry.counter("mcp_result_store_evictions_total", "Results evicted from the result store")
+
+
+class EncodedResult(dict):
+    """An inline tool result with the JSON measured by SpillStore.spill
+
+    MCPServer.encode_response splices `json` into the response instead of
+    serializing the result a second time.
+    """
+    __slots__ = ("json",)
+
+    def __init__(self, result: Dict[str, Any], json: bytes):
+        super().__init__(result)
+        self.json = json
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=32).hexdigest()
+
+
+def _is_digest(value: str) -> bool:
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+class SpillStore:
+    """Content-addressed files with a total size cap, LRU evicted
+
+    Files are written to a temporary name and renamed into place, so a
+    reader never sees a partial result. All disk access runs in the
+    default executor.
+    """
+
+    def __init__(self, directory: str = SPILL_DIR, threshold: int = THRESHOLD, max_bytes: int = MAX_BYTES):
+        self.directory = directory
+        self.threshold = threshold
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._loaded = False
+        # Guards the index; disk reads and writes run in executor threads
+        self._lock = threading.Lock()
+        _live_stores.add(self)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _load(self):
+        # Results left by an earlier process stay readable, oldest first in line
+        if self._loaded:
+            return
+        self._loaded = True
+        found = []
+        try:
+            for shard in os.scandir(self.directory):
+                if shard.is_dir():
+                    for entry in os.scandir(shard.path):
+                        if _is_digest(entry.name):
+                            stat = entry.stat()
+                            found.append((stat.st_mtime, entry.name, stat.st_size))
+        except FileNotFoundError:
+            return
+        for _, digest, size in sorted(found):
+            self._entries[digest] = size
+            self.bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            digest, size = self._entries.popitem(last=False)
+            self.bytes -= size
+            EVICTIONS.inc()
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+
+    def _write(self, data: bytes) -> str:
+        digest = _digest(data)
+        with self._lock:
+            self._load()
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                SPILLS.inc(outcome="deduplicated")
+                return digest
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            if digest not in self._entries:
+                self._entries[digest] = len(data)
+                self.bytes += len(data)
+            self._entries.move_to_end(digest)
+            SPILLS.inc(outcome="written")
+            self._evict()
+        return digest
+
+    def _read(self, digest: str, offset: int, length: int) -> Optional[Tuple[bytes, int]]:
+        with self._lock:
+            self._load()
+            if digest not in self._entries:
+                return None
+        try:
+            with open(self._path(digest), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                f.seek(offset)
+                data = f.read(length)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+        return data, size
+
+    async def put(self, data: bytes) -> str:
+        """Store bytes, returning their digest"""
+        return await asyncio.get_running_loop().run_in_executor(None, self._write, data)
+
+    async def read(self, digest: str, offset: int = 0, length: int = READ_MAX_BYTES) -> Optional[Tuple[bytes, int]]:
+        """(bytes at offset, total size), or None when not stored"""
+        if not _is_digest(digest):
+            return None
+        length = max(0, min(length, READ_MAX_BYTES))
+        return await asyncio.get_running_loop().run_in_executor(None, self._read, digest, max(0, offset), length)
+
+    async def spill(self, result: Any) -> Any:
+        """The result itself, or a reference to it once stored if it is too large to inline
+
+        A dict result kept inline comes back as an EncodedResult, so the
+        JSON measured here is reused when the response is sent.
+        """
+        if self.threshold <= 0:
+            return result
+        data = json.dumps(result).encode("utf-8")
+        if len(data) <= self.threshold:
+            return EncodedResult(result, data) if type(result) is dict else result
+        try:
+            digest = await self.put(data)
+        except OSError as e:
+            logger.warning("Could not store large tool result, returning it inline: %s", e)
+            SPILLS.inc(outcome="failed")
+            return result
+        return {"resource": {"uri": f"{RESULTS_URI}{digest}", "mimeType": "application/json", "size": len(data)}}
+
+    def stats(self) -> Dict[str, int]:
+        return {"results": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+
+_live_stores: "weakref.WeakSet[SpillStore]" = weakref.WeakSet()
+
+registry.gauge("mcp_result_store_bytes", "Bytes held in the local result store",
+               callback=lambda: sum(store.bytes for store in list(_live_stores)))
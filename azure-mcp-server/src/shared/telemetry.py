@@ -0,0 +1,170 @@
+import os
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import LatencyHistogram, registry
+
+logger = logging.getLogger(__name__)
+
+
+class _NullSpan:
+    """Shared span used while telemetry is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Timed section of the request path"""
+
+    __slots__ = ("tracer", "name", "attributes", "start_time_ns", "end_time_ns", "_start", "duration_ms", "error")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.duration_ms = 0.0
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.start_time_ns = time.time_ns()
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter_ns() - self._start
+        self.end_time_ns = self.start_time_ns + elapsed
+        self.duration_ms = elapsed / 1e6
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self.tracer.record(self)
+        return False
+
+
+class InMemoryExporter:
+    """Keeps finished spans for inspection in tests"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+    def names(self) -> List[str]:
+        return [span.name for span in self.spans]
+
+    def clear(self):
+        self.spans.clear()
+
+
+class OpenTelemetryExporter:
+    """Re-emits finished spans through the global OpenTelemetry tracer"""
+
+    def __init__(self, instrumentation_name: str = "azure-mcp-server"):
+        from opentelemetry import trace
+        from opentelemetry.trace import Status, StatusCode
+        self._tracer = trace.get_tracer(instrumentation_name)
+        self._error_status = Status(StatusCode.ERROR)
+
+    def export(self, span: Span):
+        otel_span = self._tracer.start_span(span.name, attributes=span.attributes,
+                                            start_time=span.start_time_ns)
+        if span.error:
+            otel_span.set_status(self._error_status)
+            otel_span.set_attribute("error.type", span.error)
+        otel_span.end(end_time=span.end_time_ns)
+
+
+class Tracer:
+    """Span factory plus per-stage latency histograms
+
+    Histograms are keyed by span name and the span's tool or method
+    attribute, e.g. ("tool.call", "analyze_code"), and are exposed as
+    mcp_stage_duration_ms on the metrics endpoint.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.exporters: List[Any] = []
+        self.stage_latency = registry.histogram(
+            "mcp_stage_duration_ms", "Request path stage latency in milliseconds",
+            labelnames=("stage", "target")
+        )
+
+    @property
+    def histograms(self) -> Dict[Tuple[str, str], LatencyHistogram]:
+        return self.stage_latency.series
+
+    def span(self, name: str, **attributes: Any):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attributes)
+
+    def record(self, span: Span):
+        label = span.attributes.get("tool") or span.attributes.get("method") or ""
+        self.stage_latency.observe(span.duration_ms, stage=span.name, target=label)
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.warning("Span export failed: %s", e)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Histogram summaries grouped by span name, then label"""
+        result: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for (name, label), histogram in sorted(self.histograms.items()):
+            result.setdefault(name, {})[label] = histogram.snapshot()
+        return result
+
+    def reset(self):
+        self.histograms.clear()
+
+
+tracer = Tracer()
+
+
+def span(name: str, **attributes: Any):
+    """Time a block: `with span("auth.validate_token"): ...`
+
+    Returns a shared no-op object when telemetry is disabled.
+    """
+    if not tracer.enabled:
+        return NULL_SPAN
+    return Span(tracer, name, attributes)
+
+
+def configure_telemetry():
+    """Enable tracing from environment settings
+
+    MCP_TELEMETRY_ENABLED turns span collection on; MCP_TELEMETRY_OTEL
+    additionally exports spans through OpenTelemetry (Azure Monitor when
+    APPLICATIONINSIGHTS_CONNECTION_STRING is set).
+    """
+    tracer.enabled = os.environ.get("MCP_TELEMETRY_ENABLED", "false").lower() == "true"
+    if not tracer.enabled or os.environ.get("MCP_TELEMETRY_OTEL", "false").lower() != "true":
+        return
+    if any(isinstance(e, OpenTelemetryExporter) for e in tracer.exporters):
+        return
+    try:
+        if "APPLICATIONINSIGHTS_CONNECTION_STRING" in os.environ:
+            from azure.monitor.opentelemetry import configure_azure_monitor
+            configure_azure_monitor()
+        tracer.exporters.append(OpenTelemetryExporter())
+    except ImportError as e:
+        logger.warning("OpenTelemetry export unavailable: %s", e)
+
+
+configure_telemetry()
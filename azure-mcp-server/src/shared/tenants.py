@@ -0,0 +1,144 @@
+"""Token validation for several Azure AD tenants in one deployment
+
+MCP_TENANTS lists the tenants this deployment accepts, either as a
+comma-separated list of tenant IDs (all using AZURE_CLIENT_ID) or as JSON
+mapping each tenant ID to its own rules:
+
+    {"<tenant-id>": {"client_id": "...", "audiences": ["..."], "issuers": ["..."]}}
+
+The tenant is read from the unverified `tid` claim (or the `iss` URL)
+and the token is then fully validated by that tenant's validator, which
+keeps its own JWKS cache, parsed-key index and rejection cache. Only the
+most recently used validators are kept in memory; all of them share one
+HTTP connection pool.
+"""
+import os
+import json
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Union
+
+from .auth import DEFAULT_AUTHORITY_HOST, AzureADAuthValidator, HttpSessionPool, TokenCheck
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+TENANT_CACHE_SIZE = int(os.environ.get("MCP_TENANT_CACHE_SIZE", "32"))
+
+TENANT_LOOKUPS = registry.counter("mcp_auth_tenant_total", "Tenant resolution for incoming tokens",
+                                  labelnames=("result",))
+
+
+class TenantConfig:
+    """Audience and issuer rules for one tenant"""
+
+    __slots__ = ("tenant_id", "client_id", "audiences", "issuers")
+
+    def __init__(self, tenant_id: str, client_id: Optional[str] = None, audiences: Optional[List[str]] = None,
+                 issuers: Optional[List[str]] = None):
+        self.tenant_id = tenant_id
+        self.client_id = client_id or os.environ.get("AZURE_CLIENT_ID")
+        self.audiences = audiences or [self.client_id, f"api://{self.client_id}"]
+        self.issuers = issuers
+
+
+def load_tenants(raw: Optional[str] = None) -> Dict[str, TenantConfig]:
+    """Parse MCP_TENANTS (a tenant ID list or JSON rules)"""
+    raw = (os.environ.get("MCP_TENANTS", "") if raw is None else raw).strip()
+    if not raw:
+        return {}
+    if raw.startswith("{"):
+        return {
+            tenant_id: TenantConfig(tenant_id, rules.get("client_id"), rules.get("audiences"), rules.get("issuers"))
+            for tenant_id, rules in json.loads(raw).items()
+        }
+    return {tenant_id: TenantConfig(tenant_id) for tenant_id in (t.strip() for t in raw.split(",")) if tenant_id}
+
+
+def tenant_from_claims(claims: Dict[str, Any], known: Dict[str, Any]) -> Optional[str]:
+    """Tenant ID from the `tid` claim, else from the `iss` URL path"""
+    tenant_id = claims.get("tid")
+    if isinstance(tenant_id, str) and tenant_id in known:
+        return tenant_id
+    issuer = claims.get("iss")
+    if isinstance(issuer, str):
+        # https://sts.windows.net/<tid>/ or https://login.microsoftonline.com/<tid>/v2.0
+        for segment in issuer.split("/")[3:]:
+            if segment in known:
+                return segment
+    return None
+
+
+class TenantValidatorPool:
+    """Routes each token to the validator of the tenant that issued it"""
+
+    def __init__(self, tenants: Dict[str, TenantConfig], max_tenants: int = TENANT_CACHE_SIZE,
+                 authority_host: Optional[str] = None):
+        self.tenants = tenants
+        self.max_tenants = max_tenants
+        self.authority_host = (authority_host or os.environ.get("AZURE_AUTHORITY_HOST")
+                               or DEFAULT_AUTHORITY_HOST).rstrip("/")
+        self.http = HttpSessionPool()
+        self._validators: "OrderedDict[str, AzureADAuthValidator]" = OrderedDict()
+
+    def validator_for(self, tenant_id: str) -> AzureADAuthValidator:
+        """The tenant's validator, built on first use and kept in an LRU"""
+        validator = self._validators.get(tenant_id)
+        if validator is not None:
+            self._validators.move_to_end(tenant_id)
+            return validator
+        config = self.tenants[tenant_id]
+        # By default accept both the v1 and the v2 endpoint issuer forms
+        issuers = config.issuers or [f"https://sts.windows.net/{tenant_id}/",
+                                     f"{self.authority_host}/{tenant_id}/v2.0"]
+        validator = AzureADAuthValidator(tenant_id, config.client_id, self.authority_host,
+                                         issuer=issuers, audiences=config.audiences, http=self.http)
+        self._validators[tenant_id] = validator
+        if len(self._validators) > self.max_tenants:
+            evicted, _ = self._validators.popitem(last=False)
+            TENANT_LOOKUPS.inc(result="evicted")
+            logger.info("Evicted validator for tenant %s", evicted)
+        return validator
+
+    async def check_token(self, token: str) -> TokenCheck:
+        """Validate a token against the rules of its own tenant"""
+        from jose import jwt as jose_jwt, JWTError
+        try:
+            claims = jose_jwt.get_unverified_claims(token)
+        except JWTError as e:
+            return TokenCheck(error=f"Invalid token: {str(e)}")
+        tenant_id = tenant_from_claims(claims, self.tenants)
+        if tenant_id is None:
+            TENANT_LOOKUPS.inc(result="unknown")
+            return TokenCheck(error="Token issued by a tenant this deployment does not serve")
+        TENANT_LOOKUPS.inc(result="resolved")
+        return await self.validator_for(tenant_id).check_token(token)
+
+    async def validate_token(self, token: str) -> Dict[str, Any]:
+        """Validate token; raises ValueError when it is rejected"""
+        result = await self.check_token(token)
+        if result.error is not None:
+            raise ValueError(result.error)
+        return result.claims
+
+    async def get_jwks(self) -> Dict[str, Dict[str, Any]]:
+        """Fetch the signing keys of every configured tenant the LRU can hold"""
+        tenant_ids = list(self.tenants)[:self.max_tenants]
+        results = await asyncio.gather(*(self.validator_for(t).get_jwks() for t in tenant_ids),
+                                       return_exceptions=True)
+        failed = {t: str(r) for t, r in zip(tenant_ids, results) if isinstance(r, Exception)}
+        if failed:
+            raise RuntimeError(f"JWKS fetch failed for tenants: {failed}")
+        return dict(zip(tenant_ids, results))
+
+    async def close(self):
+        await self.http.close()
+
+
+def build_validator() -> Union[AzureADAuthValidator, TenantValidatorPool]:
+    """A tenant pool when MCP_TENANTS is set, else the single-tenant validator"""
+    tenants = load_tenants()
+    if tenants:
+        return TenantValidatorPool(tenants)
+    return AzureADAuthValidator()
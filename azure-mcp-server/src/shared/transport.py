@@ -0,0 +1,93 @@
+import asyncio
+import json
+from typing import Any, AsyncGenerator, Optional, Union
+
+from .broadcast import EncodedMessage
+from .deadlines import RequestContext, DISCONNECT
+from .mcp_protocol import MCPServer, MCPRequest, MCPSession
+
+EVENT_STREAM = "text/event-stream"
+JSON = "application/json"
+
+
+def _accepted_types(accept: Optional[str]) -> set:
+    """Parse an Accept header into the set of media types it allows"""
+    types = set()
+    for part in (accept or "").split(","):
+        fields = part.strip().split(";")
+        media_type = fields[0].strip().lower()
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in fields[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            types.add(media_type)
+    return types
+
+
+def accepts_event_stream(accept: Optional[str]) -> bool:
+    """Whether the client is willing to receive an SSE response"""
+    return EVENT_STREAM in _accepted_types(accept)
+
+
+def accepts_json(accept: Optional[str]) -> bool:
+    """Whether the client is willing to receive a plain JSON response"""
+    types = _accepted_types(accept)
+    return not types or bool(types & {JSON, "application/*", "*/*"})
+
+
+def choose_response_mode(server: MCPServer, request: MCPRequest, accept: Optional[str]) -> str:
+    """Pick "sse" or "json" for a single-endpoint POST
+
+    A request-scoped event stream is only used when the client accepts
+    one and either the tool streams or JSON is not acceptable.
+    """
+    if accepts_event_stream(accept) and (server.wants_stream(request) or not accepts_json(accept)):
+        return "sse"
+    return "json"
+
+
+def format_sse_event(event: str, data: Any, event_id: Optional[Union[str, int]] = None) -> str:
+    """Format a single SSE frame"""
+    frame = f"id: {event_id}\n" if event_id is not None else ""
+    if isinstance(data, EncodedMessage) and event == "message":
+        return frame + data.frame
+    return f"{frame}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_request(server: MCPServer, request: MCPRequest, session: MCPSession,
+                         context: Optional[RequestContext] = None) -> AsyncGenerator[str, None]:
+    """Handle one request and yield its SSE frames
+
+    Notifications the handler emits for this request are yielded as they
+    arrive, followed by the final response; the stream then ends. Closing
+    the stream early cancels the request's work.
+    """
+    context = context or RequestContext()
+    queue = session.open_request_stream(request.id)
+    task = asyncio.create_task(server.handle_request(request, session, context))
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield format_sse_event("message", getter.result())
+                continue
+            getter.cancel()
+            break
+        # Drain anything queued between the last read and completion
+        while not queue.empty():
+            yield format_sse_event("message", queue.get_nowait())
+        response = task.result()
+        yield format_sse_event("message", response.model_dump(exclude_none=True))
+    finally:
+        session.close_request_stream(request.id)
+        if not task.done():
+            context.cancel(DISCONNECT)
+            task.cancel()
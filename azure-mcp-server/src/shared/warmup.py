@@ -0,0 +1,96 @@
+"""Per-instance warm-up, run before the instance takes real traffic
+
+Each step pays a one-off cost that would otherwise land on the first
+requests after a scale-out: lazy imports, pydantic validator builds,
+list-response serialization, the JWKS fetch and backing-store
+connections. Steps run in order, one failing step does not stop the
+rest, and every step's duration is reported.
+"""
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from . import runtime
+from .mcp_protocol import (
+    MCPServer, MCPMethod, MCPError, MCPRequest, MCPResponse, MCPNotification,
+    Resource, Tool, Prompt
+)
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+WARMUP_STEP_MS = registry.gauge("mcp_warmup_step_ms", "Duration of the last warm-up run per step",
+                                labelnames=("step",))
+
+
+async def _import_modules():
+    # Deferred at cold start (see runtime.py); token validation needs them
+    import jose.jwt  # noqa: F401
+    import jwt  # noqa: F401
+    import aiohttp  # noqa: F401
+
+
+async def _build_validators():
+    # Models use defer_build; validating and dumping once builds both sides
+    for model, sample in (
+        (MCPRequest, {"jsonrpc": "2.0", "id": 0, "method": "ping", "params": {}}),
+        (MCPResponse, {"id": 0, "result": {}, "error": {"code": 0, "message": ""}}),
+        (MCPNotification, {"method": "ping"}),
+        (MCPError, {"code": 0, "message": ""}),
+        (Resource, {"uri": "x", "name": "x"}),
+        (Tool, {"name": "x", "description": "x", "inputSchema": {}}),
+        (Prompt, {"name": "x", "description": "x"}),
+    ):
+        model.model_validate(sample).model_dump(exclude_none=True)
+
+
+def _serialize_lists(server: MCPServer) -> Callable[[], Awaitable[None]]:
+    async def step():
+        for method in (MCPMethod.LIST_TOOLS, MCPMethod.LIST_RESOURCES):
+            server.static_result_json(method)
+    return step
+
+
+def _fetch_jwks(validator: runtime.Validator) -> Callable[[], Awaitable[None]]:
+    async def step():
+        await validator.get_jwks()
+    return step
+
+
+def _connect_stores(server: MCPServer) -> Callable[[], Awaitable[None]]:
+    async def step():
+        await server.replay_store.connect()
+        await server.idempotency.store.connect()
+        # Otherwise the first restored session pays for it
+        await server.snapshots.connect()
+    return step
+
+
+async def warm_up(server: Optional[MCPServer] = None,
+                  validator: Optional[runtime.Validator] = None) -> Dict[str, Any]:
+    """Run every warm-up step; returns per-step milliseconds and errors"""
+    server = server or runtime.get_server()
+    validator = validator or runtime.get_auth_validator()
+    steps: List[Tuple[str, Callable[[], Awaitable[None]]]] = [
+        ("imports", _import_modules),
+        ("validators", _build_validators),
+        ("list_responses", _serialize_lists(server)),
+        ("jwks", _fetch_jwks(validator)),
+        ("connections", _connect_stores(server)),
+    ]
+
+    report: Dict[str, Any] = {"steps": {}, "errors": {}}
+    started = time.perf_counter()
+    for name, step in steps:
+        step_start = time.perf_counter()
+        try:
+            await step()
+        except Exception as e:
+            logger.warning("Warm-up step %s failed: %s", name, e)
+            report["errors"][name] = str(e)
+        elapsed_ms = round((time.perf_counter() - step_start) * 1000, 3)
+        report["steps"][name] = elapsed_ms
+        WARMUP_STEP_MS.set(elapsed_ms, step=name)
+    report["total_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    logger.info("Warm-up finished in %s ms: %s", report["total_ms"], report["steps"])
+    return report
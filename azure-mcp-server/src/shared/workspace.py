@@ -0,0 +1,334 @@
+"""Whole-workspace analysis: many files per tools/call
+
+The analyze_workspace tool takes either a list of files or one tar/zip
+archive (base64). The work then goes as follows:
+- Files are grouped into batches, one pool job each, and analyzed in
+  worker processes (MCP_WORKSPACE_WORKERS, default one per core).
+- Per-file results are cached by content hash, so re-reviewing a project
+  only analyzes what changed.
+- Each finished file is reported to an on_file callback, which the server
+  turns into a progress notification carrying that file's findings (at
+  most MCP_WORKSPACE_PROGRESS_ISSUES of them, see file_progress()).
+- The aggregated report is returned at the end.
+
+Only a few batches are queued ahead of the workers. When the request's
+deadline passes or its caller goes away (see deadlines.current()),
+queued batches are cancelled and no new ones are submitted.
+"""
+import io
+import os
+import time
+import base64
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .analysis import ANALYZER_VERSION, analyze_batch, language_for
+from .deadlines import current
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+MAX_FILES = int(os.environ.get("MCP_WORKSPACE_MAX_FILES", "5000"))
+MAX_FILE_BYTES = int(os.environ.get("MCP_WORKSPACE_MAX_FILE_BYTES", str(1024 * 1024)))
+MAX_TOTAL_BYTES = int(os.environ.get("MCP_WORKSPACE_MAX_BYTES", str(64 * 1024 * 1024)))
+WORKERS = int(os.environ.get("MCP_WORKSPACE_WORKERS", "0")) or os.cpu_count() or 1
+# "process" uses every core; "thread" avoids process start-up where only one is available
+EXECUTOR = os.environ.get("MCP_WORKSPACE_EXECUTOR", "process")
+CACHE_SIZE = int(os.environ.get("MCP_WORKSPACE_CACHE_SIZE", "20000"))
+# Findings of one file sent with its progress notification; the rest wait for the result
+PROGRESS_ISSUES = int(os.environ.get("MCP_WORKSPACE_PROGRESS_ISSUES", "20"))
+
+BATCH_FILES = 32
+BATCH_BYTES = 256 * 1024
+# Batches queued per worker; bounds the work left over after a cancellation
+QUEUED_PER_WORKER = 2
+
+EXCLUDED_DIRS = frozenset({".git", "node_modules", "__pycache__", ".venv", "venv", ".tox"})
+ANALYSIS_TYPES = ("security", "performance", "quality", "all")
+
+FILES = registry.counter("mcp_workspace_files_total", "Files handled by analyze_workspace",
+                         labelnames=("outcome",))
+FILES_PER_SECOND = registry.histogram("mcp_workspace_files_per_second", "analyze_workspace throughput",
+                                      buckets=(10, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+
+FileItem = Tuple[str, bytes]
+OnFile = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+def file_progress(path: str, result: Dict[str, Any], limit: int = PROGRESS_ISSUES) -> Dict[str, Any]:
+    """One file's findings for its progress notification, at most limit issues"""
+    issues = result["issues"]
+    return {
+        "path": path,
+        "language": result["language"],
+        "issueCount": len(issues),
+        "issues": issues[:limit],
+        "truncated": len(issues) > limit
+    }
+
+
+class WorkspaceInputError(ValueError):
+    """The files or archive given to analyze_workspace cannot be used"""
+
+
+def _normalize(path: str) -> str:
+    parts = [part for part in path.replace("\\", "/").split("/") if part not in ("", ".")]
+    return "/".join(parts) + ("/" if path.endswith("/") else "")
+
+
+def _skip_reason(path: str, size: int) -> Optional[str]:
+    if not path or path.endswith("/"):
+        return "directory"
+    if EXCLUDED_DIRS.intersection(path.split("/")[:-1]):
+        return "excluded"
+    if size > MAX_FILE_BYTES:
+        return "too_large"
+    return None
+
+
+def _read_archive(data: bytes) -> List[Tuple[str, int, Callable[[], bytes]]]:
+    """(path, declared size, reader) for each regular file in a zip or tar"""
+    import tarfile
+    import zipfile
+
+    buffer = io.BytesIO(data)
+    if zipfile.is_zipfile(buffer):
+        archive = zipfile.ZipFile(buffer)
+        # Read at most one byte past the limit, whatever the header claims
+        return [(info.filename, info.file_size,
+                 lambda info=info: archive.open(info).read(MAX_FILE_BYTES + 1))
+                for info in archive.infolist() if not info.is_dir()]
+    buffer.seek(0)
+    try:
+        archive = tarfile.open(fileobj=buffer, mode="r:*")
+    except tarfile.TarError:
+        raise WorkspaceInputError("archive is neither zip nor tar")
+    return [(member.name, member.size,
+             lambda member=member: archive.extractfile(member).read(MAX_FILE_BYTES + 1))
+            for member in archive.getmembers() if member.isfile()]
+
+
+def load_files(arguments: Dict[str, Any]) -> Tuple[List[FileItem], List[Dict[str, str]]]:
+    """Files to analyze and the ones skipped (with a reason) from tool arguments"""
+    entries: List[Tuple[str, int, Callable[[], bytes]]] = []
+    if arguments.get("archive"):
+        try:
+            data = base64.b64decode(arguments["archive"], validate=True)
+        except ValueError:
+            raise WorkspaceInputError("archive is not valid base64")
+        entries = _read_archive(data)
+    elif isinstance(arguments.get("files"), list):
+        for entry in arguments["files"]:
+            if not isinstance(entry, dict) or not isinstance(entry.get("path"), str):
+                raise WorkspaceInputError("each file needs a path and content")
+            content = entry.get("content", "")
+            raw = content.encode("utf-8") if isinstance(content, str) else b""
+            entries.append((entry["path"], len(raw), lambda raw=raw: raw))
+    else:
+        raise WorkspaceInputError("provide files or archive")
+
+    files: List[FileItem] = []
+    skipped: List[Dict[str, str]] = []
+    total = 0
+    for path, size, read in entries:
+        path = _normalize(path)
+        reason = _skip_reason(path, size)
+        if reason is None and len(files) >= MAX_FILES:
+            reason = "file_limit"
+        if reason is None:
+            try:
+                content = read()
+            except Exception:
+                # Corrupt member (bad CRC, truncated stream, ...)
+                skipped.append({"path": path, "reason": "unreadable"})
+                continue
+            if len(content) > MAX_FILE_BYTES:
+                reason = "too_large"
+            elif b"\0" in content[:8192]:
+                reason = "binary"
+            elif total + len(content) > MAX_TOTAL_BYTES:
+                reason = "size_limit"
+            else:
+                total += len(content)
+                files.append((path, content))
+                continue
+        skipped.append({"path": path, "reason": reason})
+    return files, skipped
+
+
+class AnalysisCache:
+    """Per-file results by content hash, least recently used evicted"""
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    @staticmethod
+    def key(path: str, content: bytes, analysis_type: str) -> str:
+        # The extension picks the rules, so it is part of the key
+        digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+        return f"{ANALYZER_VERSION}:{analysis_type}:{language_for(path)}:{digest}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+        return result
+
+    def set(self, key: str, result: Dict[str, Any]):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _batches(items: List[Tuple[str, FileItem]]) -> List[List[Tuple[str, FileItem]]]:
+    batches, batch, size = [], [], 0
+    for item in items:
+        batch.append(item)
+        size += len(item[1][1])
+        if len(batch) >= BATCH_FILES or size >= BATCH_BYTES:
+            batches.append(batch)
+            batch, size = [], 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class WorkspaceAnalyzer:
+    """Fans per-file analysis out over a worker pool"""
+
+    def __init__(self, workers: int = WORKERS, executor: str = EXECUTOR, cache: Optional[AnalysisCache] = None):
+        self.workers = max(1, workers)
+        self.executor = executor
+        self.cache = cache if cache is not None else AnalysisCache()
+        self._pool: Optional[Executor] = None
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.executor == "process":
+                # spawn: forking a process that runs an event loop and
+                # worker threads is unsafe
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="workspace")
+        return self._pool
+
+    async def analyze(self, files: List[FileItem], analysis_type: str = "all",
+                      on_file: Optional[OnFile] = None) -> Dict[str, Any]:
+        """Analyze every file and aggregate the results"""
+        started = time.perf_counter()
+        results: Dict[str, Dict[str, Any]] = {}
+        # Identical contents are analyzed once
+        todo: Dict[str, List[str]] = {}
+        unique: List[Tuple[str, FileItem]] = []
+        cached = 0
+        for path, content in files:
+            key = self.cache.key(path, content, analysis_type)
+            result = self.cache.get(key)
+            if result is not None:
+                cached += 1
+                results[path] = result
+                if on_file:
+                    await on_file(path, result)
+            elif key in todo:
+                todo[key].append(path)
+            else:
+                todo[key] = [path]
+                unique.append((key, (path, content)))
+        FILES.inc(cached, outcome="cached")
+
+        async def finished(key: str, result: Dict[str, Any]):
+            self.cache.set(key, result)
+            for path in todo[key]:
+                results[path] = result
+                if on_file:
+                    await on_file(path, result)
+
+        await self._run(_batches(unique), analysis_type, finished)
+        FILES.inc(len(files) - cached, outcome="analyzed")
+
+        elapsed = time.perf_counter() - started
+        rate = len(files) / elapsed if elapsed > 0 else 0.0
+        if files:
+            FILES_PER_SECOND.observe(rate)
+        report = aggregate(results)
+        report["summary"].update(cached=cached, duration_ms=round(elapsed * 1000, 2),
+                                 files_per_second=round(rate, 1))
+        return report
+
+    async def _run(self, batches: List[List[Tuple[str, FileItem]]], analysis_type: str,
+                   finished: Callable[[str, Dict[str, Any]], Awaitable[None]]):
+        """Run batches on the pool, a bounded number queued at a time"""
+        if not batches:
+            return
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        context = current()
+        remaining = iter(batches)
+        pending: Dict[asyncio.Future, List[str]] = {}
+
+        def submit() -> bool:
+            batch = next(remaining, None)
+            if batch is None or (context is not None and context.cancelled):
+                return False
+            future = loop.run_in_executor(pool, analyze_batch, [item for _, item in batch], analysis_type)
+            pending[future] = [key for key, _ in batch]
+            return True
+
+        for _ in range(self.workers * QUEUED_PER_WORKER):
+            if not submit():
+                break
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    keys = pending.pop(future)
+                    for key, result in zip(keys, future.result()):
+                        await finished(key, result)
+                    submit()
+        finally:
+            # Cancelled or failed: drop batches that have not started
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def aggregate(results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Workspace report from per-file results"""
+    by_severity: Dict[str, int] = {}
+    by_category: Dict[str, int] = {}
+    languages: Dict[str, int] = {}
+    lines = 0
+    files = []
+    for path in sorted(results):
+        result = results[path]
+        languages[result["language"]] = languages.get(result["language"], 0) + 1
+        lines += result["metrics"]["lines"]
+        for issue in result["issues"]:
+            by_severity[issue["severity"]] = by_severity.get(issue["severity"], 0) + 1
+            by_category[issue["category"]] = by_category.get(issue["category"], 0) + 1
+        files.append({"path": path, **result})
+    return {
+        "summary": {
+            "files": len(files),
+            "lines": lines,
+            "issues": sum(by_severity.values()),
+            "by_severity": by_severity,
+            "by_category": by_category,
+            "languages": languages,
+        },
+        "files": files,
+    }
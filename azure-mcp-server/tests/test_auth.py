@@ -0,0 +1,87 @@
+import pytest
+
+from benchmarks.support import LocalSigner, use_local_keys
+from src.shared.auth import AzureADAuthValidator
+
+
+@pytest.fixture
+def signer():
+    return LocalSigner()
+
+
+@pytest.fixture
+def validator(signer):
+    validator = AzureADAuthValidator()
+    use_local_keys(validator, signer)
+    return validator
+
+
+@pytest.mark.asyncio
+async def test_valid_token_is_accepted(signer, validator):
+    payload = await validator.validate_token(signer.mint_token("user-1"))
+    assert payload["sub"] == "user-1"
+
+
+@pytest.mark.asyncio
+async def test_api_uri_audience_is_accepted(signer, validator):
+    token = signer.mint_token("user-1", aud=f"api://{signer.client_id}")
+    assert (await validator.validate_token(token))["sub"] == "user-1"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("claims", [{"aud": "someone-else"}, {"iss": "https://evil.example/"}, {"exp": 1}])
+async def test_invalid_claims_are_rejected(signer, validator, claims):
+    with pytest.raises(ValueError):
+        await validator.validate_token(signer.mint_token("user-1", **claims))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("aud", [123, {"id": "x"}, [7, None], None])
+async def test_malformed_audience_is_rejected_not_raised(signer, validator, aud):
+    result = await validator.check_token(signer.mint_token("user-1", aud=aud))
+
+    assert not result.ok
+    assert "audience" in result.error
+
+
+@pytest.mark.asyncio
+async def test_token_from_unknown_key_is_rejected(validator):
+    with pytest.raises(ValueError):
+        await validator.validate_token(LocalSigner().mint_token("user-1"))
+
+
+@pytest.mark.asyncio
+async def test_rejected_token_is_answered_from_cache(signer, validator, monkeypatch):
+    token = signer.mint_token("user-1", aud="someone-else")
+    first = await validator.check_token(token)
+
+    async def get_jwks():
+        raise AssertionError("cached rejection reached the JWKS lookup")
+
+    monkeypatch.setattr(validator, "get_jwks", get_jwks)
+    second = await validator.check_token(token)
+
+    assert not first.ok
+    assert second.error == first.error
+
+
+@pytest.mark.asyncio
+async def test_unknown_kid_refetch_is_throttled(signer, validator, monkeypatch):
+    fetches = []
+    jwks = signer.jwks()
+
+    async def get_jwks():
+        fetches.append(validator._jwks_cache_time)
+        return jwks
+
+    monkeypatch.setattr(validator, "get_jwks", get_jwks)
+    stranger = LocalSigner()
+
+    await validator.check_token(stranger.mint_token("user-1"))
+    refetched = len(fetches)
+    for i in range(5):
+        await validator.check_token(stranger.mint_token(f"other-{i}"))
+
+    assert refetched == 2
+    # Later tokens with the same kid each cost one cached lookup, no refetch
+    assert len(fetches) == refetched + 5
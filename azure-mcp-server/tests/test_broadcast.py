@@ -0,0 +1,62 @@
+import json
+import pytest
+
+from src.shared.mcp_protocol import MCPServer, MCPRequest
+from src.shared.transport import format_sse_event
+
+
+def queued(session):
+    return [message for _, message in session.drain_events(100)]
+
+
+@pytest.fixture
+def server():
+    server = MCPServer()
+    for n in range(6):
+        server.create_session(f"s{n}", f"user-{n % 3}", tenant_id=f"tenant-{n % 2}")
+    return server
+
+
+@pytest.mark.asyncio
+async def test_broadcast_is_encoded_once_and_shared(server):
+    report = await server.broadcast("notifications/message", {"text": "maintenance"})
+
+    messages = [queued(session)[0] for session in server.sessions.values()]
+    assert report.sessions == 6
+    assert all(message is messages[0] for message in messages)
+    frame = format_sse_event("message", messages[0], 4)
+    assert frame.startswith("id: 4\nevent: message\ndata: ")
+    assert json.loads(frame.split("data: ", 1)[1])["params"] == {"text": "maintenance"}
+
+
+@pytest.mark.asyncio
+async def test_filters_use_the_session_index(server):
+    await server.handle_request(MCPRequest(id=1, method="initialize", params={"capabilities": {"sampling": {}}}),
+                                server.sessions["s2"])
+
+    by_tenant = await server.broadcast("n", tenant_id="tenant-0")
+    by_both = await server.broadcast("n", tenant_id="tenant-0", user_id="user-2")
+    by_capability = await server.broadcast("n", capability="sampling")
+
+    assert (by_tenant.sessions, by_both.sessions, by_capability.sessions) == (3, 1, 1)
+    assert len(queued(server.sessions["s2"])) == 3
+
+
+@pytest.mark.asyncio
+async def test_removed_sessions_leave_the_index(server):
+    server.remove_session("s0")
+
+    report = await server.broadcast("n", user_id="user-0")
+
+    assert report.sessions == 1
+    assert "s0" not in server.index.by_tenant["tenant-0"]
+
+
+@pytest.mark.asyncio
+async def test_tool_list_change_is_broadcast(server):
+    tools = server.static_result("tools/list")
+
+    await server.notify_tools_changed()
+
+    assert server.static_result("tools/list") is not tools
+    assert queued(server.sessions["s1"])[0].payload["method"] == "notifications/tools/list_changed"
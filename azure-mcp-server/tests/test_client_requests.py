@@ -0,0 +1,152 @@
+import json
+import asyncio
+import pytest
+
+from benchmarks.support import http_request
+from src.functions import mcp_command, mcp_endpoint, sse_stream
+from src.shared import runtime
+from src.shared.auth import TokenCheck
+from src.shared.client_requests import ClientRequestError, PendingClientRequests, SessionClosed, NO_STREAM
+from src.shared.mcp_protocol import MCPServer
+
+
+@pytest.fixture
+def server(monkeypatch):
+    async def check_token(token):
+        return TokenCheck(claims={"sub": "user-1", "scp": "mcp.read"})
+
+    server = MCPServer()
+    monkeypatch.setattr(runtime.get_auth_validator(), "check_token", check_token)
+    monkeypatch.setattr(runtime, "get_server", lambda: server)
+    return server
+
+
+@pytest.fixture
+def session(server):
+    session = server.create_session("s1", "user-1")
+    session.capabilities = {"sampling": {}}
+    # The client reads the session stream; tests take messages off the queue
+    session.attach_reader()
+    return session
+
+
+def post(body, handler=mcp_command.main, route="mcp/command"):
+    return handler(http_request("POST", route, body,
+                                headers={"Authorization": "Bearer t", "X-Session-Id": "s1"}))
+
+
+EXPLAIN = {"jsonrpc": "2.0", "id": 7, "method": "tools/call",
+           "params": {"name": "explain_code", "arguments": {"code": "x = 1", "language": "python"}}}
+
+
+async def next_message(session):
+    _, message = await asyncio.wait_for(session._message_queue.get(), timeout=1)
+    return message
+
+
+@pytest.mark.asyncio
+async def test_tool_awaits_client_completion_over_sse(session):
+    ack = await post({"jsonrpc": "2.0", "id": 7, "method": "tools/call",
+                      "params": {"name": "explain_code", "arguments": {"code": "x = 1", "language": "python"}}})
+    assert ack.status_code == 202
+
+    sampling = await next_message(session)
+    assert sampling["method"] == "sampling/createMessage"
+
+    answer = await post({"jsonrpc": "2.0", "id": sampling["id"],
+                         "result": {"role": "assistant", "model": "m", "content": {"type": "text", "text": "Sets x"}}})
+    assert answer.status_code == 202
+
+    result = await next_message(session)
+    assert result["id"] == 7
+    assert result["result"]["toolResult"]["explanation"] == "Sets x"
+    assert len(session.client_requests) == 0
+
+
+@pytest.mark.asyncio
+async def test_response_for_unknown_id_is_rejected(session):
+    resp = await post({"jsonrpc": "2.0", "id": "srv-404", "result": {}})
+
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", ["boom", [1, 2]])
+async def test_malformed_client_error_fails_the_waiter(server, session, error):
+    waiter = asyncio.create_task(server.create_message(session, {"messages": []}))
+    sampling = await next_message(session)
+
+    resp = await post({"jsonrpc": "2.0", "id": sampling["id"], "error": error})
+
+    assert resp.status_code == 202
+    with pytest.raises(ClientRequestError) as raised:
+        await waiter
+    assert raised.value.code == -32603
+
+
+@pytest.mark.asyncio
+async def test_request_times_out_and_is_removed(session):
+    with pytest.raises(asyncio.TimeoutError):
+        await session.client_requests.request(session, "sampling/createMessage", {}, timeout=0.05)
+
+    assert len(session.client_requests) == 0
+
+
+@pytest.mark.asyncio
+async def test_in_flight_requests_are_bounded(session):
+    session.client_requests = PendingClientRequests(max_in_flight=1)
+    first = asyncio.create_task(session.client_requests.request(session, "ping", timeout=1))
+    await asyncio.sleep(0)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await session.client_requests.request(session, "ping", timeout=0.05)
+    first.cancel()
+
+
+@pytest.mark.asyncio
+async def test_ending_the_session_fails_waiters(server, session):
+    waiter = asyncio.create_task(server.create_message(session, {"messages": []}))
+    await next_message(session)
+
+    server.remove_session("s1")
+
+    with pytest.raises(SessionClosed):
+        await waiter
+
+
+@pytest.mark.asyncio
+async def test_sampling_without_a_stream_fails_fast(server):
+    session = server.create_session("s1", "user-1")
+    session.capabilities = {"sampling": {}}
+
+    for handler, route in ((mcp_endpoint.main, "mcp"), (mcp_command.main, "mcp/command")):
+        resp = await asyncio.wait_for(post(EXPLAIN, handler, route), timeout=1)
+        assert resp.status_code == 400
+        assert json.loads(resp.get_body())["error"]["code"] == NO_STREAM
+    assert session._message_queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_explain_code_over_streamable_http(server, monkeypatch):
+    monkeypatch.setattr(sse_stream, "SSE_POLL_WAIT", 0.5)
+    session = server.create_session("s1", "user-1")
+    session.capabilities = {"sampling": {}}
+    stream = await sse_stream.main(http_request("GET", "mcp/stream",
+                                                headers={"Authorization": "Bearer t", "X-Session-Id": "s1"}))
+    assert stream.status_code == 200
+
+    call = asyncio.create_task(post(EXPLAIN, mcp_endpoint.main, "mcp"))
+    # The client's next poll carries the sampling request
+    poll = await sse_stream.main(http_request("GET", "mcp/stream",
+                                              headers={"Authorization": "Bearer t", "X-Session-Id": "s1"}))
+    data = [line[6:] for line in poll.get_body().decode().split("\n") if line.startswith("data: ")]
+    sampling = next(m for m in map(json.loads, data) if m.get("method") == "sampling/createMessage")
+
+    answer = await post({"jsonrpc": "2.0", "id": sampling["id"],
+                         "result": {"role": "assistant", "model": "m", "content": {"type": "text", "text": "Sets x"}}},
+                        mcp_endpoint.main, "mcp")
+    assert answer.status_code == 202
+
+    resp = await asyncio.wait_for(call, timeout=1)
+    assert resp.status_code == 200
+    assert json.loads(resp.get_body())["result"]["toolResult"]["explanation"] == "Sets x"
@@ -0,0 +1,169 @@
+import json
+import pytest
+
+from src.shared.code_index import CodeIndex, IndexBudget, extract
+from src.shared.mcp_protocol import MCPServer, MCPRequest
+
+CACHE_PY = '''class TokenCache:
+    """Caches parsed tokens"""
+
+    def get_token(self, key):
+        return parseToken(self.store[key])
+
+
+def build_cache():
+    return TokenCache()
+'''
+PARSER_TS = '''export function parseToken(raw: string): Token {
+  return JSON.parse(raw)
+}
+
+export interface Token {
+  sub: string
+}
+'''
+
+
+@pytest.fixture
+def server():
+    return MCPServer()
+
+
+@pytest.fixture
+def session(server):
+    return server.create_session("s1", "user-1")
+
+
+async def call(server, session, tool, **arguments):
+    response = await server.handle_request(
+        MCPRequest(id=1, method="tools/call", params={"name": tool, "arguments": arguments}), session
+    )
+    assert response.error is None, response.error
+    return response.result["toolResult"]
+
+
+async def read(server, session, uri):
+    response = await server.handle_request(MCPRequest(id=2, method="resources/read", params={"uri": uri}), session)
+    return response
+
+
+async def upload(server, session, **files):
+    return await call(server, session, "index_files",
+                      files=[{"path": path, "content": content} for path, content in files.items()])
+
+
+@pytest.mark.asyncio
+async def test_search_and_symbols(server, session):
+    result = await upload(server, session, **{"auth/cache.py": CACHE_PY, "web/parser.ts": PARSER_TS})
+    assert result["indexed"] == 2
+
+    hits = (await call(server, session, "search_code", query="parsetoken"))["hits"]
+    assert {(h["path"], h["line"]) for h in hits} == {("auth/cache.py", 5), ("web/parser.ts", 1)}
+
+    # camelCase parts are tokens of their own
+    hits = (await call(server, session, "search_code", query="token parse", mode="token"))["hits"]
+    assert {h["path"] for h in hits} == {"auth/cache.py", "web/parser.ts"}
+
+    hits = (await call(server, session, "search_code", query="parse", path_prefix="web/"))["hits"]
+    assert {h["path"] for h in hits} == {"web/parser.ts"}
+
+    symbols = (await call(server, session, "find_symbol", name="get_token"))["symbols"]
+    assert symbols == [{"name": "get_token", "kind": "method", "container": "TokenCache",
+                        "path": "auth/cache.py", "line": 4, "text": "def get_token(self, key):"}]
+    kinds = {s["kind"] for s in (await call(server, session, "find_symbol", name="token", prefix=True))["symbols"]}
+    assert kinds == {"class", "interface"}
+    only = (await call(server, session, "find_symbol", name="token", prefix=True, kind="interface"))["symbols"]
+    assert [s["path"] for s in only] == ["web/parser.ts"]
+
+
+@pytest.mark.asyncio
+async def test_incremental_updates(server, session):
+    await upload(server, session, **{"a.py": CACHE_PY, "b.ts": PARSER_TS})
+
+    result = await upload(server, session, **{"a.py": "def renamed():\n    pass\n", "b.ts": PARSER_TS})
+    assert (result["indexed"], result["unchanged"]) == (1, 1)
+    assert (await call(server, session, "find_symbol", name="TokenCache"))["symbols"] == []
+    assert len((await call(server, session, "find_symbol", name="renamed"))["symbols"]) == 1
+    assert (await call(server, session, "search_code", query="build_cache"))["hits"] == []
+
+    result = await call(server, session, "index_files", remove=["b.ts"])
+    assert result["removed"] == 1
+    assert (await call(server, session, "search_code", query="JSON.parse"))["hits"] == []
+    # Dead documents were compacted away
+    assert result["index"]["dead_documents"] == 0
+    assert result["index"]["files"] == 1
+
+
+def test_compaction_keeps_results():
+    index = CodeIndex()
+    for round_ in range(5):
+        for item in extract((f"f{n}.py", f"def fn_{n}_{round_}():\n    return {n}\n".encode()) for n in range(20)):
+            index.add(item)
+        index.finish_update()
+    assert index.stats()["dead_documents"] < 20
+    assert len(index.find_symbol("fn_3_4")) == 1
+    assert index.find_symbol("fn_3_0") == []
+    assert [h["path"] for h in index.search("return 7")] == ["f7.py"]
+
+
+@pytest.mark.asyncio
+async def test_index_resources(server, session):
+    await upload(server, session, **{"pkg/cache.py": CACHE_PY})
+
+    stats = json.loads((await read(server, session, "resource://index/stats")).result["contents"][0]["text"])
+    assert stats["files"] == [{"path": "pkg/cache.py", "language": "python", "lines": 9, "symbols": 3}]
+
+    content = (await read(server, session, "resource://index/files/pkg%2Fcache.py")).result["contents"][0]
+    assert content["text"] == CACHE_PY
+    symbols = json.loads((await read(server, session, "resource://index/symbols/build_cache"))
+                         .result["contents"][0]["text"])
+    assert symbols[0]["line"] == 8
+    assert (await read(server, session, "resource://index/files/missing.py")).error.code == -32602
+
+
+@pytest.mark.asyncio
+async def test_index_limits(server, session):
+    session.code_index = CodeIndex(max_files=1)
+    result = await upload(server, session, **{"a.py": "x = 1\n", "b.py": "y = 2\n"})
+    assert result["indexed"] == 1
+    assert result["skipped"] == [{"path": "b.py", "reason": "index_limit"}]
+
+
+@pytest.mark.asyncio
+async def test_process_budget_evicts_least_recently_used_index(server):
+    budget = IndexBudget(max_bytes=30)
+    first, second, third = (server.create_session(f"s{n}", "user-1") for n in range(3))
+    for session in (first, second, third):
+        session.code_index = CodeIndex(budget=budget)
+    await upload(server, first, **{"a.py": "alpha = 1\n"})
+    await upload(server, second, **{"b.py": "beta = 2\n"})
+    await call(server, first, "search_code", query="alpha")
+
+    await upload(server, third, **{"c.py": "gamma_value = 3\n"})
+
+    assert second.code_index.evicted and len(second.code_index) == 0
+    assert "error" in await call(server, second, "search_code", query="beta")
+    assert (await call(server, first, "search_code", query="alpha"))["hits"]
+    assert budget.used == len(first.code_index.file("a.py").text) + len(third.code_index.file("c.py").text)
+
+
+def test_budget_releases_collected_indexes():
+    budget = IndexBudget(max_bytes=100)
+    index = CodeIndex(budget=budget)
+    index.add(extract([("a.py", b"x = 1\n")])[0])
+    assert budget.used == 6
+
+    del index
+
+    assert budget.used == 0 and len(budget) == 0
+
+
+def test_search_offsets_survive_case_mapping_that_changes_length():
+    index = CodeIndex(budget=IndexBudget())
+    index.add(extract([("t.py", "İstanbul = 'city'\nname = İstanbul\n".encode())])[0])
+
+    hits = index.search("city")
+    assert hits[0]["match"] == "city" and hits[0]["column"] == 13
+    hits = index.search("bul")
+    assert [hit["match"] for hit in hits] == ["bul", "bul"]
+    assert [(hit["line"], hit["column"]) for hit in hits] == [(1, 6), (2, 13)]
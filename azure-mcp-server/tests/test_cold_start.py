@@ -0,0 +1,17 @@
+from benchmarks import import_time
+from src.shared import runtime
+
+
+def test_heavy_modules_load_lazily():
+    # The import-time budget depends on the host; benchmarks.import_time enforces it
+    assert import_time.run(runs=1)["lazy_modules_loaded"] == []
+
+
+def test_function_modules_share_one_server(monkeypatch):
+    monkeypatch.setattr(runtime, "_server", None)
+
+    server = runtime.get_server()
+
+    assert runtime.get_server() is server
+    runtime.reset()
+    assert runtime.get_server() is not server
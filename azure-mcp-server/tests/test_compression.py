@@ -0,0 +1,51 @@
+import gzip
+import pytest
+
+from src.shared import compression
+from src.shared.compression import (
+    CompressionCache, encode_body, negotiate_encoding
+)
+
+
+def test_negotiate_encoding_respects_quality():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip;q=0, deflate") is None
+    assert negotiate_encoding("deflate, gzip") == "gzip"
+    assert negotiate_encoding("*") in compression.supported_encodings()
+
+
+def test_small_bodies_are_not_compressed():
+    body = b'{"jsonrpc": "2.0", "id": 1, "result": {}}'
+    assert encode_body(body, "gzip") == (body, {"Vary": "Accept-Encoding"})
+
+
+def test_large_bodies_are_compressed(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    body = b'{"text": "' + b"analysis " * 1000 + b'"}'
+
+    encoded, headers = encode_body(body, "gzip, br")
+
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(encoded) == body
+    assert len(encoded) < len(body) // 10
+
+
+def test_static_bodies_are_compressed_once(monkeypatch):
+    calls = []
+    real_compress = compression.compress
+    monkeypatch.setattr(compression, "compress", lambda data, enc: calls.append(enc) or real_compress(data, enc))
+    cache = CompressionCache(max_entries=1)
+    body = b"tools" * 500
+
+    first = cache.get_or_compress(body, "gzip")
+    second = cache.get_or_compress(body, "gzip")
+
+    assert first == second
+    assert calls == ["gzip"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.get_or_compress(b"other" * 500, "gzip")
+    cache.get_or_compress(body, "gzip")
+    assert cache.misses == 3
+
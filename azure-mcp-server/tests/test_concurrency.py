@@ -0,0 +1,155 @@
+import json
+import asyncio
+import pytest
+
+from benchmarks.support import http_request
+from src.functions import mcp_command
+from src.shared import runtime
+from src.shared.auth import TokenCheck
+from src.shared.concurrency import AdaptiveLimiter, ServerBusy, ToolLimiters, SERVER_BUSY, load_pool_settings
+from src.shared.mcp_protocol import MCPServer, MCPRequest, Tool
+
+
+class GatedServer(MCPServer):
+    """Tool runs block until the test opens the gate"""
+
+    def _initialize_default_capabilities(self):
+        super()._initialize_default_capabilities()
+        self.tools.append(Tool(name="gated", description="Waits", inputSchema={"type": "object"}, pool="slow"))
+        self.gate = asyncio.Event()
+
+    async def _execute_tool(self, tool_name, arguments, session=None, request=None):
+        if tool_name != "gated":
+            return await super()._execute_tool(tool_name, arguments, session)
+        await self.gate.wait()
+        return {"ok": True}
+
+
+def call(n, name="gated"):
+    return MCPRequest(id=n, method="tools/call", params={"name": name, "arguments": {"n": n}})
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_queue_full_sheds_with_server_busy():
+    server = GatedServer()
+    server.limiters = ToolLimiters({"slow": {"initial": 1, "queue_size": 1}})
+    session = server.create_session("s1", "user-1")
+
+    running = [asyncio.create_task(server.handle_request(call(n), session)) for n in (1, 2)]
+    await settle()
+    shed = await server.handle_request(call(3), session)
+
+    assert shed.error.code == SERVER_BUSY
+    assert shed.error.data["pool"] == "slow"
+    assert server.limiters.snapshot()["slow"]["queued"] == 1
+
+    server.gate.set()
+    assert all(r.error is None for r in await asyncio.gather(*running))
+    assert server.limiters.snapshot()["slow"]["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_metadata_and_other_pools_do_not_wait_behind_slow_tools():
+    server = GatedServer()
+    server.limiters = ToolLimiters({"slow": {"initial": 1, "queue_size": 4}})
+    session = server.create_session("s1", "user-1")
+
+    blocked = [asyncio.create_task(server.handle_request(call(n), session)) for n in range(3)]
+    await settle()
+
+    listed = await asyncio.wait_for(server.handle_request(MCPRequest(id=10, method="tools/list"), session), 1)
+    generated = await asyncio.wait_for(server.handle_request(MCPRequest(
+        id=11, method="tools/call",
+        params={"name": "generate_code", "arguments": {"description": "x", "language": "python"}}
+    ), session), 1)
+
+    assert listed.error is None and generated.error is None
+    server.gate.set()
+    await asyncio.gather(*blocked)
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_sheds():
+    limiter = AdaptiveLimiter("p", initial=1, queue_timeout_ms=20)
+    gate = asyncio.Event()
+    first = asyncio.create_task(limiter.run(gate.wait))
+    await settle()
+
+    with pytest.raises(ServerBusy) as raised:
+        await limiter.run(gate.wait)
+
+    assert raised.value.reason == "queue_timeout"
+    assert limiter.queued == 0
+    gate.set()
+    await first
+
+
+def test_limit_grows_while_busy_and_backs_off_on_latency():
+    limiter = AdaptiveLimiter("p", initial=4, max_limit=8)
+
+    for _ in range(200):
+        limiter._adjust(10.0, dropped=False, busy=True)
+    assert limiter.limit == 8
+
+    for _ in range(3):
+        limiter._adjust(200.0, dropped=False, busy=True)
+    assert limiter.limit == 8 * limiter.backoff
+
+
+def test_deadline_drop_backs_off_immediately():
+    limiter = AdaptiveLimiter("p", initial=10)
+    limiter._adjust(10.0, dropped=True, busy=True)
+    assert limiter.limit == 10 * limiter.backoff
+
+
+def test_idle_pool_neither_grows_nor_shrinks():
+    limiter = AdaptiveLimiter("p", initial=4, max_limit=8)
+
+    for i in range(200):
+        limiter._adjust(5.0 if i % 3 else 100.0, dropped=False, busy=False)
+    assert limiter.limit == 4
+
+
+def test_sub_millisecond_jitter_is_not_congestion():
+    limiter = AdaptiveLimiter("p", initial=4)
+
+    for i in range(200):
+        limiter._adjust(0.01 if i % 2 else 0.5, dropped=False, busy=True)
+    assert limiter.limit >= 4
+
+
+@pytest.mark.asyncio
+async def test_shed_call_gets_503_with_retry_after(monkeypatch):
+    async def check_token(token):
+        return TokenCheck(claims={"sub": "user-1", "scp": "mcp.read"})
+
+    server = GatedServer()
+    server.limiters = ToolLimiters({"slow": {"initial": 1, "queue_size": 0}})
+    session = server.create_session("s1", "user-1")
+    monkeypatch.setattr(runtime.get_auth_validator(), "check_token", check_token)
+    monkeypatch.setattr(runtime, "get_server", lambda: server)
+    running = asyncio.create_task(server.handle_request(call(1), session))
+    await settle()
+
+    response = await mcp_command.main(http_request(
+        "POST", "mcp/command", {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": "gated"}},
+        headers={"Authorization": "Bearer t", "X-Session-Id": "s1"}
+    ))
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert json.loads(response.get_body())["error"]["code"] == SERVER_BUSY
+    server.gate.set()
+    await running
+
+
+def test_pool_settings_override_defaults():
+    settings = load_pool_settings('{"sampling": {"max_limit": 4}}')
+    assert settings["sampling"]["max_limit"] == 4
+    assert settings["sampling"]["queue_size"] > 0
+    assert load_pool_settings("") == {}
@@ -0,0 +1,117 @@
+import json
+import asyncio
+import pytest
+
+from benchmarks.support import http_request
+from src.functions import mcp_command
+from src.shared import runtime, deadlines
+from src.shared.auth import TokenCheck
+from src.shared.deadlines import RequestContext, RequestCancelled, DEADLINE, DISCONNECT, timeout_from_headers
+from src.shared.mcp_protocol import MCPServer, MCPRequest, Tool
+
+
+class SlowServer(MCPServer):
+    def _initialize_default_capabilities(self):
+        super()._initialize_default_capabilities()
+        self.tools.append(Tool(name="slow_tool", description="Sleeps", inputSchema={"type": "object"}))
+        self.started = asyncio.Event()
+        self.finished = False
+        self.seen_context = None
+
+    async def _execute_tool(self, tool_name, arguments, session=None, request=None):
+        self.seen_context = deadlines.current()
+        self.started.set()
+        await asyncio.sleep(arguments.get("seconds", 5))
+        self.finished = True
+        return {"slept": True}
+
+
+def call(seconds=5):
+    return MCPRequest(id=1, method="tools/call", params={"name": "slow_tool", "arguments": {"seconds": seconds}})
+
+
+def cancellations(reason):
+    return deadlines.CANCELLATIONS.series.get((reason,), 0)
+
+
+@pytest.mark.asyncio
+async def test_header_deadline_cuts_tool_off(monkeypatch):
+    async def check_token(token):
+        return TokenCheck(claims={"sub": "user-1", "scp": "mcp.read"})
+
+    server = SlowServer()
+    server.create_session("s1", "user-1")
+    monkeypatch.setattr(runtime.get_auth_validator(), "check_token", check_token)
+    monkeypatch.setattr(runtime, "get_server", lambda: server)
+    before = cancellations(DEADLINE)
+
+    response = await mcp_command.main(http_request(
+        "POST", "mcp/command",
+        {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": "slow_tool"}},
+        headers={"Authorization": "Bearer t", "X-Session-Id": "s1", "X-MCP-Timeout-Ms": "50"}
+    ))
+
+    body = json.loads(response.get_body())
+    assert body["error"]["code"] == -32001
+    assert not server.finished
+    assert cancellations(DEADLINE) == before + 1
+    assert server.sessions["s1"].in_flight == set()
+
+
+@pytest.mark.asyncio
+async def test_session_close_cancels_running_tool():
+    server = SlowServer()
+    session = server.create_session("s1", "user-1")
+    before = cancellations(DISCONNECT)
+
+    task = asyncio.create_task(server.handle_request(call(), session, RequestContext()))
+    await asyncio.wait_for(server.started.wait(), timeout=1)
+    assert server.seen_context is not None
+    server.remove_session("s1")
+    response = await asyncio.wait_for(task, timeout=1)
+
+    assert response.error.code == -32800
+    assert not server.finished
+    assert cancellations(DISCONNECT) == before + 1
+    # The close wakes a waiting stream without delivering anything
+    assert await session.get_event() is None
+
+
+@pytest.mark.asyncio
+async def test_tool_timeout_narrows_caller_deadline():
+    server = SlowServer()
+    server.get_tool("slow_tool").timeout = 0.05
+    session = server.create_session("s1", "user-1")
+
+    response = await server.handle_request(call(), session, RequestContext(timeout=60))
+
+    assert response.error.code == -32001
+
+
+@pytest.mark.asyncio
+async def test_fast_work_is_unaffected():
+    server = SlowServer()
+    session = server.create_session("s1", "user-1")
+
+    response = await server.handle_request(call(seconds=0), session, RequestContext(timeout=5))
+
+    assert response.error is None
+    assert server.finished
+
+
+@pytest.mark.asyncio
+async def test_expired_context_skips_work():
+    async def work():
+        raise AssertionError("should not run")
+
+    context = RequestContext()
+    context.cancel(DISCONNECT)
+    with pytest.raises(RequestCancelled):
+        await context.run(work())
+
+
+def test_timeout_from_headers():
+    assert timeout_from_headers({"X-MCP-Timeout-Ms": "1500"}) == 1.5
+    assert timeout_from_headers({"X-MCP-Timeout-Ms": "soon"}) is None
+    assert timeout_from_headers({"X-MCP-Timeout-Ms": "0"}) is None
+    assert timeout_from_headers({}) is None
@@ -0,0 +1,72 @@
+import json
+import logging
+import pytest
+
+from benchmarks.support import LocalSigner, use_local_keys, http_request
+from src.functions import mcp_command
+from src.shared import runtime, responses
+from src.shared.auth import AzureADAuthValidator
+from src.shared.mcp_protocol import MCPServer
+from src.shared.sampled_log import SampledLogger
+
+
+@pytest.fixture
+def signer(monkeypatch):
+    signer = LocalSigner()
+    validator = AzureADAuthValidator()
+    use_local_keys(validator, signer)
+    server = MCPServer()
+    server.create_session("s1", "user-1")
+    monkeypatch.setattr(runtime, "get_auth_validator", lambda: validator)
+    monkeypatch.setattr(runtime, "get_server", lambda: server)
+    monkeypatch.setattr(mcp_command, "error_log", SampledLogger(mcp_command.logger, burst=3))
+    return signer
+
+
+def command(token: str, body=None):
+    return http_request("POST", "mcp/command", body or {"jsonrpc": "2.0", "id": 1, "method": "tools/list"},
+                        headers={"Authorization": f"Bearer {token}", "X-Session-Id": "s1"})
+
+
+@pytest.mark.asyncio
+async def test_rejected_token_is_a_result_not_an_exception(signer):
+    check = await runtime.get_auth_validator().check_token(signer.mint_token("user-1", exp=1))
+
+    assert not check.ok
+    assert check.claims is None
+    assert "expired" in check.error.lower()
+
+
+@pytest.mark.asyncio
+async def test_expired_token_wave_is_logged_sparingly(signer, caplog):
+    token = signer.mint_token("user-1", exp=1)
+
+    with caplog.at_level(logging.WARNING, logger=mcp_command.logger.name):
+        statuses = [(await mcp_command.main(command(token))) for _ in range(50)]
+
+    assert {resp.status_code for resp in statuses} == {401}
+    assert statuses[0].get_body() == responses.ERROR_BODIES[responses.AUTHENTICATION_ERROR]
+    assert len([r for r in caplog.records if "Authentication error" in r.getMessage()]) == 3
+
+
+@pytest.mark.asyncio
+async def test_malformed_body_returns_cached_parse_error(signer):
+    req = http_request("POST", "mcp/command", headers={
+        "Authorization": f"Bearer {signer.mint_token('user-1')}", "X-Session-Id": "s1"
+    })
+
+    resp = await mcp_command.main(req)
+
+    assert resp.status_code == 400
+    assert json.loads(resp.get_body())["error"]["code"] == responses.PARSE_ERROR
+
+
+def test_sampled_logger_reports_suppressed_repeats(caplog):
+    log = SampledLogger(logging.getLogger("sampled"), interval=10, burst=2, sample_every=0)
+
+    with caplog.at_level(logging.INFO, logger="sampled"):
+        logged = [log.log(logging.INFO, "boom", "same", now=t) for t in (0, 1, 2, 3)]
+        log.log(logging.INFO, "boom", "same", now=11)
+
+    assert logged == [True, True, False, False]
+    assert "2 similar suppressed" in caplog.records[-1].getMessage()
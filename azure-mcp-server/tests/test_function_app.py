@@ -0,0 +1,131 @@
+import json
+import time
+import asyncio
+import pytest
+import azure.functions as func
+
+import function_app
+from src.functions import mcp_command, sse_stream
+from src.shared import runtime
+from src.shared.mcp_protocol import MCPServer, MCPNotification
+
+
+def registered():
+    return {f.get_function_name(): f for f in function_app.app.get_functions()}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    async def validate_token(token):
+        return {"sub": "user-1", "scp": "mcp.read"}
+
+    server = MCPServer()
+    monkeypatch.setattr(runtime.get_auth_validator(), "validate_token", validate_token)
+    monkeypatch.setattr(runtime, "get_server", lambda: server)
+    return server
+
+
+def test_v2_registers_the_v1_handlers():
+    functions = registered()
+
+    assert functions["mcp_command"].get_user_function() is mcp_command.main
+    assert functions["sse_stream"].get_user_function() is sse_stream.main
+    trigger = functions["mcp_command"].get_bindings_dict()["bindings"][0]
+    assert trigger["route"] == "mcp/command"
+    assert "warmup" in functions
+
+
+@pytest.mark.asyncio
+async def test_v2_command_requires_a_token():
+    handler = registered()["mcp_command"].get_user_function()
+    body = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "tools/list"}).encode()
+
+    resp = await handler(func.HttpRequest("POST", "/api/mcp/command", body=body))
+
+    assert resp.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_buffered_stream_returns_queued_events(server):
+    session = server.create_session("s1", "user-1")
+    await session.send_message(MCPNotification(method="notifications/message", params={"n": 1}))
+
+    resp = await sse_stream.main(func.HttpRequest(
+        "GET", "/api/mcp/stream", body=b"",
+        headers={"Authorization": "Bearer t", "X-Session-Id": "s1"}
+    ))
+    body = resp.get_body().decode()
+
+    assert resp.status_code == 200
+    assert body.startswith("event: connected")
+    assert '"n": 1' in body
+    assert "id: 1" in body
+
+
+@pytest.mark.asyncio
+async def test_idle_stream_long_polls_and_sets_retry(server, monkeypatch):
+    monkeypatch.setattr(sse_stream, "SSE_POLL_WAIT", 0.3)
+    server.create_session("s1", "user-1")
+    request = func.HttpRequest("GET", "/api/mcp/stream", body=b"",
+                               headers={"Authorization": "Bearer t", "X-Session-Id": "s1"})
+
+    started = time.perf_counter()
+    body = (await sse_stream.main(request)).get_body().decode()
+
+    assert time.perf_counter() - started >= 0.3
+    assert body.startswith("event: connected")
+    assert body.endswith(f"retry: {sse_stream.SSE_RETRY_MS}\n\n")
+    assert "event: message" not in body
+
+
+@pytest.mark.asyncio
+async def test_long_poll_returns_soon_after_an_event(server, monkeypatch):
+    monkeypatch.setattr(sse_stream, "SSE_POLL_WAIT", 5)
+    session = server.create_session("s1", "user-1")
+    request = func.HttpRequest("GET", "/api/mcp/stream", body=b"",
+                               headers={"Authorization": "Bearer t", "X-Session-Id": "s1"})
+
+    async def later():
+        await asyncio.sleep(0.1)
+        await session.send_message(MCPNotification(method="notifications/message", params={"n": 1}))
+
+    started = time.perf_counter()
+    sender = asyncio.create_task(later())
+    body = (await sse_stream.main(request)).get_body().decode()
+    await sender
+
+    assert time.perf_counter() - started < 1
+    assert '"n": 1' in body and body.endswith(f"\n\nretry: {sse_stream.SSE_RETRY_MS}\n\n")
+
+
+@pytest.mark.asyncio
+async def test_overlapping_polls_do_not_end_each_other(server, monkeypatch):
+    monkeypatch.setattr(sse_stream, "SSE_POLL_WAIT", 5)
+    session = server.create_session("s1", "user-1")
+
+    def poll():
+        return sse_stream.main(func.HttpRequest("GET", "/api/mcp/stream", body=b"",
+                                                headers={"Authorization": "Bearer t", "X-Session-Id": "s1"}))
+
+    first = asyncio.create_task(sse_stream.collect_sse_events(session, wait=0.05))
+    second = asyncio.create_task(poll())
+    await first
+    await session.send_message(MCPNotification(method="notifications/message", params={"n": 1}))
+    body = (await second).get_body().decode()
+
+    assert session.active and session.stream_readers == 0
+    assert '"n": 1' in body
+
+
+@pytest.mark.asyncio
+async def test_poll_does_not_revive_a_closed_session(server):
+    session = server.create_session("s1", "user-1")
+    session.close()
+
+    resp = await sse_stream.main(func.HttpRequest(
+        "GET", "/api/mcp/stream", body=b"",
+        headers={"Authorization": "Bearer t", "X-Session-Id": "s1"}
+    ))
+
+    assert resp.status_code == 401
+    assert not session.active
@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+
+from src.shared.idempotency import IdempotencyCache, ResultStore, InMemoryResultStore, idempotency_key
+from src.shared.mcp_protocol import MCPServer, MCPRequest
+
+
+def test_key_ignores_argument_order():
+    assert idempotency_key("s1", "t", {"a": 1, "b": [1, 2]}) == idempotency_key("s1", "t", {"b": [1, 2], "a": 1})
+    assert idempotency_key("s1", "t", {"a": 1}) != idempotency_key("s2", "t", {"a": 1})
+    assert idempotency_key("s1", "t", {"a": 1}) != idempotency_key("s1", "t", {"a": 2})
+
+
+def test_incomplete_backend_fails_at_construction():
+    class ReadOnly(ResultStore):
+        async def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        ReadOnly()
+
+
+@pytest.mark.asyncio
+async def test_inflight_calls_share_one_execution():
+    cache = IdempotencyCache()
+    release = asyncio.Event()
+    calls = []
+
+    async def execute():
+        calls.append(1)
+        await release.wait()
+        return {"ok": True}
+
+    tasks = [asyncio.create_task(cache.run("k", execute)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*tasks) == [{"ok": True}] * 5
+    assert len(calls) == 1
+    assert cache.joined == 4
+
+
+@pytest.mark.asyncio
+async def test_failures_propagate_and_are_not_cached():
+    cache = IdempotencyCache()
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await cache.run("k", fail, cacheable=True, ttl=60)
+    assert await cache.run("k", lambda: asyncio.sleep(0, result=1), cacheable=True, ttl=60) == 1
+
+
+@pytest.mark.asyncio
+async def test_lru_store_expires_and_evicts():
+    store = InMemoryResultStore(max_entries=2)
+    await store.set("a", 1, ttl=60)
+    await store.set("b", 2, ttl=60)
+    await store.get("a")
+    await store.set("c", 3, ttl=60)
+
+    assert await store.get("b") is None
+    assert await store.get("a") == 1
+
+    await store.set("d", 4, ttl=-1)
+    assert await store.get("d") is None
+
+
+@pytest.mark.asyncio
+async def test_retried_tool_call_is_served_from_cache(monkeypatch):
+    server = MCPServer()
+    session = server.create_session("s1", "user-1")
+    calls = []
+    original = server._analyze_code
+
+    async def counting(arguments):
+        calls.append(arguments)
+        return await original(arguments)
+
+    monkeypatch.setattr(server, "_analyze_code", counting)
+    request = MCPRequest(id=1, method="tools/call", params={
+        "name": "analyze_code", "arguments": {"code": "x = 1", "language": "python"}
+    })
+    retry = MCPRequest(id=2, method="tools/call", params={
+        "name": "analyze_code", "arguments": {"language": "python", "code": "x = 1"}
+    })
+
+    first = await server.handle_request(request, session)
+    second = await server.handle_request(retry, session)
+
+    assert first.result == second.result
+    assert second.id == 2
+    assert len(calls) == 1
@@ -0,0 +1,40 @@
+import pytest
+
+from benchmarks import load_test
+from src.shared import runtime
+
+
+@pytest.mark.asyncio
+async def test_all_scenarios_run_without_errors():
+    report = await load_test.run_all(list(load_test.SCENARIOS), [1, 4], requests=20)
+
+    assert len(report["results"]) == len(load_test.SCENARIOS) * 2
+    for result in report["results"]:
+        assert result["errors"] == 0, result
+        assert result["requests"] == 20
+        assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+
+
+@pytest.mark.asyncio
+async def test_harness_restores_the_runtime_instances():
+    server, validator = runtime.get_server(), runtime.get_auth_validator()
+    issuer = validator.issuer
+
+    with load_test.Harness(clients=1) as harness:
+        assert runtime.get_server() is harness.server
+        await load_test.run_sse_fanout(harness, messages=2)
+
+    assert runtime.get_server() is server
+    assert runtime.get_auth_validator() is validator
+    assert validator.issuer == issuer
+
+
+def test_compare_flags_throughput_and_latency_regressions():
+    baseline = [{"scenario": "tools/list", "concurrency": 10, "rps": 1000, "p95_ms": 2.0}]
+    current = [{"scenario": "tools/list", "concurrency": 10, "rps": 800, "p95_ms": 2.1}]
+
+    regressions = load_test.compare(current, baseline, tolerance=0.15)
+
+    assert len(regressions) == 1
+    assert "rps" in regressions[0]
+    assert load_test.compare(current, baseline, tolerance=0.25) == []
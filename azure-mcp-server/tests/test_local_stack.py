@@ -0,0 +1,81 @@
+import aiohttp
+import pytest
+import pytest_asyncio
+
+from local_stack import InProcessBackend, LocalStack
+from src.functions import mcp_endpoint
+from src.shared import runtime
+
+
+async def fetch_token(session: aiohttp.ClientSession, stack: LocalStack, secret: str = None) -> aiohttp.ClientResponse:
+    return await session.post(f"{stack.authority_host}/{stack.tenant_id}/oauth2/v2.0/token", data={
+        "grant_type": "client_credentials",
+        "client_id": stack.client_id,
+        "client_secret": secret or stack.client_secret,
+        "scope": f"api://{stack.client_id}/.default"
+    })
+
+
+@pytest_asyncio.fixture
+async def stack(monkeypatch):
+    backend = InProcessBackend(routes={"mcp": mcp_endpoint.main})
+    async with LocalStack(backend=backend) as stack:
+        monkeypatch.setattr(runtime, "get_auth_validator", lambda: stack.gateway.validator)
+        yield stack
+
+
+@pytest.mark.asyncio
+async def test_issued_token_validates_against_local_jwks(stack):
+    validator = stack.gateway.validator
+    async with aiohttp.ClientSession() as session:
+        resp = await fetch_token(session, stack)
+        token = (await resp.json())["access_token"]
+
+    payload = await validator.validate_token(token)
+
+    assert payload["aud"] == f"api://{stack.client_id}"
+    assert payload["roles"] == ["MCP.Access"]
+    assert stack.identity.jwks_requests == 1
+
+
+@pytest.mark.asyncio
+async def test_wrong_secret_is_rejected(stack):
+    async with aiohttp.ClientSession() as session:
+        resp = await fetch_token(session, stack, secret="wrong")
+        assert resp.status == 401
+        assert (await resp.json())["error"] == "invalid_client"
+
+
+@pytest.mark.asyncio
+async def test_cached_keys_survive_rotation(stack):
+    validator = stack.gateway.validator
+    before = stack.identity.issue_token(stack.client_id, f"api://{stack.client_id}")
+    await validator.validate_token(before)
+
+    stack.identity.keys.rotate()
+    after = stack.identity.issue_token(stack.client_id, f"api://{stack.client_id}")
+
+    # The promoted key was already published, and the retired one still is
+    assert (await validator.validate_token(after))["tid"] == stack.tenant_id
+    assert (await validator.validate_token(before))["tid"] == stack.tenant_id
+    assert stack.identity.jwks_requests == 1
+
+
+@pytest.mark.asyncio
+async def test_gateway_enforces_jwt_and_forwards(stack):
+    initialize = {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}}
+    async with aiohttp.ClientSession() as session:
+        resp = await session.post(f"{stack.gateway_url}/mcp", json=initialize)
+        assert resp.status == 401
+        assert await resp.json() == {"statusCode": 401, "message": "Unauthorized"}
+
+        token = (await (await fetch_token(session, stack)).json())["access_token"]
+        resp = await session.post(f"{stack.gateway_url}/mcp", json=initialize, headers={
+            "Authorization": f"Bearer {token}", "Accept": "application/json"
+        })
+        assert resp.status == 200
+        assert resp.headers["Mcp-Session-Id"]
+        assert (await resp.json())["result"]["serverInfo"]
+
+    assert stack.gateway.forwarded == 1
+    assert stack.gateway.rejected == 1
@@ -0,0 +1,88 @@
+import json
+import logging
+import time
+
+from src.shared.log_pipeline import LogPipeline, audit_logger, DROPPED
+
+
+class Collector(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class Counted:
+    formatted = 0
+
+    def __str__(self):
+        Counted.formatted += 1
+        return "value"
+
+
+def make_pipeline(**kwargs):
+    # A long interval and a large batch keep the thread from exporting on its own
+    pipeline = LogPipeline(**{"queue_size": 100, "batch_size": 1000, "flush_interval": 60, **kwargs})
+    target = Collector()
+    pipeline.targets.append(target)
+    logger = logging.getLogger(f"test.pipeline.{id(pipeline)}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(pipeline.handler)
+    return pipeline, target, logger
+
+
+def test_records_are_formatted_on_export():
+    pipeline, target, logger = make_pipeline()
+    try:
+        Counted.formatted = 0
+        logger.info("request: %s", Counted())
+        assert Counted.formatted == 0 and target.messages == []
+
+        pipeline.flush()
+        assert target.messages == ["request: value"]
+        assert Counted.formatted == 1
+    finally:
+        pipeline.close()
+
+
+def test_full_queue_drops_and_counts():
+    pipeline, target, logger = make_pipeline(queue_size=3)
+    try:
+        before = DROPPED.series.get(("log",), 0)
+        for n in range(5):
+            logger.info("record %d", n)
+        assert DROPPED.series.get(("log",), 0) - before == 2
+
+        pipeline.flush()
+        assert target.messages == ["record 0", "record 1", "record 2"]
+    finally:
+        pipeline.close()
+
+
+def test_thread_exports_full_batches():
+    pipeline, target, logger = make_pipeline(batch_size=10)
+    try:
+        for n in range(25):
+            logger.info("record %d", n)
+        deadline = time.monotonic() + 5
+        while len(target.messages) < 20 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(target.messages) >= 20
+    finally:
+        pipeline.close()
+    assert len(target.messages) == 25
+
+
+def test_audit_rows_are_batched(caplog):
+    pipeline = LogPipeline(queue_size=100, batch_size=2, flush_interval=60)
+    with caplog.at_level(logging.INFO, logger=audit_logger.name):
+        for n in range(3):
+            pipeline.audit("user-1", "tools/call", "analyze_code", 12.34, "ok")
+        pipeline.close()
+    batches = [json.loads(r.getMessage()) for r in caplog.records if r.name == audit_logger.name]
+    assert [len(b["rows"]) for b in batches] == [2, 1]
+    assert batches[0]["fields"] == ["ts", "user", "method", "tool", "latency_ms", "status"]
+    assert batches[0]["rows"][0][1:] == ["user-1", "tools/call", "analyze_code", 12.3, "ok"]
@@ -12,6 +12,8 @@
 CLIENT_ID = os.environ.get("CLIENT_ID", "your-client-id")
 TENANT_ID = os.environ.get("TENANT_ID", "your-tenant-id")
 CLIENT_SECRET = os.environ.get("CLIENT_SECRET", "your-client-secret")
+# Point at the local stand-in stack with `python -m local_stack`
+AUTHORITY_HOST = os.environ.get("AUTHORITY_HOST", "https://login.microsoftonline.com").rstrip("/")
 
 class MCPTestClient:
     def __init__(self):
@@ -32,7 +34,7 @@ async def __aexit__(self, exc_type, exc_val, exc_tb):
         
     async def authenticate(self):
         """Get OAuth2 token from Azure AD"""
-        token_url = f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token"
+        token_url = f"{AUTHORITY_HOST}/{TENANT_ID}/oauth2/v2.0/token"
         
         data = {
             "client_id": CLIENT_ID,
@@ -0,0 +1,78 @@
+import os
+import re
+import sys
+import glob
+import subprocess
+import pytest
+import azure.functions as func
+
+from src.functions import metrics as metrics_function
+from src.shared.mcp_protocol import MCPServer, MCPNotification
+from src.shared.metrics import MetricsRegistry, OVERFLOW_LABEL
+
+
+def test_render_counter_gauge_and_histogram():
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests", labelnames=("method",)).inc(method="tools/list")
+    registry.gauge("queue_depth", "Depth").set(3)
+    histogram = registry.histogram("latency_ms", "Latency", buckets=(1, 10))
+    histogram.observe(0.5)
+    histogram.observe(5)
+    histogram.observe(50)
+
+    text = registry.render()
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{method="tools/list"} 1' in text
+    assert "queue_depth 3" in text
+    assert 'latency_ms_bucket{le="1"} 1' in text
+    assert 'latency_ms_bucket{le="10"} 2' in text
+    assert 'latency_ms_bucket{le="+Inf"} 3' in text
+    assert "latency_ms_count 3" in text
+
+
+def test_label_cardinality_is_capped():
+    registry = MetricsRegistry()
+    counter = registry.counter("calls_total", "Calls", labelnames=("tool",), max_series=2)
+    for tool in ["a", "b", "c", "d", "a"]:
+        counter.inc(tool=tool)
+
+    assert counter.series == {("a",): 2, ("b",): 1, (OVERFLOW_LABEL,): 2}
+    assert "mcp_metrics_series_overflow_total 2" in registry.render()
+
+
+def test_metric_type_conflicts_are_rejected():
+    registry = MetricsRegistry()
+    registry.counter("x", "X")
+    with pytest.raises(ValueError):
+        registry.gauge("x", "X")
+
+
+@pytest.mark.asyncio
+async def test_endpoint_exposes_session_and_queue_gauges():
+    server = MCPServer()
+    session = server.create_session("metrics-session", "user-1")
+    await session.send_message(MCPNotification(method="notifications/message"))
+
+    resp = await metrics_function.main(func.HttpRequest("GET", "/api/metrics", body=b""))
+    text = resp.get_body().decode()
+
+    assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE mcp_sessions gauge" in text
+    assert "mcp_session_queue_depth_total" in text
+    assert "metrics-session" not in text
+
+
+def test_fresh_worker_scrape_lists_every_registered_series():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    registered = set()
+    for path in glob.glob(os.path.join(root, "src", "**", "*.py"), recursive=True):
+        with open(path) as f:
+            registered.update(re.findall(r'registry\.(?:counter|gauge|histogram)\(\s*"([^"]+)"', f.read()))
+    script = "from src.functions import metrics; print(metrics.registry.render())"
+
+    rendered = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True,
+                              check=True, timeout=60).stdout
+
+    assert registered
+    assert sorted(name for name in registered if f"# TYPE {name} " not in rendered) == []
@@ -0,0 +1,133 @@
+import io
+import json
+import base64
+import zipfile
+import pytest
+
+from benchmarks import replay_traffic
+from benchmarks.support import LocalSigner, use_local_keys, http_request
+from src.functions import mcp_command, mcp_endpoint, sse_stream
+from src.shared import runtime
+from src.shared.auth import AzureADAuthValidator
+from src.shared.mcp_protocol import MCPServer
+from src.shared.recorder import TrafficRecorder, read_capture, sanitize
+
+CODE = "def handler(event):\n    token = 'sk-secret'\n    return token\n"
+
+
+@pytest.fixture
+def capture(tmp_path, monkeypatch):
+    signer = LocalSigner()
+    validator = AzureADAuthValidator()
+    use_local_keys(validator, signer)
+    server = MCPServer()
+    server.create_session("s1", "user-1")
+    monkeypatch.setattr(runtime, "get_auth_validator", lambda: validator)
+    monkeypatch.setattr(runtime, "get_server", lambda: server)
+    recorder = TrafficRecorder(str(tmp_path / "capture.jsonl"))
+    for module in (mcp_command, mcp_endpoint, sse_stream):
+        monkeypatch.setattr(module, "recorder", recorder)
+    monkeypatch.setattr(sse_stream, "SSE_POLL_WAIT", 0.1)
+    return signer, recorder
+
+
+def test_sanitize_keeps_shape_not_content():
+    message = {"jsonrpc": "2.0", "id": 7, "method": "tools/call", "params": {
+        "name": "analyze_code",
+        "arguments": {"code": CODE, "files": [{"path": "a.py", "content": CODE}], "max_tokens": 50}
+    }}
+    envelope = sanitize(message)
+    arguments = envelope["params"]["arguments"]
+    assert envelope["params"]["name"] == "analyze_code"
+    assert len(arguments["code"]) == len(CODE) and "sk-secret" not in arguments["code"]
+    assert arguments["files"][0]["path"] == "x.py"
+    assert arguments["max_tokens"] == 50
+
+
+@pytest.mark.asyncio
+async def test_capture_and_replay(capture, monkeypatch):
+    signer, recorder = capture
+    token = signer.mint_token("user-1")
+    headers = {"Authorization": f"Bearer {token}", "X-Session-Id": "s1"}
+    calls = [
+        (mcp_command.main, http_request("POST", "mcp/command", {
+            "jsonrpc": "2.0", "id": 1, "method": "tools/call",
+            "params": {"name": "analyze_code", "arguments": {"code": CODE, "language": "python"}}
+        }, headers=headers)),
+        (mcp_endpoint.main, http_request("POST", "mcp", {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+                                         headers=headers)),
+        (sse_stream.main, http_request("GET", "mcp/stream", headers=headers)),
+    ]
+    for handler, req in calls:
+        assert (await handler(req)).status_code == 200
+    recorder.close()
+
+    with open(recorder.path) as f:
+        text = f.read()
+    assert token not in text and "sk-secret" not in text and '"s1"' not in text
+    entries = read_capture(recorder.path)
+    assert [replay_traffic.series_key(e) for e in entries] == ["command tools/call", "mcp tools/list", "stream"]
+    assert entries[0]["t"] <= entries[1]["t"] <= entries[2]["t"]
+
+    # The replay brings its own server and signing key
+    monkeypatch.undo()
+    monkeypatch.setattr(sse_stream, "SSE_POLL_WAIT", 0.1)
+    try:
+        for speed in (10.0, None):
+            report = replay_traffic.summarize(*(await replay_traffic.replay(entries, speed)), speed)
+            assert report["requests"] == 3
+            assert all(s["errors"] == 0 for s in report["series"]), report
+    finally:
+        runtime.reset()
+
+
+def source_archive() -> str:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("secret_project/app.py", CODE * 40)
+        archive.writestr("secret_project/util.py", "def helper(x):\n    return x\n")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+@pytest.mark.asyncio
+async def test_masked_capture_replays_through_success_paths(capture, monkeypatch):
+    signer, recorder = capture
+    headers = {"Authorization": f"Bearer {signer.mint_token('user-1')}", "Mcp-Session-Id": "s1"}
+    archive = source_archive()
+    calls = [
+        ("tools/call", {"name": "index_files", "arguments": {"archive": archive}}),
+        ("tools/call", {"name": "search_code", "arguments": {"query": "handler", "mode": "token"}}),
+        ("tools/call", {"name": "find_symbol", "arguments": {"name": "handler", "kind": "function"}}),
+        ("tools/call", {"name": "analyze_workspace", "arguments": {"archive": archive, "analysis_type": "security"}}),
+        ("tools/call", {"name": "analyze_code", "arguments": {"code": CODE, "language": "python",
+                                                              "analysis_type": "quality"}}),
+        ("resources/read", {"uri": "resource://index/stats"}),
+    ]
+    for n, (method, params) in enumerate(calls, 1):
+        resp = await mcp_endpoint.main(http_request("POST", "mcp", {
+            "jsonrpc": "2.0", "id": n, "method": method, "params": params
+        }, headers=headers))
+        assert not replay_traffic.failed(resp), resp.get_body()
+    recorder.close()
+
+    entries = read_capture(recorder.path)
+    arguments = [e["message"]["params"].get("arguments", {}) for e in entries]
+    assert (arguments[1]["mode"], arguments[2]["kind"], arguments[3]["analysis_type"]) == ("token", "function", "security")
+    masked = arguments[0]["archive"]
+    assert len(masked) == len(archive) and masked != archive
+    assert all(name.startswith("masked/") for name in zipfile.ZipFile(io.BytesIO(base64.b64decode(masked))).namelist())
+
+    monkeypatch.undo()
+    try:
+        report = replay_traffic.summarize(*(await replay_traffic.replay(entries, 10.0)), 10.0)
+        assert report["requests"] == len(calls)
+        assert all(s["errors"] == 0 for s in report["series"]), report
+    finally:
+        runtime.reset()
+
+
+def test_parse_speed():
+    assert replay_traffic.parse_speed("10x") == 10.0
+    assert replay_traffic.parse_speed("max") is None
+    with pytest.raises(ValueError):
+        replay_traffic.parse_speed("0")
@@ -0,0 +1,66 @@
+import json
+import pytest
+import azure.functions as func
+
+import function_app
+from src.functions import mcp_command, mcp_endpoint, sse_stream
+from src.shared import runtime, responses
+
+
+@pytest.fixture
+def no_auth(monkeypatch):
+    async def validate_token(token):
+        raise AssertionError("preflight reached token validation")
+
+    monkeypatch.setattr(runtime.get_auth_validator(), "validate_token", validate_token)
+    monkeypatch.setattr(runtime.get_auth_validator(), "check_token", validate_token)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("handler, path", [
+    (mcp_command.main, "/api/mcp/command"),
+    (mcp_endpoint.main, "/api/mcp"),
+    (sse_stream.main, "/api/mcp/stream"),
+])
+async def test_preflight_is_answered_before_auth(no_auth, handler, path):
+    resp = await handler(func.HttpRequest("OPTIONS", path, body=b"",
+                                          headers={"Authorization": "Bearer t"}))
+
+    assert resp.status_code == 204
+    assert resp.headers["Access-Control-Allow-Origin"] == responses.CORS_ALLOW_ORIGIN
+    assert "OPTIONS" in resp.headers["Access-Control-Allow-Methods"]
+    assert resp.headers["Access-Control-Max-Age"] == responses.CORS_MAX_AGE
+
+
+def test_stream_route_accepts_options():
+    functions = {f.get_function_name(): f for f in function_app.app.get_functions()}
+    trigger = functions["sse_stream"].get_bindings_dict()["bindings"][0]
+
+    assert "OPTIONS" in [str(method.value) for method in trigger["methods"]]
+
+
+@pytest.mark.parametrize("code", sorted(responses.ERROR_MESSAGES))
+def test_error_bodies_are_jsonrpc(code):
+    body = json.loads(responses.ERROR_BODIES[code])
+
+    assert body == {"jsonrpc": "2.0", "id": None,
+                    "error": {"code": code, "message": responses.ERROR_MESSAGES[code]}}
+
+
+def test_header_maps_are_frozen():
+    with pytest.raises(TypeError):
+        mcp_command.RESPONSES.json["X-Extra"] = "1"
+
+
+@pytest.mark.asyncio
+async def test_parse_error_uses_shared_body(monkeypatch):
+    async def validate_token(token):
+        return {"sub": "user-1"}
+
+    monkeypatch.setattr(runtime.get_auth_validator(), "validate_token", validate_token)
+
+    resp = await mcp_endpoint.main(func.HttpRequest("POST", "/api/mcp", body=b"{not json",
+                                                    headers={"Authorization": "Bearer t"}))
+
+    assert resp.status_code == 400
+    assert resp.get_body() == responses.ERROR_BODIES[responses.PARSE_ERROR]
@@ -0,0 +1,154 @@
+import os
+import sys
+import time
+import asyncio
+import subprocess
+import pytest
+
+from benchmarks.support import LocalSigner, use_local_keys, http_request
+from src.functions import mcp_endpoint, sse_stream
+from src.shared import runtime
+from src.shared.auth import AzureADAuthValidator
+from src.shared.mcp_protocol import MCPServer, MCPRequest, MCPNotification
+from src.shared.snapshots import SnapshotStore, FileSnapshotStore, encode_snapshot, decode_snapshot
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FileSnapshotStore(str(tmp_path))
+
+
+async def initialized(server, session_id="s1"):
+    session = server.create_session(session_id, "user-1", "tenant-1")
+    await server.handle_request(MCPRequest(id=1, method="initialize", params={
+        "clientInfo": {"name": "vscode", "version": "1.90"}, "capabilities": {"sampling": {}}
+    }), session)
+    return session
+
+
+@pytest.mark.asyncio
+async def test_drain_saves_and_restores_lazily(store):
+    old = MCPServer(snapshot_store=store)
+    session = await initialized(old)
+    for seq in range(2):
+        await session.send_message(MCPNotification(method="notifications/message", params={"seq": seq}))
+
+    # Nothing reads this session's queue, so the drain does not wait for it
+    started = time.perf_counter()
+    report = await old.drain(timeout=5)
+    assert time.perf_counter() - started < 1
+    assert report == {"sessions": 1, "saved": 1, "failed": 0}
+    assert not session.active
+    assert await old.find_session("s1") is session
+
+    new = MCPServer(snapshot_store=store)
+    assert new.get_session("s1") is None
+    restored = await new.find_session("s1")
+    assert (restored.user_id, restored.tenant_id) == ("user-1", "tenant-1")
+    assert restored.client_info == {"name": "vscode", "version": "1.90"}
+    assert new.index.select(None, None, "sampling") == {"s1"}
+    # Undelivered messages keep their event ids; the reconnect hint is not replayed
+    events = restored.drain_events(10)
+    assert [(event_id, message["params"]["seq"]) for event_id, message in events] == [(1, 0), (2, 1)]
+    assert [e[0] for e in await restored.events_after(0)] == [1, 2]
+    await restored.send_message(MCPNotification(method="notifications/message", params={"seq": 2}))
+    assert restored.drain_events(10)[0][0] == 3
+
+    # A snapshot is used once
+    assert await MCPServer(snapshot_store=store).find_session("s1") is None
+
+
+@pytest.mark.asyncio
+async def test_connected_stream_gets_queue_and_hint(store):
+    server = MCPServer(snapshot_store=store)
+    session = await initialized(server)
+    await session.send_message(MCPNotification(method="notifications/message", params={"seq": 0}))
+    frames = []
+
+    async def consume():
+        async for frame in sse_stream.generate_sse_events(session):
+            frames.append(frame)
+
+    consumer = asyncio.create_task(consume())
+    await asyncio.sleep(0.05)
+    await server.drain(timeout=1)
+    await asyncio.wait_for(consumer, 1)
+
+    body = "".join(frames)
+    assert body.index('"seq": 0') < body.index("notifications/reconnect")
+    restored = await MCPServer(snapshot_store=store).find_session("s1")
+    assert restored.drain_events(10) == []
+
+
+def test_snapshot_blob_checks():
+    blob = encode_snapshot({"user_id": "user-1", "pending": []})
+    assert decode_snapshot(blob)["user_id"] == "user-1"
+    assert decode_snapshot(blob, ttl=-1) is None
+    assert decode_snapshot(b"not a snapshot") is None
+    assert decode_snapshot(blob[:-4]) is None
+
+
+def test_incomplete_backend_fails_at_construction():
+    class WriteOnly(SnapshotStore):
+        async def save(self, session_id, data):
+            pass
+
+    with pytest.raises(TypeError):
+        WriteOnly()
+
+
+@pytest.mark.asyncio
+async def test_draining_refuses_new_sessions_and_streams(store, monkeypatch):
+    signer = LocalSigner()
+    validator = AzureADAuthValidator()
+    use_local_keys(validator, signer)
+    server = MCPServer(snapshot_store=store)
+    monkeypatch.setattr(runtime, "get_auth_validator", lambda: validator)
+    monkeypatch.setattr(runtime, "get_server", lambda: server)
+    await server.drain(timeout=0)
+    headers = {"Authorization": f"Bearer {signer.mint_token('user-1')}"}
+
+    resp = await sse_stream.main(http_request("GET", "mcp/stream", headers=headers))
+    assert (resp.status_code, resp.headers["Retry-After"]) == (503, "1")
+    resp = await mcp_endpoint.main(http_request("POST", "mcp", {
+        "jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}
+    }, headers=headers))
+    assert resp.status_code == 503
+
+
+SIGTERM_SCRIPT = """
+import asyncio, os, signal, sys, time
+from src.shared import runtime
+from src.shared.recorder import recorder, COMMAND
+
+def previous(signum, frame):
+    with open(os.environ["MARKER"], "w") as f:
+        f.write("chained")
+    sys.exit(0)
+
+signal.signal(signal.SIGTERM, previous)
+
+async def main():
+    runtime.get_server().create_session("s1", "user-1")
+    message = {"jsonrpc": "2.0", "id": 1, "method": "tools/list"}
+    for _ in range(2):
+        # The second line stays buffered until the recorder is closed
+        recorder.record(COMMAND, time.perf_counter(), "s1", "user-1", message, 200)
+    os.kill(os.getpid(), signal.SIGTERM)
+    await asyncio.sleep(10)
+
+asyncio.run(main())
+"""
+
+
+def test_sigterm_drains_flushes_and_chains(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": root, "MARKER": str(tmp_path / "marker"),
+           "MCP_RECORD_PATH": str(tmp_path / "capture.jsonl"), "MCP_SNAPSHOT_DIR": str(tmp_path / "snapshots")}
+    done = subprocess.run([sys.executable, "-c", SIGTERM_SCRIPT], cwd=root, env=env, timeout=30)
+
+    assert done.returncode == 0
+    assert (tmp_path / "marker").read_text() == "chained"
+    assert len(os.listdir(tmp_path / "snapshots")) == 1
+    with open(tmp_path / "capture.jsonl") as f:
+        assert len(f.read().splitlines()) == 3
@@ -0,0 +1,99 @@
+import os
+import json
+import base64
+import pytest
+
+from src.shared.mcp_protocol import MCPServer, MCPRequest
+from src.shared.spill import SpillStore, EncodedResult
+
+
+class LargeResultServer(MCPServer):
+    async def _execute_tool(self, tool_name, arguments, session=None, request=None):
+        if tool_name == "generate_code":
+            return {"code": "x = 1\n" * arguments.get("lines", 1)}
+        return await super()._execute_tool(tool_name, arguments, session, request)
+
+
+@pytest.fixture
+def server(tmp_path):
+    return LargeResultServer(spill_store=SpillStore(str(tmp_path), threshold=1024, max_bytes=64 * 1024))
+
+
+async def call(server, session, lines):
+    response = await server.handle_request(
+        MCPRequest(id=1, method="tools/call", params={"name": "generate_code", "arguments": {"lines": lines}}),
+        session
+    )
+    return response.result["toolResult"]
+
+
+async def read(server, session, uri, **params):
+    response = await server.handle_request(
+        MCPRequest(id=2, method="resources/read", params={"uri": uri, **params}), session
+    )
+    return response
+
+
+@pytest.mark.asyncio
+async def test_small_results_stay_inline(server):
+    session = server.create_session("s1", "user-1")
+    assert await call(server, session, 3) == {"code": "x = 1\n" * 3}
+    assert server.spill.stats()["results"] == 0
+
+
+@pytest.mark.asyncio
+async def test_inline_result_json_is_reused(server):
+    session = server.create_session("s1", "user-1")
+    request = MCPRequest(id=1, method="tools/call", params={"name": "generate_code", "arguments": {"lines": 3}})
+    response = await server.handle_request(request, session)
+    result = response.result["toolResult"]
+    assert isinstance(result, EncodedResult)
+
+    body = server.encode_response(request, response)
+    assert json.loads(body) == json.loads(json.dumps(response.model_dump(exclude_none=True)))
+    # The measured bytes are spliced in as they are
+    result.json = b'{"spliced": true}'
+    assert json.loads(server.encode_response(request, response))["result"]["toolResult"] == {"spliced": True}
+
+
+@pytest.mark.asyncio
+async def test_large_result_returns_reference(server):
+    session = server.create_session("s1", "user-1")
+    expected = json.dumps({"code": "x = 1\n" * 1000}).encode()
+
+    reference = (await call(server, session, 1000))["resource"]
+    assert reference["uri"].startswith("resource://results/")
+    assert reference["size"] == len(expected)
+
+    whole = (await read(server, session, reference["uri"])).result["contents"][0]
+    assert whole["text"].encode() == expected
+
+    parts, offset = [], 0
+    while offset < len(expected):
+        content = (await read(server, session, reference["uri"], offset=offset, length=1000)).result["contents"][0]
+        assert content["range"]["size"] == len(expected)
+        parts.append(base64.b64decode(content["blob"]))
+        offset += content["range"]["length"]
+    assert b"".join(parts) == expected
+
+    # The same content is stored once
+    other = server.create_session("s2", "user-2")
+    assert (await call(server, other, 1000))["resource"] == reference
+    assert server.spill.stats()["results"] == 1
+
+
+@pytest.mark.asyncio
+async def test_eviction_and_unknown_results(server, tmp_path):
+    session = server.create_session("s1", "user-1")
+    uris = [(await call(server, session, lines))["resource"]["uri"] for lines in range(3000, 3010)]
+    stats = server.spill.stats()
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert (await read(server, session, uris[0])).error.code == -32602
+    assert (await read(server, session, uris[-1])).result["contents"][0]["text"]
+    assert (await read(server, session, "resource://results/../../etc/passwd")).error.code == -32602
+
+    # A new store picks up what is on disk
+    reopened = SpillStore(str(tmp_path), threshold=1024, max_bytes=64 * 1024)
+    assert (await reopened.read(uris[-1].rsplit("/", 1)[1])) is not None
+    assert reopened.stats()["bytes"] == stats["bytes"]
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names if name.startswith(".tmp-")]
@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+
+from src.shared import mcp_protocol
+
+from src.functions.sse_stream import generate_sse_events
+from src.shared.client_requests import ClientRequestError, NO_STREAM
+from src.shared.mcp_protocol import MCPServer, MCPNotification
+from src.shared.replay import ReplayStore, InMemoryReplayStore, parse_last_event_id
+
+
+def notification(n):
+    return MCPNotification(method="notifications/message", params={"n": n})
+
+
+def parse(frame):
+    fields = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+    return fields.get("id"), fields["event"]
+
+
+async def take(stream, count):
+    frames = []
+    while len(frames) < count:
+        chunk = await stream.__anext__()
+        frames.extend(parse(frame) for frame in chunk.strip().split("\n\n"))
+    return frames
+
+
+@pytest.mark.asyncio
+async def test_ring_buffer_is_bounded_by_count_and_age():
+    store = InMemoryReplayStore(max_events=3, max_age=60)
+    for event_id in range(1, 6):
+        await store.append("s1", event_id, {"n": event_id})
+
+    assert [e[0] for e in await store.events_after("s1", 0)] == [3, 4, 5]
+    assert [e[0] for e in await store.events_after("s1", 4)] == [5]
+
+    store.max_age = 0
+    assert await store.events_after("s1", 0) == []
+
+
+def test_incomplete_backend_fails_at_construction():
+    class AppendOnly(ReplayStore):
+        async def append(self, session_id, event_id, data):
+            pass
+
+    with pytest.raises(TypeError):
+        AppendOnly()
+
+
+@pytest.mark.asyncio
+async def test_resume_replays_only_missed_events():
+    server = MCPServer(replay_store=InMemoryReplayStore())
+    session = server.create_session("s1", "user-1")
+    for n in range(3):
+        await session.send_message(notification(n))
+
+    stream = generate_sse_events(session)
+    assert await take(stream, 4) == [(None, "connected"), ("1", "message"), ("2", "message"), ("3", "message")]
+    await stream.aclose()
+
+    # Queued while the client was disconnected
+    await session.send_message(notification(3))
+    await session.send_message(notification(4))
+
+    stream = generate_sse_events(session, last_event_id=2)
+    frames = await take(stream, 4)
+    await stream.aclose()
+
+    assert frames == [(None, "connected"), ("3", "message"), ("4", "message"), ("5", "message")]
+
+
+@pytest.mark.asyncio
+async def test_resume_reports_gap_when_buffer_overflowed():
+    server = MCPServer(replay_store=InMemoryReplayStore(max_events=2))
+    session = server.create_session("s1", "user-1")
+    for n in range(4):
+        await session.send_message(notification(n))
+
+    stream = generate_sse_events(session, last_event_id=1)
+    frames = await take(stream, 4)
+    await stream.aclose()
+
+    assert frames == [(None, "connected"), (None, "replay_gap"), ("3", "message"), ("4", "message")]
+
+
+@pytest.mark.asyncio
+async def test_streamless_session_queue_is_bounded(monkeypatch):
+    monkeypatch.setattr(mcp_protocol, "SESSION_QUEUE_SIZE", 3)
+    server = MCPServer(replay_store=InMemoryReplayStore())
+    session = server.create_session("s1", "user-1")
+    for n in range(1, 6):
+        await session.send_message(notification(n))
+
+    assert [event_id for event_id, _ in session.drain_events(10)] == [3, 4, 5]
+    # Dropped messages can still be resumed
+    assert [e[0] for e in await session.events_after(0)] == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_keeps_wakeups_and_fails_dropped_client_requests(monkeypatch):
+    monkeypatch.setattr(mcp_protocol, "SESSION_QUEUE_SIZE", 2)
+    server = MCPServer(replay_store=InMemoryReplayStore())
+    session = server.create_session("s1", "user-1")
+    session._message_queue.put_nowait(mcp_protocol._WAKE)
+    request = asyncio.create_task(session.client_requests.request(session, "sampling/createMessage", {}))
+    while session._message_queue.qsize() < 2:
+        await asyncio.sleep(0)
+
+    await session.send_message(notification(1))
+
+    with pytest.raises(ClientRequestError) as raised:
+        await asyncio.wait_for(request, 1)
+    assert raised.value.code == NO_STREAM
+    assert session._message_queue.qsize() == 2
+    assert await session.get_event() is None  # the wake-up is still queued
+    assert session.drain_events(10)[0][1]["params"] == {"n": 1}
+
+
+def test_parse_last_event_id():
+    assert parse_last_event_id("42") == 42
+    assert parse_last_event_id("not-a-number") is None
+    assert parse_last_event_id(None) is None
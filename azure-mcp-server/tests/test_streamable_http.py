@@ -0,0 +1,143 @@
+import json
+import asyncio
+import pytest
+import azure.functions as func
+
+from src.functions import mcp_endpoint, sse_stream
+from src.shared import runtime
+from src.shared.mcp_protocol import MCPServer, MCPRequest, MCPResponse, Tool
+from src.shared.transport import accepts_event_stream, choose_response_mode, stream_request
+
+
+class StreamingServer(MCPServer):
+    def _initialize_default_capabilities(self):
+        super()._initialize_default_capabilities()
+        self.tools.append(Tool(name="slow_tool", description="Streams progress",
+                               inputSchema={"type": "object"}, streaming=True))
+
+    async def _handle_call_tool(self, request, session, context=None):
+        for step in range(3):
+            await self.send_progress(request, session, step + 1, total=3)
+        return MCPResponse(id=request.id, result={"toolResult": {"done": True}})
+
+
+class GatedStreamingServer(StreamingServer):
+    gate: asyncio.Event
+
+    async def _handle_call_tool(self, request, session, context=None):
+        await self.send_progress(request, session, 1, total=2)
+        await self.gate.wait()
+        return MCPResponse(id=request.id, result={"toolResult": {"done": True}})
+
+
+def parse_frames(body: str):
+    frames = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        if "event" in fields:
+            frames.append((fields["event"], json.loads(fields["data"])))
+    return frames
+
+
+@pytest.fixture
+def authenticated(monkeypatch):
+    async def validate_token(token):
+        return {"sub": "user-1", "scp": "mcp.read"}
+    server = StreamingServer()
+    monkeypatch.setattr(runtime.get_auth_validator(), "validate_token", validate_token)
+    monkeypatch.setattr(runtime, "get_server", lambda: server)
+
+
+def post(body, session_id=None, accept="application/json, text/event-stream"):
+    headers = {"Authorization": "Bearer token", "Accept": accept}
+    if session_id:
+        headers["Mcp-Session-Id"] = session_id
+    return func.HttpRequest("POST", "/api/mcp", headers=headers, body=json.dumps(body).encode())
+
+
+def test_accept_negotiation():
+    server = StreamingServer()
+    streaming = MCPRequest(id=1, method="tools/call", params={"name": "slow_tool"})
+    plain = MCPRequest(id=2, method="tools/list")
+
+    assert accepts_event_stream("application/json, text/event-stream;q=0.5")
+    assert not accepts_event_stream("text/event-stream;q=0")
+    assert choose_response_mode(server, streaming, "application/json, text/event-stream") == "sse"
+    assert choose_response_mode(server, streaming, "application/json") == "json"
+    assert choose_response_mode(server, plain, "application/json, text/event-stream") == "json"
+    assert choose_response_mode(server, plain, "text/event-stream") == "sse"
+
+
+@pytest.mark.asyncio
+async def test_stream_request_yields_progress_then_response():
+    server = StreamingServer()
+    session = server.create_session("s1", "user-1")
+    request = MCPRequest(id=7, method="tools/call", params={"name": "slow_tool"})
+
+    frames = parse_frames("".join([f async for f in stream_request(server, request, session)]))
+
+    assert [f[1]["params"]["progress"] for f in frames[:-1]] == [1, 2, 3]
+    assert frames[-1][1] == {"jsonrpc": "2.0", "id": 7, "result": {"toolResult": {"done": True}}}
+    assert session._request_streams == {}
+    assert session._message_queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_initialize_creates_session_and_json_response(authenticated):
+    resp = await mcp_endpoint.main(post({"jsonrpc": "2.0", "id": 1, "method": "initialize"}))
+
+    assert resp.status_code == 200
+    assert resp.headers["Content-Type"] == "application/json"
+    session_id = resp.headers["Mcp-Session-Id"]
+    assert runtime.get_server().get_session(session_id) is not None
+
+    resp = await mcp_endpoint.main(post({"jsonrpc": "2.0", "id": 2, "method": "tools/list"}, session_id))
+    assert json.loads(resp.get_body())["result"]["tools"]
+
+
+@pytest.mark.asyncio
+async def test_streaming_tool_upgrades_to_sse(authenticated):
+    resp = await mcp_endpoint.main(post({"jsonrpc": "2.0", "id": 1, "method": "initialize"}))
+    session_id = resp.headers["Mcp-Session-Id"]
+
+    resp = await mcp_endpoint.main(post(
+        {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": "slow_tool"}}, session_id))
+
+    assert resp.status_code == 200
+    assert resp.headers["Content-Type"] == "text/event-stream"
+    frames = parse_frames(resp.get_body().decode())
+    assert len(frames) == 4
+    assert frames[-1][1]["result"]["toolResult"] == {"done": True}
+
+
+@pytest.mark.asyncio
+async def test_requests_without_session_are_rejected(authenticated):
+    resp = await mcp_endpoint.main(post({"jsonrpc": "2.0", "id": 1, "method": "tools/list"}))
+    assert resp.status_code == 400
+
+    resp = await mcp_endpoint.main(post({"jsonrpc": "2.0", "id": 1, "method": "tools/list"}, "unknown"))
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_progress_reaches_session_stream_polls_before_the_response(authenticated, monkeypatch):
+    server = GatedStreamingServer()
+    server.gate = asyncio.Event()
+    monkeypatch.setattr(runtime, "get_server", lambda: server)
+    session = server.create_session("s1", "user-1")
+    session.attach_reader()
+    session.detach_reader()  # polled a moment ago
+
+    call = asyncio.create_task(mcp_endpoint.main(post(
+        {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": "slow_tool"}}, "s1")))
+    poll = await sse_stream.main(func.HttpRequest(
+        "GET", "/api/mcp/stream", body=b"", headers={"Authorization": "Bearer token", "X-Session-Id": "s1"}))
+
+    assert not call.done()
+    progress = [data for event, data in parse_frames(poll.get_body().decode()) if event == "message"]
+    assert [p["params"]["progress"] for p in progress] == [1]
+
+    server.gate.set()
+    resp = await call
+    assert resp.headers["Content-Type"] == "text/event-stream"
+    assert [data["result"]["toolResult"] for _, data in parse_frames(resp.get_body().decode())] == [{"done": True}]
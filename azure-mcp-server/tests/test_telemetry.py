@@ -0,0 +1,73 @@
+import json
+import pytest
+import azure.functions as func
+
+from src.functions import mcp_command
+from src.shared import runtime, telemetry
+from src.shared.mcp_protocol import MCPServer
+from src.shared.auth import TokenCheck
+from src.shared.telemetry import NULL_SPAN, InMemoryExporter, LatencyHistogram
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = InMemoryExporter()
+    monkeypatch.setattr(telemetry.tracer, "enabled", True)
+    monkeypatch.setattr(telemetry.tracer, "exporters", [exporter])
+    telemetry.tracer.reset()
+    return exporter
+
+
+def test_disabled_spans_are_shared_no_ops(monkeypatch):
+    monkeypatch.setattr(telemetry.tracer, "enabled", False)
+    telemetry.tracer.reset()
+    with telemetry.span("anything", method="tools/list") as s:
+        s.set_attribute("ignored", True)
+    assert s is NULL_SPAN
+    assert telemetry.tracer.histograms == {}
+
+
+def test_histogram_percentiles_use_bucket_bounds():
+    histogram = LatencyHistogram()
+    for value in [0.05] * 90 + [3] * 9 + [200]:
+        histogram.observe(value)
+
+    assert histogram.percentile(0.5) == 0.1
+    assert histogram.percentile(0.95) == 5
+    assert histogram.percentile(0.99) == 5
+    assert histogram.percentile(1.0) == 250
+
+
+def test_errors_are_recorded(exporter):
+    with pytest.raises(KeyError):
+        with telemetry.span("tool.execute", tool="broken"):
+            raise KeyError("x")
+
+    assert exporter.spans[0].error == "KeyError"
+    assert telemetry.tracer.snapshot()["tool.execute"]["broken"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_command_path_is_instrumented(exporter, monkeypatch):
+    async def check_token(token):
+        return TokenCheck(claims={"sub": "user-1", "scp": "mcp.read"})
+
+    server = MCPServer()
+    server.create_session("s1", "user-1")
+    monkeypatch.setattr(runtime.get_auth_validator(), "check_token", check_token)
+    monkeypatch.setattr(runtime, "get_server", lambda: server)
+
+    body = {"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+            "params": {"name": "analyze_code", "arguments": {"code": "x", "language": "python"}}}
+    req = func.HttpRequest("POST", "/api/mcp/command", body=json.dumps(body).encode(),
+                           headers={"Authorization": "Bearer t", "X-Session-Id": "s1"})
+    resp = await mcp_command.main(req)
+
+    assert resp.status_code == 200
+    assert exporter.names() == [
+        "auth.validate_token", "session.lookup", "request.parse",
+        "tool.execute", "tool.call", "server.dispatch", "request.handle", "response.serialize"
+    ]
+    snapshot = telemetry.tracer.snapshot()
+    assert snapshot["tool.call"]["analyze_code"]["count"] == 1
+    assert snapshot["server.dispatch"]["tools/call"]["count"] == 1
@@ -0,0 +1,82 @@
+import json
+import pytest
+
+from benchmarks.support import LocalSigner
+from src.shared.tenants import TenantValidatorPool, load_tenants, tenant_from_claims
+
+TENANT_A = "aaaaaaaa-0000-0000-0000-000000000001"
+TENANT_B = "bbbbbbbb-0000-0000-0000-000000000002"
+
+
+@pytest.fixture
+def signers():
+    return {
+        TENANT_A: LocalSigner(tenant_id=TENANT_A, client_id="client-a"),
+        TENANT_B: LocalSigner(tenant_id=TENANT_B, client_id="client-b",
+                              issuer=f"https://login.microsoftonline.com/{TENANT_B}/v2.0"),
+    }
+
+
+@pytest.fixture
+def pool(signers, monkeypatch):
+    tenants = load_tenants(json.dumps({t: {"client_id": s.client_id} for t, s in signers.items()}))
+    pool = TenantValidatorPool(tenants, max_tenants=1, authority_host="https://login.microsoftonline.com")
+    build = pool.validator_for
+
+    def validator_for(tenant_id):
+        validator = build(tenant_id)
+        jwks = signers[tenant_id].jwks()
+
+        async def get_jwks():
+            return jwks
+
+        validator.get_jwks = get_jwks
+        return validator
+
+    monkeypatch.setattr(pool, "validator_for", validator_for)
+    return pool
+
+
+@pytest.mark.asyncio
+async def test_each_tenant_is_validated_with_its_own_keys(signers, pool):
+    for tenant_id, signer in signers.items():
+        claims = await pool.validate_token(signer.mint_token("user-1"))
+        assert claims["tid"] == tenant_id
+
+
+@pytest.mark.asyncio
+async def test_tenant_rules_are_not_shared(signers, pool):
+    # Signed by tenant A's key but claiming tenant B's audience
+    token = signers[TENANT_A].mint_token("user-1", aud="client-b")
+
+    check = await pool.check_token(token)
+
+    assert "audience" in check.error
+
+
+@pytest.mark.asyncio
+async def test_unknown_tenant_is_rejected(pool):
+    check = await pool.check_token(LocalSigner(tenant_id="cccccccc-0000-0000-0000-000000000003").mint_token("u"))
+
+    assert not check.ok
+
+
+@pytest.mark.asyncio
+async def test_validators_share_one_http_pool_and_are_evicted(signers, pool):
+    for signer in signers.values():
+        await pool.validate_token(signer.mint_token("user-1"))
+
+    assert list(pool._validators) == [TENANT_B]
+    assert pool._validators[TENANT_B].http is pool.http
+
+
+def test_tenant_from_issuer_when_tid_is_missing():
+    known = {TENANT_A: None}
+    assert tenant_from_claims({"iss": f"https://login.microsoftonline.com/{TENANT_A}/v2.0"}, known) == TENANT_A
+    assert tenant_from_claims({"iss": "https://evil.example/x/"}, known) is None
+
+
+def test_plain_tenant_list(monkeypatch):
+    monkeypatch.setenv("AZURE_CLIENT_ID", "shared-client")
+    tenants = load_tenants(f"{TENANT_A}, {TENANT_B}")
+    assert tenants[TENANT_B].audiences == ["shared-client", "api://shared-client"]
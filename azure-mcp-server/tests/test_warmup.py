@@ -0,0 +1,73 @@
+import json
+import pytest
+import azure.functions as func
+
+from benchmarks.support import LocalSigner, use_local_keys
+from src.functions import warmup_endpoint
+from src.shared import runtime
+from src.shared.auth import AzureADAuthValidator
+from src.shared.mcp_protocol import MCPServer, MCPRequest
+from src.shared.snapshots import SharedSnapshotStore
+from src.shared.warmup import warm_up
+
+
+@pytest.mark.asyncio
+async def test_warm_up_reports_every_step():
+    server = MCPServer()
+    validator = AzureADAuthValidator()
+    use_local_keys(validator, LocalSigner())
+
+    report = await warm_up(server, validator)
+
+    assert list(report["steps"]) == ["imports", "validators", "list_responses", "jwks", "connections"]
+    assert report["errors"] == {}
+    assert "tools/list" in server._static_json
+
+
+@pytest.mark.asyncio
+async def test_warm_up_connects_the_snapshot_store():
+    class Client:
+        pings = 0
+
+        async def ping(self):
+            self.pings += 1
+
+    client = Client()
+    validator = AzureADAuthValidator()
+    use_local_keys(validator, LocalSigner())
+
+    report = await warm_up(MCPServer(snapshot_store=SharedSnapshotStore(client)), validator)
+
+    assert report["errors"] == {}
+    assert client.pings == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("request_id", [7, "abc", None])
+async def test_prebuilt_list_body_matches_model_dump(request_id):
+    server = MCPServer()
+    session = server.create_session("s1", "user-1")
+    request = MCPRequest(id=request_id, method="tools/list")
+
+    response = await server.handle_request(request, session)
+
+    assert server.encode_response(request, response) == \
+        json.dumps(response.model_dump(exclude_none=True)).encode("utf-8")
+
+
+@pytest.mark.asyncio
+async def test_endpoint_is_not_ready_while_a_step_fails(monkeypatch):
+    async def unreachable():
+        raise ConnectionError("JWKS host unreachable")
+
+    validator = AzureADAuthValidator()
+    monkeypatch.setattr(validator, "get_jwks", unreachable)
+    monkeypatch.setattr(runtime, "get_auth_validator", lambda: validator)
+    monkeypatch.setattr(runtime, "get_server", MCPServer)
+
+    resp = await warmup_endpoint.main(func.HttpRequest("POST", "/api/warmup", body=b""))
+    report = json.loads(resp.get_body())
+
+    assert resp.status_code == 503
+    assert report["errors"] == {"jwks": "JWKS host unreachable"}
+    assert set(report["steps"]) >= {"jwks", "list_responses"}
@@ -0,0 +1,150 @@
+import io
+import base64
+import asyncio
+import tarfile
+import zipfile
+import pytest
+
+from src.shared import workspace
+from src.shared.deadlines import RequestContext, RequestCancelled
+from src.shared.mcp_protocol import MCPServer, MCPRequest
+from src.shared.workspace import AnalysisCache, WorkspaceAnalyzer, file_progress, load_files
+
+RISKY = 'password = "hunter2hunter2"\nresult = eval(user_input)\n'
+CLEAN = "def add(a, b):\n    return a + b\n"
+BROKEN = "def broken(:\n"
+
+
+def files(**contents):
+    return [{"path": path.replace("__", "/").replace("_py", ".py"), "content": content}
+            for path, content in contents.items()]
+
+
+@pytest.fixture
+def server():
+    server = MCPServer()
+    server.workspace = WorkspaceAnalyzer(workers=2, executor="thread")
+    yield server
+    server.workspace.close()
+
+
+def rules(report, path):
+    entry = next(f for f in report["files"] if f["path"] == path)
+    return {issue["rule"] for issue in entry["issues"]}
+
+
+@pytest.mark.asyncio
+async def test_analyzes_batch_and_streams_progress(server):
+    session = server.create_session("s1", "user-1")
+    request = MCPRequest(id=1, method="tools/call", params={
+        "name": "analyze_workspace",
+        "arguments": {"files": files(risky_py=RISKY, clean_py=CLEAN, broken_py=BROKEN)}
+    })
+
+    response = await server.handle_request(request, session)
+
+    report = response.result["toolResult"]
+    assert report["summary"]["files"] == 3
+    assert {"hardcoded-secret", "dynamic-code"} <= rules(report, "risky.py")
+    assert rules(report, "clean.py") == set()
+    assert "syntax-error" in rules(report, "broken.py")
+    assert report["summary"]["by_category"]["security"] == 2
+
+    progress = [message for _, message in session.drain_events(10)]
+    assert [p["params"]["progress"] for p in progress] == [1, 2, 3]
+    assert all(p["params"]["total"] == 3 for p in progress)
+    streamed = {p["params"]["file"]["path"]: p["params"]["file"] for p in progress}
+    assert {issue["rule"] for issue in streamed["risky.py"]["issues"]} == rules(report, "risky.py")
+    assert streamed["clean.py"]["issues"] == [] and not streamed["clean.py"]["truncated"]
+
+
+def test_file_progress_bounds_the_findings():
+    result = {"language": "python", "issues": [{"line": n, "rule": "todo"} for n in range(5)]}
+
+    entry = file_progress("a.py", result, limit=2)
+
+    assert entry["issueCount"] == 5
+    assert [issue["line"] for issue in entry["issues"]] == [0, 1]
+    assert entry["truncated"]
+
+
+@pytest.mark.asyncio
+async def test_unchanged_files_come_from_cache():
+    analyzer = WorkspaceAnalyzer(workers=1, executor="thread")
+    first = [("a.py", CLEAN.encode()), ("b.py", RISKY.encode())]
+    await analyzer.analyze(first)
+
+    report = await analyzer.analyze([("a.py", CLEAN.encode()), ("b.py", (RISKY + "x = 1\n").encode()),
+                                     ("copy/a.py", CLEAN.encode())])
+
+    assert report["summary"]["cached"] == 2
+    assert len(analyzer.cache) == 3
+    analyzer.close()
+
+
+@pytest.mark.asyncio
+async def test_analysis_type_filters_findings():
+    analyzer = WorkspaceAnalyzer(workers=1, executor="thread")
+    report = await analyzer.analyze([("r.py", (RISKY + "# TODO tidy\n").encode())], "security")
+    assert {i["category"] for i in report["files"][0]["issues"]} == {"security"}
+    analyzer.close()
+
+
+def test_archives_are_unpacked_and_filtered():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("src/app.py", CLEAN)
+        archive.writestr("node_modules/lib/index.js", "module.exports = 1")
+        archive.writestr("logo.png", b"\x89PNG\0\0\0")
+    loaded, skipped = load_files({"archive": base64.b64encode(buffer.getvalue()).decode()})
+    assert [path for path, _ in loaded] == ["src/app.py"]
+    assert {s["reason"] for s in skipped} == {"excluded", "binary"}
+
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        data = RISKY.encode()
+        info = tarfile.TarInfo("./pkg/risky.py")
+        info.size = len(data)
+        archive.addfile(info, io.BytesIO(data))
+    loaded, skipped = load_files({"archive": base64.b64encode(buffer.getvalue()).decode()})
+    assert loaded == [("pkg/risky.py", RISKY.encode())]
+
+
+def test_limits_and_bad_input(monkeypatch):
+    monkeypatch.setattr(workspace, "MAX_FILE_BYTES", 10)
+    loaded, skipped = load_files({"files": files(small_py="x = 1", big_py="x = 1" * 10)})
+    assert [path for path, _ in loaded] == ["small.py"]
+    assert skipped == [{"path": "big.py", "reason": "too_large"}]
+
+    with pytest.raises(workspace.WorkspaceInputError):
+        load_files({"archive": "not base64!"})
+    with pytest.raises(workspace.WorkspaceInputError):
+        load_files({})
+
+
+@pytest.mark.asyncio
+async def test_cancellation_stops_submitting_batches(monkeypatch):
+    monkeypatch.setattr(workspace, "BATCH_FILES", 1)
+    analyzer = WorkspaceAnalyzer(workers=1, executor="thread")
+    items = [(f"f{n}.py", f"x = {n}\n".encode()) for n in range(50)]
+    context = RequestContext()
+
+    async def on_file(path, result):
+        context.cancel()
+
+    with pytest.raises(RequestCancelled):
+        await context.run(analyzer.analyze(items, on_file=on_file))
+
+    # The first result cancels the run; at most the queued batches finished
+    assert len(analyzer.cache) <= 1 + workspace.QUEUED_PER_WORKER
+    analyzer.close()
+
+
+@pytest.mark.asyncio
+async def test_process_pool():
+    analyzer = WorkspaceAnalyzer(workers=2, executor="process", cache=AnalysisCache())
+    try:
+        report = await asyncio.wait_for(analyzer.analyze([("a.py", RISKY.encode()), ("b.py", CLEAN.encode())]), 60)
+    finally:
+        analyzer.close()
+    assert report["summary"]["issues"] == 2